@@ -25,6 +25,7 @@ SIMPLE_JWT = {
     "ROTATE_REFRESH_TOKENS": True,  # Refresh token updates on use
     "BLACKLIST_AFTER_ROTATION": True,  # Old refresh tokens become invalid
     "AUTH_HEADER_TYPES": ("Bearer",),  # Authorization: Bearer <token>
+    "TOKEN_OBTAIN_SERIALIZER": "core.authentication.AttendanceTokenObtainPairSerializer",  # role claim
 }
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -62,6 +63,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -158,7 +160,7 @@ STATIC_URL = 'static/'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -167,4 +169,89 @@ REST_FRAMEWORK = {
 
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# "shared" must be visible to every worker: writes invalidate the cached
+# class reports and QR verification keys through it. Redis when CACHE_REDIS_URL
+# is set (needs the redis package), otherwise the database cache table
+# created by `python manage.py createcachetable`.
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "shared": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": CACHE_REDIS_URL,
+    } if CACHE_REDIS_URL else {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "core_cache",
+        "OPTIONS": {"MAX_ENTRIES": 50000},
+    },
+}
+
+# Class reports (core.report_cache): entries covering today live
+# REPORT_CACHE_TODAY_TIMEOUT seconds, closed periods REPORT_CACHE_TIMEOUT.
+REPORT_CACHE_ALIAS = "shared"
+REPORT_CACHE_TODAY_TIMEOUT = 60
+REPORT_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Verification-key cache for the QR scan path.
+# "django" stores entries in CACHES[CACHE_ALIAS], shared by every worker, so
+# a rotated key or a deactivated student is refused everywhere at once.
+# "lru" keeps a per-process LRU, faster but only safe with a single worker:
+# other workers keep accepting stale entries for up to TIMEOUT seconds.
+# On the database cache every miss costs a few queries; prefer Redis.
+QR_KEY_CACHE = {
+    "BACKEND": os.getenv("QR_KEY_CACHE_BACKEND", "django"),
+    "CACHE_ALIAS": "shared",
+    "MAX_ENTRIES": 10000,
+    "TIMEOUT": 300,
+}
+
+# Background QR image rendering (core.qr_jobs). With QR_JOBS_RUN_INLINE the
+# jobs run on commit in the request thread instead of the worker pool.
+QR_WORKER_THREADS = int(os.getenv("QR_WORKER_THREADS", "4"))
+QR_JOBS_RUN_INLINE = os.getenv("QR_JOBS_RUN_INLINE") == "True"
+
+# Server-sent attendance events (core.push). "inprocess" only reaches
+# clients of the same worker; "redis" shares events across workers.
+ATTENDANCE_PUSH = {
+    "BACKEND": os.getenv("ATTENDANCE_PUSH_BACKEND", "inprocess"),
+    "URL": os.getenv("ATTENDANCE_PUSH_REDIS_URL", "redis://localhost:6379/0"),
+    "QUEUE_SIZE": 100,
+}
+
+# Seconds a ticket from /api/attendance/events/ticket/ can open the event
+# stream (core.authentication.issue_stream_ticket); it travels in the URL,
+# so it only opens the stream and expires quickly.
+STREAM_TICKET_MAX_AGE = 60
+
+# Seconds a user's role/active state is trusted from the in-process cache
+# (core.authentication); bounds how long other workers see a revoked user.
+AUTH_USER_CACHE_TIMEOUT = 30
+
+# Seconds a teacher's class ids and student counts (core.teacher_scope) are
+# trusted from the in-process cache. Writes invalidate it only in the worker
+# that made them, so other workers may keep showing a reassigned class, or
+# miss a newly assigned one, for up to this long.
+TEACHER_SCOPE_CACHE_TIMEOUT = 60
+
+# Chronic absenteeism (core.absenteeism): a student is at risk after this
+# many consecutive absent days, or below this attendance percent over the
+# last 30 days. /api/reports/at-risk/ takes ?streak= / ?percent= overrides.
+ABSENTEEISM_STREAK_THRESHOLD = 3
+ABSENTEEISM_PERCENT_THRESHOLD = 75
+
+# Per-route request metrics (core.middleware), exposed at /api/metrics/.
+# Requests running more queries than the budget are logged as warnings;
+# METRICS_QUERY_BUDGETS overrides it per route pattern.
+# Besides admin JWTs, /api/metrics/ accepts Prometheus scrapes sending
+# "Authorization: Bearer <METRICS_SCRAPE_TOKEN>" or coming from an address
+# or CIDR network in METRICS_ALLOWED_IPS (comma separated, matched against
+# REMOTE_ADDR). Both are off when empty.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True") == "True"
+METRICS_SCRAPE_TOKEN = os.getenv("METRICS_SCRAPE_TOKEN", "")
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv("METRICS_ALLOWED_IPS", "").split(",") if ip.strip()]
+METRICS_QUERY_BUDGET = 30
+METRICS_QUERY_BUDGETS = {}
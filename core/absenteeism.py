@@ -0,0 +1,160 @@
+from collections import defaultdict
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast, NullIf
+from django.utils import timezone
+
+from .models import AttendanceRecord, Student, StudentAbsenceState
+from .rollups import upsert
+
+WINDOW_DAYS = 30
+EMPTY_DAY = "-"
+STATE_FIELDS = ["last_date", "absent_streak", "window", "window_present", "window_absent", "updated_at"]
+
+
+def new_state(student_id):
+    return StudentAbsenceState(student_id=student_id, window="", absent_streak=0)
+
+
+def advance(state, date, status):
+    """
+    Applies a record dated after state.last_date (or a first record) to
+    the state in place: the window slides forward to end at `date`, days
+    without a record become "-", and the streak grows or resets.
+    Days without records (weekends, holidays) do not break a streak.
+    """
+    gap = WINDOW_DAYS if state.last_date is None else min((date - state.last_date).days, WINDOW_DAYS)
+    state.window = (state.window + EMPTY_DAY * (gap - 1) + status)[-WINDOW_DAYS:]
+    state.window_present = state.window.count("P")
+    state.window_absent = state.window.count("A")
+    state.absent_streak = state.absent_streak + 1 if status == "A" else 0
+    state.last_date = date
+
+
+def replay(rows):
+    """
+    Yields one state per student from (student_id, date, status) rows
+    ordered by student and date, holding one student at a time.
+    """
+    for student_id, records in groupby(rows, key=lambda row: row[0]):
+        state = new_state(student_id)
+        for _, date, status in records:
+            advance(state, date, status)
+        yield state
+
+
+def save_states(states, batch_size=1000):
+    upsert(StudentAbsenceState, states, unique_fields=["student"], update_fields=STATE_FIELDS, batch_size=batch_size)
+
+
+def update_absence_states(keys):
+    """
+    Brings the absence state of the students in the (student_id, date)
+    keys up to date. Records dated after a student's last_date (the
+    morning scans and finalization) are applied in place; edits or
+    deletions of earlier days replay that student's records instead.
+    Three queries for the common case: states, changed records, upsert.
+    """
+    dates_by_student = defaultdict(set)
+    for student_id, date in keys:
+        dates_by_student[student_id].add(date)
+    if not dates_by_student:
+        return
+
+    states = StudentAbsenceState.objects.in_bulk(list(dates_by_student))
+    statuses = {
+        (student_id, date): status
+        for student_id, date, status in AttendanceRecord.objects.filter(
+            student_id__in=dates_by_student,
+            date__in={date for dates in dates_by_student.values() for date in dates}
+        ).values_list("student_id", "date", "status")
+    }
+
+    changed, replay_ids = [], set()
+    for student_id, dates in dates_by_student.items():
+        state = states.get(student_id) or new_state(student_id)
+        dates = sorted(dates)
+        appended = state.last_date is None or dates[0] > state.last_date
+        if appended and all((student_id, date) in statuses for date in dates):
+            for date in dates:
+                advance(state, date, statuses[(student_id, date)])
+            changed.append(state)
+        elif student_id in states or any((student_id, date) in statuses for date in dates):
+            replay_ids.add(student_id)
+
+    if replay_ids:
+        replayed = list(replay(
+            AttendanceRecord.objects.filter(student_id__in=replay_ids).order_by("student_id", "date").values_list(
+                "student_id", "date", "status"
+            ).iterator()
+        ))
+        changed += replayed
+        gone = replay_ids - {state.student_id for state in replayed}
+        if gone:
+            StudentAbsenceState.objects.filter(student_id__in=gone).delete()
+
+    save_states(changed)
+
+
+def rebuild_absence_states(batch_size=500):
+    """
+    Rebuilds every StudentAbsenceState from the raw records, `batch_size`
+    students at a time in student id order, each batch in its own
+    transaction. A batch reads its students' records ordered by (student,
+    date), which the (student, date) unique index serves; drivers such as
+    mysqlclient buffer a whole result set client-side, so memory is bounded
+    by one batch of students' records rather than the whole table.
+    Returns the number of states written.
+    """
+    written = 0
+    last_id = 0
+    while True:
+        student_ids = list(
+            Student.objects.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:batch_size]
+        )
+        if not student_ids:
+            return written
+        last_id = student_ids[-1]
+
+        with transaction.atomic():
+            states = list(replay(
+                AttendanceRecord.objects.filter(student_id__in=student_ids).order_by("student_id", "date").values_list(
+                    "student_id", "date", "status"
+                )
+            ))
+            save_states(states, batch_size=batch_size)
+            StudentAbsenceState.objects.filter(student_id__in=student_ids).exclude(
+                student_id__in=[state.student_id for state in states]
+            ).delete()
+        written += len(states)
+
+
+def at_risk_states(min_streak=None, max_percent=None, class_ids=None):
+    """
+    Active students absent at least `min_streak` recorded days in a row,
+    or present on less than `max_percent` of the marked days of their
+    30-day window. States whose window ended more than WINDOW_DAYS ago
+    (students no longer being marked) are left out.
+    """
+    if min_streak is None:
+        min_streak = getattr(settings, "ABSENTEEISM_STREAK_THRESHOLD", 3)
+    if max_percent is None:
+        max_percent = getattr(settings, "ABSENTEEISM_PERCENT_THRESHOLD", 75)
+
+    states = StudentAbsenceState.objects.filter(
+        student__is_active=True,
+        last_date__gt=timezone.now().date() - timedelta(days=WINDOW_DAYS)
+    ).annotate(
+        window_percent=Cast(F("window_present"), FloatField()) * 100
+        / NullIf(F("window_present") + F("window_absent"), 0)
+    ).filter(
+        Q(absent_streak__gte=min_streak) | Q(window_percent__lt=max_percent)
+    )
+    if class_ids is not None:
+        states = states.filter(student__student_class_id__in=class_ids)
+
+    return states.select_related("student__student_class").order_by("-absent_streak", "window_percent", "student_id")
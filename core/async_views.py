@@ -0,0 +1,258 @@
+"""
+Async-native versions of the high fan-in endpoints, for deployments
+running the ASGI app (config.asgi). DRF's APIView is synchronous, so these
+are plain Django views that authenticate the JWT themselves and use the
+async ORM; responses match their counterparts in core/views.py.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.utils.encoders import JSONEncoder
+
+from .authentication import CachedJWTAuthentication, read_stream_ticket
+from .models import SchoolClass, Student, AttendanceRecord, DailyClassAttendanceSummary
+from .push import get_broker, class_count_events
+from .qr_cache import get_key_cache, payload_cache_key
+from .report_utils import asummarize_daily_summaries
+from .serializers import AttendanceRecordSerializer
+from .utils import parse_qr_data, qr_key_matches, QRSignatureError
+
+User = get_user_model()
+
+
+class AuthenticationRequired(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+async def authenticate_jwt(request, allow_stream_ticket=False):
+    """
+    Returns the user for the request's Bearer token (or ?ticket= from
+    issue_stream_ticket when allowed), raising AuthenticationRequired
+    with a DRF-shaped 401.
+    """
+    auth = CachedJWTAuthentication()
+    header = auth.get_header(request)
+    raw_token = auth.get_raw_token(header) if header else None
+    ticket = request.GET.get("ticket") if raw_token is None and allow_stream_ticket else None
+    if not raw_token and not ticket:
+        raise AuthenticationRequired(JsonResponse(
+            {"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED
+        ))
+
+    try:
+        claims = auth.get_validated_token(raw_token) if raw_token else read_stream_ticket(ticket)
+        return await sync_to_async(auth.get_user)(claims)
+    except AuthenticationFailed as exc:
+        body = exc.detail if isinstance(exc.detail, dict) else {"detail": exc.detail}
+        raise AuthenticationRequired(JsonResponse(body, status=status.HTTP_401_UNAUTHORIZED))
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncJWTView(View):
+    """
+    Base view: authenticates before dispatching, handlers receive request.user.
+    """
+    allow_stream_ticket = False
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            request.user = await authenticate_jwt(request, self.allow_stream_ticket)
+        except AuthenticationRequired as exc:
+            return exc.response
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncMarkAttendanceByQRView(AsyncJWTView):
+
+    async def post(self, request):
+        # Step 1: Role check (only teachers/admin allowed)
+        if request.user.role not in ['TEACHER', 'ADMIN']:
+            return JsonResponse({"error": "You are not allowed to mark attendance"}, status=status.HTTP_403_FORBIDDEN)
+
+        # Step 2: Get QR data from request
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            return JsonResponse({"error": "Body must be JSON"}, status=status.HTTP_400_BAD_REQUEST)
+        qr_data = data.get("qr_data") if isinstance(data, dict) else None
+        if not qr_data:
+            return JsonResponse({"error": "qr_data is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Step 3: Decode QR data (compact signature is checked here, no DB hit)
+        try:
+            payload = parse_qr_data(qr_data)
+        except QRSignatureError:
+            return JsonResponse({"error": "Verification failed"}, status=status.HTTP_401_UNAUTHORIZED)
+        except (AttributeError, ValueError):
+            return JsonResponse({"error": "Invalid QR format"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Step 4: Find student (verification-key cache, DB on miss)
+        student = await sync_to_async(get_key_cache().get)(payload_cache_key(payload))
+        if student is None:
+            return JsonResponse({"error": "Student not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        # Step 5: Validate class
+        if str(student.class_id) != payload.class_id:
+            return JsonResponse({"error": "Class mismatch"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Step 6: Validate verification key
+        if not qr_key_matches(payload, student.verification_key):
+            return JsonResponse({"error": "Verification failed"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        if not student.is_active:
+            return JsonResponse({"error": "Student is inactive"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Step 7: Prevent duplicate attendance for same day
+        try:
+            attendance, created = await AttendanceRecord.objects.aget_or_create(
+                student_id=student.student_id,
+                date=timezone.now().date(),
+                defaults={
+                    "student_class_id": student.class_id,
+                    "status": "P",
+                    "marked_by": request.user,
+                    "method": "QR"
+                }
+            )
+        except IntegrityError:
+            # the cached key outlived the student, deleted meanwhile
+            await sync_to_async(get_key_cache().invalidate)(payload_cache_key(payload))
+            return JsonResponse({"error": "Student not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        if not created:
+            return JsonResponse({"error": "Attendance already marked today"}, status=status.HTTP_409_CONFLICT)
+
+        # Step 8: Return response, relations loaded up front (no lazy loads in async code)
+        attendance = await AttendanceRecordSerializer.setup_eager_loading(AttendanceRecord.objects).aget(pk=attendance.pk)
+        return JsonResponse(
+            {"message": "Attendance marked successfully", "data": AttendanceRecordSerializer(attendance).data},
+            status=status.HTTP_201_CREATED, encoder=JSONEncoder
+        )
+
+
+class AsyncTodayAttendanceByClassView(AsyncJWTView):
+
+    async def get(self, request, class_id):
+        if request.user.role not in ["TEACHER", "ADMIN"]:
+            return JsonResponse({"error": "Not allowed"}, status=status.HTTP_403_FORBIDDEN)
+
+        records = AttendanceRecordSerializer.setup_eager_loading(AttendanceRecord.objects.filter(
+            student_class_id=class_id,
+            date=timezone.now().date()
+        ).order_by('-marked_at'))
+
+        records = [record async for record in records]
+        return JsonResponse(AttendanceRecordSerializer(records, many=True).data, safe=False, encoder=JSONEncoder)
+
+
+class AsyncAdminDashboardOverviewView(AsyncJWTView):
+
+    async def get(self, request):
+        if request.user.role != "ADMIN":
+            return JsonResponse({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
+
+        today = timezone.now().date()
+
+        # Totals
+        total_students = await Student.objects.acount()
+        total_classes = await SchoolClass.objects.acount()
+        total_teachers = await User.objects.filter(role="TEACHER").acount()
+
+        # Today's attendance
+        today_summary = await asummarize_daily_summaries(DailyClassAttendanceSummary.objects.filter(date=today))
+
+        return JsonResponse({
+            "date": str(today),
+            "totals": {
+                "students": total_students,
+                "classes": total_classes,
+                "teachers": total_teachers,
+            },
+            "today_attendance": {
+                "marked": today_summary["total"],
+                "present": today_summary["present"],
+                "absent": today_summary["absent"],
+                "attendance_percent": today_summary["percent"]
+            }
+        })
+
+
+class AttendanceEventStreamView(AsyncJWTView):
+    """
+    Server-sent events with per-class totals for today, pushed whenever
+    attendance is written, so dashboards subscribe once instead of polling
+    the today/classwise endpoints. Needs the ASGI app (config.asgi), under
+    WSGI it answers 501.
+
+    EventSource cannot set headers, so browsers pass a short-lived
+    ?ticket= from /api/attendance/events/ticket/ instead of the access
+    token, and fetch a new one before reconnecting. Optional
+    ?class_id=1,2 narrows the stream.
+    """
+    allow_stream_ticket = True
+    heartbeat = 15
+
+    async def get(self, request):
+        # under WSGI Django buffers an async streaming body completely, an
+        # endless stream would hold the worker forever
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse(
+                {"error": "The event stream needs the ASGI server (config.asgi:application)"},
+                status=status.HTTP_501_NOT_IMPLEMENTED
+            )
+
+        user = request.user
+        if user.role not in ["TEACHER", "ADMIN"]:
+            return JsonResponse({"error": "Not allowed"}, status=status.HTTP_403_FORBIDDEN)
+
+        # class scope, teachers only see their own classes
+        classes = SchoolClass.objects.all()
+        if user.role == "TEACHER":
+            classes = classes.filter(class_teacher=user)
+        if request.GET.get("class_id"):
+            try:
+                classes = classes.filter(id__in=[int(value) for value in request.GET["class_id"].split(",")])
+            except ValueError:
+                return JsonResponse({"error": "class_id must be a comma separated list of ids"}, status=status.HTTP_400_BAD_REQUEST)
+
+        class_ids = {class_id async for class_id in classes.values_list("id", flat=True)}
+        if not class_ids:
+            return JsonResponse({"error": "No classes to subscribe to"}, status=status.HTTP_403_FORBIDDEN)
+
+        # admins without a filter follow every class, including new ones
+        subscribe_to = None if user.role == "ADMIN" and not request.GET.get("class_id") else class_ids
+        today = timezone.now().date()
+        snapshot = await sync_to_async(class_count_events)({(class_id, today) for class_id in class_ids})
+
+        response = StreamingHttpResponse(self.events(snapshot, subscribe_to), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    async def events(self, snapshot, class_ids):
+        subscription = await get_broker().subscribe(class_ids)
+        try:
+            yield "retry: 3000\n\n"
+            for event in snapshot:
+                yield self.format_event(event)
+
+            while True:
+                event = await subscription.next_event(self.heartbeat)
+                yield self.format_event(event) if event else ": keepalive\n\n"
+        finally:
+            await subscription.close()
+
+    @staticmethod
+    def format_event(event):
+        return f"event: attendance\ndata: {json.dumps(event, cls=JSONEncoder)}\n\n"
@@ -0,0 +1,210 @@
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+
+from .models import Student, AttendanceRecord
+from .utils import parse_qr_data, qr_key_matches, QRSignatureError
+from .report_utils import summarize_attendance_by_class
+from .signals import attendance_changed
+from .qr_cache import get_key_cache, payload_cache_key
+
+SCAN_CREATED = "created"
+SCAN_DUPLICATE = "duplicate"
+SCAN_CLASS_MISMATCH = "class_mismatch"
+SCAN_VERIFICATION_FAILED = "verification_failed"
+SCAN_NOT_FOUND = "not_found"
+SCAN_INACTIVE = "inactive"
+SCAN_INVALID_FORMAT = "invalid_format"
+SCAN_INVALID_TIMESTAMP = "invalid_timestamp"
+
+
+def mark_qr_scans(scans, user, date, scan_dates=None, method="QR"):
+    """
+    Marks a batch of QR scans as present for the given date.
+
+    `scan_dates` optionally gives one date per scan (offline uploads
+    captured on earlier days) and overrides `date`.
+
+    Compact payload signatures are checked while parsing. Students are
+    resolved through the verification-key cache (misses with one query),
+    then locked and checked for existing records with one query each; the
+    new rows are inserted with a single bulk_create and read back with one
+    query, so a scan that lost a race is reported as a duplicate. Returns
+    one result dict per scan, in input order.
+    """
+    results = []
+    parsed = []
+
+    # Step 1: parse every scan, keep position for the result array
+    for index, qr_data in enumerate(scans):
+        try:
+            payload = parse_qr_data(qr_data)
+        except QRSignatureError:
+            results.append({"index": index, "status": SCAN_VERIFICATION_FAILED})
+            continue
+        except (AttributeError, ValueError):
+            results.append({"index": index, "status": SCAN_INVALID_FORMAT})
+            continue
+
+        result = {"index": index}
+        if payload.student_uid:
+            result["student_uid"] = payload.student_uid
+        results.append(result)
+        scan_date = scan_dates[index] if scan_dates else date
+        parsed.append((result, payload, scan_date))
+
+    # Step 2: resolve all students from the key cache, misses in one query
+    students = get_key_cache().get_many({payload_cache_key(payload) for _, payload, _ in parsed})
+
+    # Step 3: validate class and verification key
+    valid = []
+    for result, payload, scan_date in parsed:
+        student = students.get(payload_cache_key(payload))
+        if student is None:
+            result["status"] = SCAN_NOT_FOUND
+        elif str(student.class_id) != payload.class_id:
+            result["status"] = SCAN_CLASS_MISMATCH
+        elif not qr_key_matches(payload, student.verification_key):
+            result["status"] = SCAN_VERIFICATION_FAILED
+        elif not student.is_active:
+            result["status"] = SCAN_INACTIVE
+        else:
+            result["student_id"] = student.student_id
+            valid.append((result, student, scan_date))
+
+    if not valid:
+        return results
+
+    with transaction.atomic():
+        # Step 4: lock the students (in id order), so concurrent scans of the
+        # same student queue up here and the later one sees the earlier
+        # one's record below; students deleted meanwhile are not found
+        existing = set(
+            Student.objects.select_for_update().filter(
+                id__in={student.student_id for _, student, _ in valid}
+            ).order_by("id").values_list("id", flat=True)
+        )
+        already_marked = set(
+            AttendanceRecord.objects.filter(
+                student_id__in=existing,
+                date__in={scan_date for _, _, scan_date in valid}
+            ).values_list("student_id", "date")
+        )
+
+        # Step 5: build new rows, a repeated scan in the same batch is a duplicate
+        new_records = []
+        for result, student, scan_date in valid:
+            if student.student_id not in existing:
+                result["status"] = SCAN_NOT_FOUND
+                del result["student_id"]
+                continue
+            if (student.student_id, scan_date) in already_marked:
+                result["status"] = SCAN_DUPLICATE
+                continue
+
+            already_marked.add((student.student_id, scan_date))
+            new_records.append((result, AttendanceRecord(
+                student_id=student.student_id,
+                student_class_id=student.class_id,
+                date=scan_date,
+                status="P",
+                marked_by=user,
+                method=method
+            )))
+
+        if not new_records:
+            return results
+
+        # Step 6: single insert. Writers that do not take the student lock
+        # (finalization, manual edits) can still win the (student, date)
+        # constraint; ignore_conflicts drops those rows, so the rows that
+        # were really inserted are read back
+        AttendanceRecord.objects.bulk_create([record for _, record in new_records], ignore_conflicts=True)
+        inserted = set(
+            AttendanceRecord.objects.filter(
+                student_id__in={record.student_id for _, record in new_records},
+                date__in={record.date for _, record in new_records},
+                status="P",
+                marked_by=user,
+                method=method
+            ).values_list("student_id", "date")
+        )
+
+        changes = []
+        for result, record in new_records:
+            if (record.student_id, record.date) in inserted:
+                result["status"] = SCAN_CREATED
+                changes.append((record.student_id, record.student_class_id, record.date))
+            else:
+                result["status"] = SCAN_DUPLICATE
+        if changes:
+            attendance_changed.send(sender=AttendanceRecord, changes=changes)
+
+    return results
+
+
+def finalize_attendance(class_ids, user, date):
+    """
+    Marks every active student of the given classes without a record for
+    the date as absent.
+
+    Runs in one transaction with a fixed number of queries regardless of
+    how many classes or students are involved: one anti-join for the
+    missing students, one bulk insert, two grouped aggregates, plus the
+    attendance_changed receivers (rollups).
+    Returns {class_id: {"total_students", "present", "absent"}}.
+    """
+    with transaction.atomic():
+        active_students = Student.objects.filter(
+            student_class_id__in=class_ids,
+            is_active=True
+        )
+
+        # Step 1: anti-join - active students with no record for the date
+        missing = list(active_students.filter(
+            ~Exists(AttendanceRecord.objects.filter(student_id=OuterRef("pk"), date=date))
+        ).values_list("id", "student_class_id"))
+
+        # Step 2: insert all absentees at once
+        AttendanceRecord.objects.bulk_create(
+            [
+                AttendanceRecord(
+                    student_id=student_id,
+                    student_class_id=student_class_id,
+                    date=date,
+                    status="A",
+                    marked_by=user,
+                    method="AUTO"
+                )
+                for student_id, student_class_id in missing
+            ],
+            batch_size=1000,
+            ignore_conflicts=True
+        )
+        if missing:
+            attendance_changed.send(sender=AttendanceRecord, changes=[
+                (student_id, student_class_id, date) for student_id, student_class_id in missing
+            ])
+
+        # Step 3: present/absent per class from one grouped aggregate
+        summary = {
+            class_id: {"total_students": 0, "present": 0, "absent": 0}
+            for class_id in class_ids
+        }
+
+        by_class = summarize_attendance_by_class(AttendanceRecord.objects.filter(
+            student_class_id__in=class_ids,
+            date=date
+        ))
+
+        for class_id, counts in by_class.items():
+            summary[class_id]["present"] = counts["present"]
+            summary[class_id]["absent"] = counts["absent"]
+
+        totals = active_students.values("student_class_id").annotate(
+            total=Count("id")
+        ).order_by()
+
+        for row in totals:
+            summary[row["student_class_id"]]["total_students"] = row["total"]
+
+    return summary
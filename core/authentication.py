@@ -0,0 +1,169 @@
+import hmac
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.contrib.auth.models import AnonymousUser
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.authentication import BaseAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import SchoolClass
+from .qr_cache import LRUKeyBackend
+
+User = get_user_model()
+
+# Everything views read off request.user; the password hash is left
+# deferred so an accidental save() cannot overwrite it.
+USER_FIELDS = ("id", "username", "email", "first_name", "last_name", "role", "is_active", "is_deleted", "is_staff", "is_superuser")
+
+# request.auth of a request authenticated by MetricsScrapeAuthentication
+METRICS_SCRAPE = "metrics-scrape"
+
+# signing salt of the tickets that open /api/attendance/events/
+STREAM_TICKET_SALT = "core.attendance-events"
+
+
+class AttendanceTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Login tokens also carry the role, checked against the cached user state
+    by CachedJWTAuthentication. Deletion and class assignments are read
+    from that state, not from claims that would go stale with the token.
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token["role"] = user.role
+        return token
+
+
+class UserStateCache:
+    """
+    Short-TTL cache of the authentication-relevant User columns and
+    assigned class ids, by user id. Invalidated by core.signals on User
+    and SchoolClass writes; the TTL bounds staleness in other processes.
+    """
+
+    def __init__(self, max_entries=10000, timeout=30):
+        self.backend = LRUKeyBackend(max_entries=max_entries, timeout=timeout)
+
+    def get(self, user_id):
+        key = str(user_id)
+        state = self.backend.get_many([key]).get(key)
+        if state is None:
+            state = User.objects.filter(pk=user_id).values(*USER_FIELDS).first()
+            if state is None:
+                return None
+            state["class_ids"] = list(
+                SchoolClass.objects.filter(class_teacher_id=user_id).order_by("id").values_list("id", flat=True)
+            )
+            self.backend.set_many({key: state})
+        return state
+
+    def invalidate(self, *user_ids):
+        self.backend.delete_many([str(user_id) for user_id in user_ids if user_id is not None])
+
+    def clear(self):
+        self.backend.clear()
+
+
+_user_cache = None
+_user_cache_lock = threading.Lock()
+
+
+def get_user_cache():
+    global _user_cache
+    if _user_cache is None:
+        with _user_cache_lock:
+            if _user_cache is None:
+                _user_cache = UserStateCache(
+                    max_entries=getattr(settings, "AUTH_USER_CACHE_MAX_ENTRIES", 10000),
+                    timeout=getattr(settings, "AUTH_USER_CACHE_TIMEOUT", 30)
+                )
+    return _user_cache
+
+
+def user_from_state(state):
+    """
+    A User instance as if loaded from the database with only USER_FIELDS,
+    plus `class_ids`; related managers and FK assignment work as usual.
+    """
+    # from_db expects values in concrete field order
+    field_names = [field.attname for field in User._meta.concrete_fields if field.attname in USER_FIELDS]
+    user = User.from_db(DEFAULT_DB_ALIAS, field_names, [state[name] for name in field_names])
+    user.class_ids = state["class_ids"]
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication without the per-request User query: the user is
+    rebuilt from UserStateCache. Soft-deleted or deactivated users are
+    rejected, and so are tokens whose role claim no longer matches.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        state = get_user_cache().get(user_id)
+        if state is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+
+        if not state["is_active"] or state["is_deleted"]:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+
+        # tokens issued before the login claims existed carry no role
+        if "role" in validated_token and validated_token["role"] != state["role"]:
+            raise AuthenticationFailed("Role changed, log in again", code="role_changed")
+
+        return user_from_state(state)
+
+
+def issue_stream_ticket(user):
+    """
+    A signed ticket that opens the attendance event stream as `user`.
+    EventSource cannot send an Authorization header, so the ticket goes
+    in the query string instead of the access token: it is accepted by
+    no other endpoint and expires after STREAM_TICKET_MAX_AGE seconds,
+    so one leaked through an access log is of little use.
+    """
+    return signing.dumps({api_settings.USER_ID_CLAIM: user.pk, "role": user.role}, salt=STREAM_TICKET_SALT)
+
+
+def read_stream_ticket(ticket):
+    """
+    The claims of a ticket from issue_stream_ticket, in the shape
+    CachedJWTAuthentication.get_user expects of a validated token.
+    """
+    try:
+        return signing.loads(ticket, salt=STREAM_TICKET_SALT, max_age=getattr(settings, "STREAM_TICKET_MAX_AGE", 60))
+    except signing.SignatureExpired:
+        raise AuthenticationFailed("Stream ticket expired, request a new one", code="ticket_expired")
+    except signing.BadSignature:
+        raise AuthenticationFailed("Invalid stream ticket", code="ticket_invalid")
+
+
+class MetricsScrapeAuthentication(BaseAuthentication):
+    """
+    Accepts "Authorization: Bearer <METRICS_SCRAPE_TOKEN>" as an anonymous
+    scrape (request.auth == METRICS_SCRAPE) so Prometheus needs no JWT.
+    Any other header is left to the authenticators after it.
+    """
+
+    def authenticate(self, request):
+        token = getattr(settings, "METRICS_SCRAPE_TOKEN", "")
+        scheme, _, credentials = request.META.get("HTTP_AUTHORIZATION", "").partition(" ")
+        if token and scheme == "Bearer" and hmac.compare_digest(credentials.strip().encode(), token.encode()):
+            return AnonymousUser(), METRICS_SCRAPE
+        return None
+
+    def authenticate_header(self, request):
+        return "Bearer"
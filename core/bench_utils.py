@@ -0,0 +1,173 @@
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from .models import SchoolClass, Student, AttendanceRecord
+
+User = get_user_model()
+
+
+@contextmanager
+def bench_database(keepdb=False):
+    """
+    Runs the block against a throwaway test database (test_<NAME>) so
+    benchmarks never touch real data. Works for both MySQL and SQLite.
+    """
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+
+
+def school_days(days, end=None):
+    """
+    Returns the Monday-Saturday dates of the last `days` calendar days, oldest first.
+    """
+    end = end or timezone.now().date()
+    dates = [end - timedelta(days=offset) for offset in range(days)]
+    return sorted(d for d in dates if d.weekday() != 6)
+
+
+def seed_district(classes=100, students=5000, days=365, present_ratio=0.9, seed=42, batch_size=5000, end=None):
+    """
+    Seeds a synthetic district with bulk inserts: one teacher per class,
+    `students` spread evenly over `classes`, and one AttendanceRecord per
+    active student per school day for the last `days` days (up to `end`,
+    default today).
+
+    Returns {"teachers", "classes", "students", "days", "records"}.
+    """
+    rng = random.Random(seed)
+
+    User.objects.bulk_create(
+        [User(username=f"bench_teacher_{i}", role="TEACHER") for i in range(classes)],
+        batch_size=batch_size
+    )
+    teacher_ids = list(
+        User.objects.filter(username__startswith="bench_teacher_").order_by("id").values_list("id", flat=True)
+    )
+
+    SchoolClass.objects.bulk_create(
+        [
+            SchoolClass(class_name=f"B{i // 4 + 1}", section="ABCD"[i % 4], class_teacher_id=teacher_id)
+            for i, teacher_id in enumerate(teacher_ids)
+        ],
+        batch_size=batch_size
+    )
+    class_ids = list(SchoolClass.objects.filter(class_teacher_id__in=teacher_ids).order_by("id").values_list("id", flat=True))
+
+    Student.objects.bulk_create(
+        [
+            Student(
+                full_name=f"Bench Student {i}",
+                roll_no=i // len(class_ids) + 1,
+                student_class_id=class_ids[i % len(class_ids)],
+                verification_key=get_random_string(20),
+                is_active=rng.random() > 0.02
+            )
+            for i in range(students)
+        ],
+        batch_size=batch_size
+    )
+    student_rows = list(
+        Student.objects.filter(student_class_id__in=class_ids, is_active=True).values_list("id", "student_class_id")
+    )
+
+    dates = school_days(days, end=end)
+    records = 0
+    batch = []
+    for day in dates:
+        for student_id, class_id in student_rows:
+            batch.append(AttendanceRecord(
+                student_id=student_id,
+                student_class_id=class_id,
+                date=day,
+                status="P" if rng.random() < present_ratio else "A",
+                method="QR"
+            ))
+            if len(batch) >= batch_size:
+                AttendanceRecord.objects.bulk_create(batch)
+                records += len(batch)
+                batch = []
+    if batch:
+        AttendanceRecord.objects.bulk_create(batch)
+        records += len(batch)
+
+    return {
+        "teachers": len(teacher_ids),
+        "classes": len(class_ids),
+        "students": students,
+        "days": len(dates),
+        "records": records,
+    }
+
+
+def percentile(samples, pct):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    if not samples:
+        return 0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def time_call(func, repeat):
+    """
+    Calls `func` `repeat` times, returns latency stats in milliseconds.
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "runs": repeat,
+        "mean_ms": round(statistics.mean(samples), 3),
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+    }
+
+
+class RequestStats:
+    """
+    Collects latency, query count and status of driven requests.
+    """
+
+    def __init__(self):
+        self.samples = []
+        self.queries = []
+        self.statuses = {}
+        self.elapsed = 0.0
+
+    def add(self, ms, queries, status_code):
+        self.samples.append(ms)
+        self.queries.append(queries)
+        self.statuses[status_code] = self.statuses.get(status_code, 0) + 1
+
+    def summary(self):
+        if not self.samples:
+            return {"requests": 0}
+        return {
+            "requests": len(self.samples),
+            "throughput_rps": round(len(self.samples) / self.elapsed, 1) if self.elapsed else None,
+            "mean_ms": round(statistics.mean(self.samples), 3),
+            "p50_ms": round(percentile(self.samples, 50), 3),
+            "p95_ms": round(percentile(self.samples, 95), 3),
+            "p99_ms": round(percentile(self.samples, 99), 3),
+            "queries_mean": round(statistics.mean(self.queries), 2),
+            "queries_max": max(self.queries),
+            "statuses": {str(code): count for code, count in sorted(self.statuses.items())},
+        }
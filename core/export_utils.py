@@ -0,0 +1,174 @@
+import csv
+import tempfile
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.db.models import FilteredRelation, Q
+
+from .models import Student
+
+EXPORT_FORMATS = ("csv", "xlsx")
+EMPTY_CELL = "-"
+
+
+class ExportError(ValueError):
+    pass
+
+
+class Echo:
+    """
+    File-like object whose write() hands the line back, so csv.writer
+    output can be yielded straight into a StreamingHttpResponse.
+    """
+
+    def write(self, value):
+        return value
+
+
+def date_columns(date_from, date_to):
+    max_days = getattr(settings, "EXPORT_MAX_DAYS", 366)
+    if date_to < date_from:
+        raise ExportError("from must not be after to")
+    days = (date_to - date_from).days + 1
+    if days > max_days:
+        raise ExportError(f"Date range may cover at most {max_days} days")
+    return [date_from + timedelta(days=offset) for offset in range(days)]
+
+
+def register_entries(date_from, date_to, class_ids=None):
+    """
+    Yields (student_id, class label, roll no, name, cells, present, absent)
+    per student for the date range, `cells` holding one P/A/- per day.
+
+    Built from a single ordered scan of students LEFT JOINed to their
+    records in the range, read with .iterator() and grouped per student,
+    so only one student's row is held in memory at a time. Inactive
+    students are included only when they have records in the range.
+    """
+    dates = date_columns(date_from, date_to)
+    index = {day: position for position, day in enumerate(dates)}
+
+    students = Student.objects.annotate(
+        period_records=FilteredRelation(
+            "attendance_records",
+            condition=Q(attendance_records__date__range=[date_from, date_to])
+        )
+    ).filter(Q(is_active=True) | Q(period_records__id__isnull=False))
+    if class_ids:
+        students = students.filter(student_class_id__in=class_ids)
+
+    scan = students.order_by(
+        "student_class__class_name", "student_class__section", "student_class_id", "roll_no", "id", "period_records__date"
+    ).values_list(
+        "id", "student_class__class_name", "student_class__section", "roll_no", "full_name",
+        "period_records__date", "period_records__status"
+    ).iterator(chunk_size=getattr(settings, "STREAM_CHUNK_SIZE", 1000))
+
+    for student_id, rows in groupby(scan, key=lambda row: row[0]):
+        cells = [EMPTY_CELL] * len(dates)
+        present = absent = 0
+        for _, class_name, section, roll_no, full_name, date, record_status in rows:
+            if date is None:
+                continue
+            cells[index[date]] = record_status
+            if record_status == "P":
+                present += 1
+            elif record_status == "A":
+                absent += 1
+
+        class_label = f"{class_name} {section or ''}".strip()
+        yield student_id, class_label, roll_no, full_name, cells, present, absent
+
+
+def register_rows(date_from, date_to, class_ids=None):
+    """
+    Yields one export row per student for the date range:
+    [class, roll no, name, one P/A/- cell per day, present, absent].
+    """
+    for _, class_label, roll_no, full_name, cells, present, absent in register_entries(date_from, date_to, class_ids):
+        yield [class_label, roll_no, full_name, *cells, present, absent]
+
+
+def register_matrix(class_id, date_from, date_to):
+    """
+    The register of one class as a compact matrix: per student a `marks`
+    string with one P/A/- character per day from date_from, plus
+    per-student and per-day totals. One query, see register_entries.
+    """
+    days = len(date_columns(date_from, date_to))
+    day_present, day_absent = [0] * days, [0] * days
+    students = []
+
+    for student_id, _, roll_no, full_name, cells, present, absent in register_entries(date_from, date_to, [class_id]):
+        for position, cell in enumerate(cells):
+            if cell == "P":
+                day_present[position] += 1
+            elif cell == "A":
+                day_absent[position] += 1
+        students.append({
+            "id": student_id,
+            "roll_no": roll_no,
+            "name": full_name,
+            "marks": "".join(cells),
+            "present": present,
+            "absent": absent,
+        })
+
+    return {
+        "class_id": class_id,
+        "from": str(date_from),
+        "to": str(date_to),
+        "students": students,
+        "day_totals": {"present": day_present, "absent": day_absent},
+        "totals": {"present": sum(day_present), "absent": sum(day_absent)},
+    }
+
+
+def register_header(date_from, date_to):
+    return ["Class", "Roll No", "Student", *[day.isoformat() for day in date_columns(date_from, date_to)], "Present", "Absent"]
+
+
+def iter_register_csv(date_from, date_to, class_ids=None):
+    # header is built eagerly so range errors surface before streaming starts
+    header = register_header(date_from, date_to)
+    writer = csv.writer(Echo())
+
+    def lines():
+        yield writer.writerow(header)
+        for row in register_rows(date_from, date_to, class_ids):
+            yield writer.writerow(row)
+
+    return lines()
+
+
+def iter_register_xlsx(date_from, date_to, class_ids=None):
+    """
+    XLSX cannot be emitted before the zip directory is written, so rows go
+    through an openpyxl write-only workbook (spooled to disk, not kept in
+    memory) and the finished file is then streamed in chunks.
+    """
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ExportError("XLSX export requires openpyxl, use output=csv instead")
+
+    header = register_header(date_from, date_to)
+
+    def chunks():
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("Register")
+        sheet.append(header)
+        for row in register_rows(date_from, date_to, class_ids):
+            sheet.append(row)
+
+        with tempfile.TemporaryFile() as output:
+            workbook.save(output)
+            output.seek(0)
+            while True:
+                chunk = output.read(64 * 1024)
+                if not chunk:
+                    break
+                yield chunk
+
+    return chunks()
@@ -0,0 +1,163 @@
+import codecs
+import csv
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.crypto import get_random_string
+
+from .models import SchoolClass, Student
+from .qr_jobs import enqueue_qr_generation
+from .teacher_scope import get_teacher_scope_cache
+from .serializers import StudentImportSerializer
+
+IMPORT_FIELDS = ("full_name", "roll_no", "student_class", "guardian_mobile", "is_active")
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def decoded_lines(fileobj):
+    fileobj.seek(0)
+    return codecs.iterdecode(fileobj, "utf-8-sig")
+
+
+def iter_csv_rows(fileobj):
+    """
+    Decodes and parses the whole file once before returning the rows, so an
+    undecodable or malformed file is refused before the first chunk is
+    committed. Both passes stream the file.
+    """
+    reader = csv.reader(decoded_lines(fileobj))
+    try:
+        for _ in reader:
+            pass
+    except UnicodeDecodeError:
+        raise ImportFormatError(f"CSV must be UTF-8 encoded (invalid text after line {reader.line_num})")
+    except csv.Error as exc:
+        raise ImportFormatError(f"Malformed CSV at line {reader.line_num}: {exc}")
+    return csv.DictReader(decoded_lines(fileobj))
+
+
+def open_workbook(fileobj):
+    from openpyxl import load_workbook
+
+    fileobj.seek(0)
+    return load_workbook(fileobj, read_only=True, data_only=True)
+
+
+def iter_xlsx_rows(fileobj):
+    """
+    Reads the whole sheet once before returning the rows, so a corrupt
+    workbook is refused before the first chunk is committed; the rows are
+    then streamed from a second read.
+    """
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        raise ImportFormatError("XLSX import requires openpyxl, upload CSV instead")
+
+    try:
+        workbook = open_workbook(fileobj)
+        try:
+            for _ in workbook.active.iter_rows(values_only=True):
+                pass
+        finally:
+            workbook.close()
+    except Exception as exc:
+        # openpyxl surfaces damaged files as zip, XML, key or value errors
+        raise ImportFormatError("Could not read the XLSX file, upload a valid workbook") from exc
+
+    return xlsx_rows(open_workbook(fileobj))
+
+
+def xlsx_rows(workbook):
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(value or "").strip() for value in next(rows, ())]
+        for values in rows:
+            yield dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def iter_import_rows(fileobj, filename):
+    """
+    Returns an iterator of one dict per data row, streaming the file rather
+    than loading it. Raises ImportFormatError for unreadable files.
+    """
+    if filename.lower().endswith(".xlsx"):
+        return iter_xlsx_rows(fileobj)
+    if filename.lower().endswith(".csv"):
+        return iter_csv_rows(fileobj)
+    raise ImportFormatError("Unsupported file type, use .csv or .xlsx")
+
+
+def clean_row(row):
+    """
+    Keeps the known columns and drops empty cells so optional fields fall
+    back to their defaults.
+    """
+    cleaned = {}
+    for key, value in row.items():
+        key = (key or "").strip().lower()
+        if key not in IMPORT_FIELDS or value is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+            if not value:
+                continue
+        cleaned[key] = value
+    return cleaned
+
+
+def import_students(rows, chunk_size=None):
+    """
+    Validates rows with StudentSerializer rules and inserts the valid ones
+    in chunks with bulk_create, queueing their QR images as one batch job
+    per chunk. Memory is bounded by the chunk size and the capped error list.
+
+    Returns {"created", "failed", "errors": [{"row", "errors"}], "errors_truncated"}.
+    """
+    chunk_size = chunk_size or getattr(settings, "IMPORT_CHUNK_SIZE", 500)
+    max_errors = getattr(settings, "IMPORT_MAX_ERRORS", 1000)
+
+    classes = SchoolClass.objects.in_bulk()
+    report = {"created": 0, "failed": 0, "errors": [], "errors_truncated": False}
+    chunk = []
+
+    def flush():
+        with transaction.atomic():
+            Student.objects.bulk_create(chunk)
+            # MySQL does not return primary keys from bulk_create
+            student_ids = Student.objects.filter(
+                student_uid__in=[student.student_uid for student in chunk]
+            ).values_list("id", flat=True)
+            enqueue_qr_generation(list(student_ids))
+        # bulk_create sends no signals; class student counts changed
+        get_teacher_scope_cache().invalidate(
+            *{classes[student.student_class_id].class_teacher_id for student in chunk}
+        )
+        report["created"] += len(chunk)
+        chunk.clear()
+
+    # header is row 1, data starts at row 2
+    for row_number, row in enumerate(rows, start=2):
+        serializer = StudentImportSerializer(data=clean_row(row), context={"classes": classes})
+
+        if not serializer.is_valid():
+            report["failed"] += 1
+            if len(report["errors"]) < max_errors:
+                report["errors"].append({"row": row_number, "errors": serializer.errors})
+            else:
+                report["errors_truncated"] = True
+            continue
+
+        chunk.append(Student(**serializer.validated_data, verification_key=get_random_string(20)))
+        if len(chunk) >= chunk_size:
+            flush()
+
+    if chunk:
+        flush()
+
+    return report
@@ -0,0 +1,148 @@
+import json
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.bench_utils import RequestStats, bench_database, seed_district
+from core.models import SchoolClass, Student, User
+from core.qr_cache import reset_key_cache
+from core.rollups import rebuild_daily_summaries
+from core.utils import build_qr_payload
+
+
+class Command(BaseCommand):
+    help = (
+        "Reproducible end-to-end benchmark of the attendance API in a throwaway "
+        "test database: seeds a district with bulk inserts, then drives the real "
+        "views through the DRF test client (morning scan burst, finalization of "
+        "every class, dashboard/report polling) and reports throughput, latency "
+        "percentiles and queries per request for each endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--classes", type=int, default=20)
+        parser.add_argument("--students", type=int, default=1000)
+        parser.add_argument("--days", type=int, default=90, help="Days of attendance history before today")
+        parser.add_argument("--scan-ratio", type=float, default=0.9, help="Share of active students scanned in the morning burst")
+        parser.add_argument("--poll-rounds", type=int, default=3, help="Dashboard/report polling rounds after finalization")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--json", dest="json_path", help="Also write the report to this file")
+
+    def handle(self, *args, **options):
+        if options["classes"] < 1 or options["students"] < options["classes"]:
+            raise CommandError("Need at least one class and one student per class")
+        if not 0 < options["scan_ratio"] <= 1:
+            raise CommandError("--scan-ratio must be in (0, 1]")
+
+        today = timezone.now().date()
+        with bench_database():
+            started = time.perf_counter()
+            # history ends yesterday, so today's scans are all first scans
+            seeded = seed_district(
+                classes=options["classes"], students=options["students"], days=options["days"],
+                seed=options["seed"], end=today - timedelta(days=1)
+            )
+            if options["days"]:
+                rebuild_daily_summaries(today - timedelta(days=options["days"]), today - timedelta(days=1))
+            seeded["seconds"] = round(time.perf_counter() - started, 2)
+
+            reset_key_cache()
+            phases = self.run_phases(options)
+
+        report = {
+            "vendor": connection.vendor,
+            "seeded": seeded,
+            "phases": {
+                phase: {endpoint: stats.summary() for endpoint, stats in endpoints.items()}
+                for phase, endpoints in phases.items()
+            },
+        }
+
+        for phase, endpoints in report["phases"].items():
+            self.stdout.write(self.style.MIGRATE_HEADING(phase))
+            for endpoint, result in endpoints.items():
+                self.stdout.write(
+                    f"  {endpoint:<40} n={result['requests']:<6} {result['throughput_rps']} req/s  "
+                    f"p50={result['p50_ms']}ms  p95={result['p95_ms']}ms  p99={result['p99_ms']}ms  "
+                    f"queries={result['queries_mean']} (max {result['queries_max']})"
+                )
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as fh:
+                json.dump(report, fh, indent=2)
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
+
+    def run_phases(self, options):
+        admin = User.objects.create(username="bench_admin", role="ADMIN")
+        classes = list(SchoolClass.objects.order_by("id").values_list("id", "class_teacher_id"))
+        tokens = {
+            user.id: f"Bearer {AccessToken.for_user(user)}"
+            for user in User.objects.filter(id__in=[admin.id] + [teacher_id for _, teacher_id in classes])
+        }
+        admin_auth = tokens[admin.id]
+        teacher_auth = {class_id: tokens[teacher_id] for class_id, teacher_id in classes}
+
+        client = APIClient(raise_request_exception=False)
+        phases = {"scan_burst": {}, "finalize": {}, "polling": {}}
+
+        # Morning burst: each class teacher scans a share of their students, in roll order
+        students = list(Student.objects.filter(is_active=True).order_by("roll_no", "id"))
+        scanned = students[:int(len(students) * options["scan_ratio"])]
+        self.drive(phases["scan_burst"], [
+            (client.post, "/api/attendance/mark/", {"qr_data": build_qr_payload(student)}, teacher_auth[student.student_class_id])
+            for student in scanned
+        ])
+
+        # Every teacher finalizes their class, marking the rest absent
+        self.drive(phases["finalize"], [
+            (client.post, f"/api/attendance/finalize/{class_id}/", None, teacher_auth[class_id])
+            for class_id, _ in classes
+        ])
+
+        # Dashboards and reports refreshing; later rounds exercise the caches
+        for _ in range(options["poll_rounds"]):
+            calls = [
+                (client.get, "/api/dashboard/admin/overview/", None, admin_auth),
+                (client.get, "/api/dashboard/admin/classwise-today/", None, admin_auth),
+            ]
+            for class_id, _ in classes:
+                auth = teacher_auth[class_id]
+                calls += [
+                    (client.get, "/api/dashboard/teacher/overview/", None, auth),
+                    (client.get, "/api/dashboard/teacher/absent-today/", None, auth),
+                    (client.get, f"/api/attendance/today/{class_id}/", None, auth),
+                    (client.get, f"/api/reports/daily/{class_id}/", None, auth),
+                    (client.get, f"/api/reports/weekly/{class_id}/", None, auth),
+                    (client.get, f"/api/reports/monthly/{class_id}/", None, auth),
+                ]
+            self.drive(phases["polling"], calls)
+
+        return phases
+
+    @staticmethod
+    def drive(results, calls):
+        """
+        Runs the calls one after another, recording each under its resolved
+        route. Throughput is requests per second of time spent
+        inside that endpoint.
+        """
+        for method, url, data, auth in calls:
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = method(url, data, format="json", HTTP_AUTHORIZATION=auth)
+                ms = (time.perf_counter() - start) * 1000
+
+            match = getattr(response, "resolver_match", None)
+            key = match.route if match else url
+            stats = results.get(key)
+            if stats is None:
+                stats = results[key] = RequestStats()
+            stats.add(ms, len(queries), response.status_code)
+            stats.elapsed += ms / 1000
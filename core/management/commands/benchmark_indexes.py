@@ -0,0 +1,106 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Exists, OuterRef
+
+from core.bench_utils import bench_database, seed_district, time_call
+from core.models import Student, AttendanceRecord
+from core.report_utils import get_week_range, summarize_attendance
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a synthetic district into a throwaway test database and reports "
+        "query plans and latency of the hot AttendanceRecord/Student filters "
+        "with the composite indexes dropped (before) and in place (after)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--classes", type=int, default=100)
+        parser.add_argument("--students", type=int, default=5000)
+        parser.add_argument("--days", type=int, default=365)
+        parser.add_argument("--repeat", type=int, default=50, help="Runs per query and state")
+        parser.add_argument("--json", dest="json_path", help="Also write the report to this file")
+
+    def handle(self, *args, **options):
+        with bench_database():
+            self.stdout.write("Seeding...")
+            seeded = seed_district(
+                classes=options["classes"],
+                students=options["students"],
+                days=options["days"]
+            )
+            self.stdout.write(json.dumps(seeded))
+
+            queries = self.build_queries()
+
+            self.drop_indexes()
+            before = self.measure(queries, options["repeat"])
+
+            self.create_indexes()
+            after = self.measure(queries, options["repeat"])
+
+        report = {"vendor": connection.vendor, "seeded": seeded, "queries": {}}
+        for name in queries:
+            report["queries"][name] = {"before": before[name], "after": after[name]}
+
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for label, result in (("before", before[name]), ("after", after[name])):
+                self.stdout.write(f"  {label}: p50={result['latency']['p50_ms']}ms p95={result['latency']['p95_ms']}ms")
+                for line in result["plan"].splitlines():
+                    self.stdout.write(f"    {line}")
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as fh:
+                json.dump(report, fh, indent=2)
+
+    def build_queries(self):
+        """
+        One callable per access pattern used by core/views.py, keyed by name.
+        Each returns the queryset (for EXPLAIN) and a function that runs it.
+        """
+        sample = AttendanceRecord.objects.order_by("-date").values("student_class_id", "student_id", "date").first()
+        class_id, student_id, day = sample["student_class_id"], sample["student_id"], sample["date"]
+        week_start, week_end = get_week_range(day)
+
+        class_day = AttendanceRecord.objects.filter(student_class_id=class_id, date=day)
+        class_week = AttendanceRecord.objects.filter(student_class_id=class_id, date__range=[week_start, week_end])
+        class_day_absent = class_day.filter(status="A")
+        school_day_absent = AttendanceRecord.objects.filter(date=day, status="A")
+        student_day = AttendanceRecord.objects.filter(student_id=student_id, date=day)
+        missing = Student.objects.filter(student_class_id=class_id, is_active=True).filter(
+            ~Exists(AttendanceRecord.objects.filter(student_id=OuterRef("pk"), date=day))
+        )
+
+        return {
+            "class_date_records": (class_day, lambda: list(class_day.all())),
+            "class_date_summary": (class_day, lambda: summarize_attendance(class_day)),
+            "class_week_summary": (class_week, lambda: summarize_attendance(class_week)),
+            "class_date_absent": (class_day_absent, lambda: list(class_day_absent.all())),
+            "date_status_count": (school_day_absent, lambda: school_day_absent.count()),
+            "student_date_lookup": (student_day, lambda: student_day.exists()),
+            "finalize_missing_students": (missing, lambda: list(missing.values_list("id", flat=True))),
+        }
+
+    def measure(self, queries, repeat):
+        return {
+            name: {"plan": queryset.explain(), "latency": time_call(run, repeat)}
+            for name, (queryset, run) in queries.items()
+        }
+
+    def model_indexes(self):
+        return [(model, index) for model in (AttendanceRecord, Student) for index in model._meta.indexes]
+
+    def drop_indexes(self):
+        with connection.schema_editor() as editor:
+            for model, index in self.model_indexes():
+                editor.remove_index(model, index)
+
+    def create_indexes(self):
+        with connection.schema_editor() as editor:
+            for model, index in self.model_indexes():
+                editor.add_index(model, index)
+        if connection.vendor == "mysql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE TABLE core_attendancerecord, core_student")
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from asgiref.sync import sync_to_async
+from django.db import connection, connections
+from django.test import AsyncClient, Client
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.bench_utils import bench_database, percentile, seed_district
+from core.models import Student, User
+from core.qr_cache import reset_key_cache
+from core.utils import build_qr_payload
+
+SYNC_URL = "/api/attendance/mark/"
+ASYNC_URL = "/api/async/attendance/mark/"
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests the QR scan path in a throwaway test database: the sync "
+        "APIView through the WSGI handler (one thread per concurrent client) "
+        "against the async view through the ASGI handler (one task per "
+        "client). Reports throughput and latency percentiles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--classes", type=int, default=20)
+        parser.add_argument("--requests", type=int, default=1000, help="Scans per run, each for a different student")
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--json", dest="json_path", help="Also write the report to this file")
+
+    def handle(self, *args, **options):
+        requests, concurrency = options["requests"], options["concurrency"]
+        if requests < 1 or concurrency < 1:
+            raise CommandError("--requests and --concurrency must be positive")
+
+        if connection.vendor == "sqlite":
+            self.stderr.write(self.style.WARNING(
+                "SQLite serializes writers, concurrent scans will hit table locks; run against MySQL for real numbers."
+            ))
+
+        with bench_database():
+            # every scan is a first scan of the day: half the students per run
+            seeded = seed_district(classes=options["classes"], students=int(requests * 2.1), days=0)
+            admin = User.objects.create(username="bench_admin", role="ADMIN")
+            auth = f"Bearer {AccessToken.for_user(admin)}"
+
+            payloads = [build_qr_payload(student) for student in Student.objects.filter(is_active=True).order_by("id")]
+            if len(payloads) < 2 * requests:
+                raise CommandError("Not enough active students seeded")
+
+            reset_key_cache()
+            wsgi = self.run_wsgi(payloads[:requests], auth, concurrency)
+            reset_key_cache()
+            asgi = asyncio.run(self.run_asgi(payloads[requests:2 * requests], auth, concurrency))
+
+        report = {
+            "vendor": connection.vendor,
+            "seeded": seeded,
+            "requests": requests,
+            "concurrency": concurrency,
+            "wsgi_sync": wsgi,
+            "asgi_async": asgi,
+        }
+
+        for label, result in (("WSGI + sync APIView", wsgi), ("ASGI + async view", asgi)):
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(
+                f"  {result['throughput_rps']} req/s  p50={result['p50_ms']}ms  "
+                f"p99={result['p99_ms']}ms  errors={result['errors']}"
+            )
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as fh:
+                json.dump(report, fh, indent=2)
+
+    @staticmethod
+    def summarize(samples, statuses, elapsed):
+        return {
+            "throughput_rps": round(len(samples) / elapsed, 1),
+            "mean_ms": round(statistics.mean(samples), 3),
+            "p50_ms": round(percentile(samples, 50), 3),
+            "p95_ms": round(percentile(samples, 95), 3),
+            "p99_ms": round(percentile(samples, 99), 3),
+            "errors": sum(1 for code in statuses if code != 201),
+        }
+
+    def run_wsgi(self, payloads, auth, concurrency):
+        def scan(qr_data):
+            client = Client(raise_request_exception=False)
+            start = time.perf_counter()
+            response = client.post(SYNC_URL, {"qr_data": qr_data}, content_type="application/json", headers={"Authorization": auth})
+            return (time.perf_counter() - start) * 1000, response.status_code
+
+        # the barrier makes every pool thread run exactly one close
+        barrier = threading.Barrier(concurrency)
+
+        def close_connections(_):
+            barrier.wait()
+            connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(scan, payloads))
+            elapsed = time.perf_counter() - started
+            list(pool.map(close_connections, range(concurrency)))
+
+        return self.summarize([ms for ms, _ in results], [code for _, code in results], elapsed)
+
+    async def run_asgi(self, payloads, auth, concurrency):
+        client = AsyncClient(raise_request_exception=False)
+        limit = asyncio.Semaphore(concurrency)
+
+        async def scan(qr_data):
+            async with limit:
+                start = time.perf_counter()
+                response = await client.post(ASYNC_URL, {"qr_data": qr_data}, content_type="application/json", headers={"Authorization": auth})
+                return (time.perf_counter() - start) * 1000, response.status_code
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*[scan(qr_data) for qr_data in payloads])
+        elapsed = time.perf_counter() - started
+        await sync_to_async(connections.close_all)()
+
+        return self.summarize([ms for ms, _ in results], [code for _, code in results], elapsed)
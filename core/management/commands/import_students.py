@@ -0,0 +1,23 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.import_utils import ImportFormatError, import_students, iter_import_rows
+
+
+class Command(BaseCommand):
+    help = "Imports students from a CSV or XLSX file (columns: full_name, roll_no, student_class, guardian_mobile, is_active)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--chunk-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["path"], "rb") as fh:
+                report = import_students(iter_import_rows(fh, options["path"]), chunk_size=options["chunk_size"])
+        except (OSError, ImportFormatError) as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Created {report['created']} students, {report['failed']} rows failed"))
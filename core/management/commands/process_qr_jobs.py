@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.qr_jobs import process_pending_jobs, requeue_stale_jobs
+
+
+class Command(BaseCommand):
+    help = "Renders pending student QR images (jobs left over after a restart, or a dedicated worker with --loop)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new jobs")
+        parser.add_argument("--interval", type=float, default=5, help="Seconds between polls with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            requeued = requeue_stale_jobs()
+            if requeued:
+                self.stdout.write(f"Requeued {requeued} stale jobs")
+
+            total_done = total_failed = 0
+            while True:
+                done, failed = process_pending_jobs(limit=options["batch_size"])
+                total_done += done
+                total_failed += failed
+                if not done and not failed:
+                    break
+
+            if total_done or total_failed:
+                self.stdout.write(self.style.SUCCESS(f"Rendered {total_done} QR codes, {total_failed} failed"))
+
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
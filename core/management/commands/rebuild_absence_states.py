@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.absenteeism import rebuild_absence_states
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the per-student absenteeism state (absence streak and 30-day "
+        "window) from the raw attendance records, a batch of students at a time, "
+        "committing each batch. Run once after migrating; attendance writes keep "
+        "it up to date afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Students per batch and transaction")
+
+    def handle(self, *args, **options):
+        written = rebuild_absence_states(batch_size=options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt absence state for {written} students"))
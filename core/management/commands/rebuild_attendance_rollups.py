@@ -0,0 +1,30 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.rollups import rebuild_daily_summaries
+
+
+class Command(BaseCommand):
+    help = "Rebuilds DailyClassAttendanceSummary rollups for a date range from the raw attendance records."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from", required=True, help="YYYY-MM-DD")
+        parser.add_argument("--to", dest="date_to", required=True, help="YYYY-MM-DD")
+        parser.add_argument("--class-id", dest="class_ids", type=int, action="append", help="Limit to a class, repeatable")
+
+    def handle(self, *args, **options):
+        try:
+            date_from = datetime.strptime(options["date_from"], "%Y-%m-%d").date()
+            date_to = datetime.strptime(options["date_to"], "%Y-%m-%d").date()
+        except ValueError:
+            raise CommandError("Invalid date format. Use YYYY-MM-DD")
+
+        if date_from > date_to:
+            raise CommandError("--from must not be after --to")
+
+        with transaction.atomic():
+            written = rebuild_daily_summaries(date_from, date_to, options["class_ids"])
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} daily rollup rows from {date_from} to {date_to}"))
@@ -0,0 +1,126 @@
+import bisect
+import math
+import threading
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 10, 15, 20, 30, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# name -> (help, buckets); every route gets one histogram of each
+HISTOGRAMS = {
+    "request_duration_seconds": ("Request latency", LATENCY_BUCKETS),
+    "db_queries": ("Database queries per request", QUERY_BUCKETS),
+    "db_time_seconds": ("Time spent in SQL per request", LATENCY_BUCKETS),
+    "render_seconds": ("Response rendering (serialization) time", LATENCY_BUCKETS),
+    "response_size_bytes": ("Response body size", SIZE_BUCKETS),
+}
+QUANTILES = (0.5, 0.95, 0.99)
+PREFIX = "attendance_"
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram: observe() is a bisect and two additions, so it
+    is cheap enough to run on every request.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """
+        Upper bound of the bucket holding the q-th observation, so the
+        estimate never understates; observations past the last bucket
+        report +Inf, as the +Inf bucket Prometheus sees.
+        """
+        if not self.count:
+            return 0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return math.inf
+
+
+class MetricsRegistry:
+    """
+    Per-process request metrics by route. With several workers each one
+    exposes its own numbers; Prometheus sums them across scrape targets.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+        self.budget_exceeded = {}
+
+    def record(self, route, observations, over_budget=False):
+        with self.lock:
+            histograms = self.routes.get(route)
+            if histograms is None:
+                histograms = self.routes[route] = {name: Histogram(buckets) for name, (_, buckets) in HISTOGRAMS.items()}
+            for name, value in observations.items():
+                if value is not None:
+                    histograms[name].observe(value)
+            if over_budget:
+                self.budget_exceeded[route] = self.budget_exceeded.get(route, 0) + 1
+
+    def reset(self):
+        with self.lock:
+            self.routes.clear()
+            self.budget_exceeded.clear()
+
+    def render_prometheus(self):
+        """
+        Prometheus text exposition format 0.0.4.
+        """
+        lines = []
+        with self.lock:
+            routes = sorted(self.routes.items())
+            for name, (help_text, buckets) in HISTOGRAMS.items():
+                metric = PREFIX + name
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} histogram")
+                for route, histograms in routes:
+                    histogram = histograms[name]
+                    label = f'route="{escape_label(route)}"'
+                    cumulative = 0
+                    for bound, count in zip(buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{metric}_bucket{{{label},le="{bound}"}} {cumulative}')
+                    lines.append(f'{metric}_bucket{{{label},le="+Inf"}} {histogram.count}')
+                    lines.append(f"{metric}_sum{{{label}}} {histogram.sum}")
+                    lines.append(f"{metric}_count{{{label}}} {histogram.count}")
+
+                quantile_metric = f"{metric}_quantile"
+                lines.append(f"# HELP {quantile_metric} {help_text}, p50/p95/p99 as bucket upper bounds")
+                lines.append(f"# TYPE {quantile_metric} gauge")
+                for route, histograms in routes:
+                    for q in QUANTILES:
+                        value = histograms[name].quantile(q)
+                        value = "+Inf" if value == math.inf else round(value, 6)
+                        lines.append(f'{quantile_metric}{{route="{escape_label(route)}",quantile="{q}"}} {value}')
+
+            metric = PREFIX + "query_budget_exceeded_total"
+            lines.append(f"# HELP {metric} Requests that ran more queries than the budget")
+            lines.append(f"# TYPE {metric} counter")
+            for route, count in sorted(self.budget_exceeded.items()):
+                lines.append(f'{metric}{{route="{escape_label(route)}"}} {count}')
+
+        return "\n".join(lines) + "\n"
+
+
+def escape_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = MetricsRegistry()
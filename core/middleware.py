@@ -0,0 +1,128 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from .metrics import registry
+
+logger = logging.getLogger("core.metrics")
+
+
+class QueryCounter:
+    """
+    connection.execute_wrapper hook counting queries and SQL time.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+
+class RequestMetricsMiddleware:
+    """
+    Records per request: route, query count, SQL time, render time of
+    DRF/template responses and response size, into core.metrics.registry.
+    Requests running more than METRICS_QUERY_BUDGET queries (or the
+    route's entry in METRICS_QUERY_BUDGETS) are logged and counted.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, "METRICS_ENABLED", True)
+        self.budget = getattr(settings, "METRICS_QUERY_BUDGET", 30)
+        self.route_budgets = getattr(settings, "METRICS_QUERY_BUDGETS", {})
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        counter, start = QueryCounter(), time.perf_counter()
+        with self.track_queries(counter):
+            response = self.get_response(request)
+        self.record(request, response, counter, start)
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        # connections are per thread: the async ORM runs queries in the
+        # request's thread-sensitive executor, so the hook goes there
+        counter, start = QueryCounter(), time.perf_counter()
+        await sync_to_async(self.install)(counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(self.uninstall)(counter)
+        self.record(request, response, counter, start)
+        return response
+
+    @staticmethod
+    def track_queries(counter):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(counter))
+        return stack
+
+    @staticmethod
+    def install(counter):
+        for connection in connections.all():
+            connection.execute_wrappers.append(counter)
+
+    @staticmethod
+    def uninstall(counter):
+        for connection in connections.all():
+            if counter in connection.execute_wrappers:
+                connection.execute_wrappers.remove(counter)
+
+    def process_template_response(self, request, response):
+        # runs right before render(); the callback fires right after it
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._metrics_render_seconds = time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def record(self, request, response, counter, start):
+        match = getattr(request, "resolver_match", None)
+        route = match.route if match else "unmatched"
+
+        if response.streaming:
+            size = None
+        else:
+            size = len(response.content)
+
+        budget = self.route_budgets.get(route, self.budget)
+        over_budget = counter.count > budget
+        if over_budget:
+            logger.warning(
+                "Query budget exceeded: %s %s ran %d queries (budget %d, %.1f ms SQL)",
+                request.method, route, counter.count, budget, counter.seconds * 1000
+            )
+
+        registry.record(route, {
+            "request_duration_seconds": time.perf_counter() - start,
+            "db_queries": counter.count,
+            "db_time_seconds": counter.seconds,
+            "render_seconds": getattr(request, "_metrics_render_seconds", None),
+            "response_size_bytes": size,
+        }, over_budget=over_budget)
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_user_is_deleted'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['student_class', 'date', 'status'], name='att_class_date_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['date', 'status'], name='att_date_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['student_class', 'is_active'], name='student_class_active_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_daily_summaries(apps, schema_editor):
+    AttendanceRecord = apps.get_model('core', 'AttendanceRecord')
+    DailyClassAttendanceSummary = apps.get_model('core', 'DailyClassAttendanceSummary')
+
+    rows = AttendanceRecord.objects.values('student_class_id', 'date').annotate(
+        present=Count('id', filter=Q(status='P')),
+        absent=Count('id', filter=Q(status='A')),
+        total=Count('id'),
+    ).order_by()
+
+    batch = []
+    for row in rows.iterator(chunk_size=2000):
+        batch.append(DailyClassAttendanceSummary(**row))
+        if len(batch) >= 2000:
+            DailyClassAttendanceSummary.objects.bulk_create(batch)
+            batch = []
+    DailyClassAttendanceSummary.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_attendance_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyClassAttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('absent', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student_class', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to='core.schoolclass')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='daily_summary_date_idx')],
+                'unique_together': {('student_class', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_student_counters(apps, schema_editor):
+    AttendanceRecord = apps.get_model('core', 'AttendanceRecord')
+    StudentMonthlyAttendance = apps.get_model('core', 'StudentMonthlyAttendance')
+    StudentAttendanceStats = apps.get_model('core', 'StudentAttendanceStats')
+
+    rows = AttendanceRecord.objects.annotate(month=TruncMonth('date')).values('student_id', 'month').annotate(
+        present=Count('id', filter=Q(status='P')),
+        absent=Count('id', filter=Q(status='A')),
+        total=Count('id'),
+    ).order_by()
+
+    batch = []
+    for row in rows.iterator(chunk_size=2000):
+        batch.append(StudentMonthlyAttendance(**row))
+        if len(batch) >= 2000:
+            StudentMonthlyAttendance.objects.bulk_create(batch)
+            batch = []
+    StudentMonthlyAttendance.objects.bulk_create(batch)
+
+    totals = StudentMonthlyAttendance.objects.values('student_id').annotate(
+        present=Sum('present'),
+        absent=Sum('absent'),
+        total=Sum('total'),
+    ).order_by()
+
+    batch = []
+    for row in totals.iterator(chunk_size=2000):
+        batch.append(StudentAttendanceStats(**row))
+        if len(batch) >= 2000:
+            StudentAttendanceStats.objects.bulk_create(batch)
+            batch = []
+    StudentAttendanceStats.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_dailyclassattendancesummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentAttendanceStats',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='attendance_stats', serialize=False, to='core.student')),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('absent', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StudentMonthlyAttendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('absent', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_attendance', to='core.student')),
+            ],
+            options={
+                'unique_together': {('student', 'month')},
+            },
+        ),
+        migrations.RunPython(backfill_student_counters, migrations.RunPython.noop),
+    ]
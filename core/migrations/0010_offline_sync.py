@@ -0,0 +1,45 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_student_attendance_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncedScan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(max_length=64, unique=True)),
+                ('device_id', models.CharField(max_length=64)),
+                ('client_timestamp', models.DateTimeField(blank=True, null=True)),
+                ('result', models.CharField(max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['student_class', 'updated_at', 'id'], name='att_class_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='syncedscan',
+            name='student',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='synced_scans', to='core.student'),
+        ),
+        migrations.AddField(
+            model_name='syncedscan',
+            name='synced_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='synced_scans', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
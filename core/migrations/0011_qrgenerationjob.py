@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_offline_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QRGenerationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='qr_jobs', to='core.student')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='qrjob_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_qrgenerationjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentAbsenceState',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='absence_state', serialize=False, to='core.student')),
+                ('last_date', models.DateField()),
+                ('absent_streak', models.PositiveIntegerField(default=0)),
+                ('window', models.CharField(max_length=30)),
+                ('window_present', models.PositiveIntegerField(default=0)),
+                ('window_absent', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['absent_streak'], name='absence_streak_idx')],
+            },
+        ),
+    ]
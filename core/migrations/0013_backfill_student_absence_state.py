@@ -0,0 +1,53 @@
+from itertools import groupby
+
+from django.db import migrations
+
+# core.absenteeism.WINDOW_DAYS at the time of this migration
+WINDOW_DAYS = 30
+
+
+def backfill_absence_states(apps, schema_editor):
+    """
+    Replays every student's records into StudentAbsenceState the way
+    core.absenteeism does (streak of absent recorded days, last 30 days as
+    P/A/- characters), so the at-risk list is complete right after the
+    upgrade instead of only covering days marked since.
+    """
+    AttendanceRecord = apps.get_model('core', 'AttendanceRecord')
+    StudentAbsenceState = apps.get_model('core', 'StudentAbsenceState')
+
+    def replay(rows):
+        for student_id, records in groupby(rows, key=lambda row: row[0]):
+            window, streak, last_date = "", 0, None
+            for _, date, status in records:
+                gap = WINDOW_DAYS if last_date is None else min((date - last_date).days, WINDOW_DAYS)
+                window = (window + "-" * (gap - 1) + status)[-WINDOW_DAYS:]
+                streak = streak + 1 if status == "A" else 0
+                last_date = date
+            yield StudentAbsenceState(
+                student_id=student_id, last_date=last_date, absent_streak=streak, window=window,
+                window_present=window.count("P"), window_absent=window.count("A"),
+            )
+
+    # states written since 0012 only saw the records marked after it
+    StudentAbsenceState.objects.all().delete()
+
+    rows = AttendanceRecord.objects.order_by('student_id', 'date').values_list('student_id', 'date', 'status')
+    batch = []
+    for state in replay(rows.iterator(chunk_size=2000)):
+        batch.append(state)
+        if len(batch) >= 2000:
+            StudentAbsenceState.objects.bulk_create(batch)
+            batch = []
+    StudentAbsenceState.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_student_absence_state'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_absence_states, migrations.RunPython.noop),
+    ]
@@ -52,12 +52,23 @@ class Student(models.Model):
     is_active = models.BooleanField(default=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # finalization: active students of a class
+            models.Index(fields=['student_class', 'is_active'], name='student_class_active_idx'),
+        ]
     
     
     def save(self, *args, **kwargs):
         if not self.verification_key:
             self.verification_key = get_random_string(20)
         super().save(*args, **kwargs)
+
+    def rotate_verification_key(self):
+        """Issues a new verification key; printed QR codes with the old one stop working."""
+        self.verification_key = get_random_string(20)
+        self.save(update_fields=["verification_key"])
     
     def __str__(self):
         return f"{self.full_name} - {self.student_class}"
@@ -94,11 +105,197 @@ class AttendanceRecord(models.Model):
     )
 
     marked_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     method = models.CharField(max_length=20, default="QR")
 
     class Meta:
-        unique_together = ('student', 'date')  # prevents duplicate attendance per day
+        unique_together = ('student', 'date')  # prevents duplicate attendance per day, also serves (student_id, date) lookups
+        indexes = [
+            # class reports / dashboards: (class, date) and (class, date, status)
+            models.Index(fields=['student_class', 'date', 'status'], name='att_class_date_status_idx'),
+            # school-wide daily counts: (date) and (date, status)
+            models.Index(fields=['date', 'status'], name='att_date_status_idx'),
+            # offline sync deltas: records of a class changed since a cursor
+            models.Index(fields=['student_class', 'updated_at', 'id'], name='att_class_updated_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember the loaded values so a save that moves the record can refresh the old rollup too
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
 
     def __str__(self):
         return f"{self.student.full_name} - {self.date} - {self.status}"
 
+
+class DailyClassAttendanceSummary(models.Model):
+    """
+    Per class per day rollup of AttendanceRecord, kept up to date by core.rollups.
+    """
+    student_class = models.ForeignKey(
+        SchoolClass,
+        on_delete=models.CASCADE,
+        related_name="daily_summaries"
+    )
+
+    date = models.DateField()
+
+    present = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('student_class', 'date')
+        indexes = [
+            models.Index(fields=['date'], name='daily_summary_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_class} - {self.date} - {self.present}/{self.total}"
+
+
+
+class StudentMonthlyAttendance(models.Model):
+    """
+    Per student per month counters, kept up to date by core.rollups.
+    `month` is the first day of the month.
+    """
+    student = models.ForeignKey(
+        Student,
+        on_delete=models.CASCADE,
+        related_name="monthly_attendance"
+    )
+
+    month = models.DateField()
+
+    present = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('student', 'month')
+
+    def __str__(self):
+        return f"{self.student_id} - {self.month:%Y-%m} - {self.present}/{self.total}"
+
+
+class StudentAttendanceStats(models.Model):
+    """
+    Running all-time counters per student, the sum of StudentMonthlyAttendance.
+    """
+    student = models.OneToOneField(
+        Student,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="attendance_stats"
+    )
+
+    present = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.student_id} - {self.present}/{self.total}"
+
+
+class StudentAbsenceState(models.Model):
+    """
+    Per student absenteeism state, kept up to date by core.absenteeism:
+    the run of consecutive absent records ending at `last_date`, and
+    `window`, one P/A/- character per day of the 30 days ending at
+    `last_date` (oldest first) with its present/absent counts.
+    """
+    student = models.OneToOneField(
+        Student,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="absence_state"
+    )
+
+    last_date = models.DateField()
+    absent_streak = models.PositiveIntegerField(default=0)
+    window = models.CharField(max_length=30)
+    window_present = models.PositiveIntegerField(default=0)
+    window_absent = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # at-risk listing: long absence streaks first
+            models.Index(fields=['absent_streak'], name='absence_streak_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} - streak {self.absent_streak} - {self.window_present}/{self.window_present + self.window_absent}"
+
+
+class SyncedScan(models.Model):
+    """
+    One offline scan uploaded through the sync API, keyed by the device's
+    idempotency key so a resubmitted batch is answered from here.
+    """
+    idempotency_key = models.CharField(max_length=64, unique=True)
+    device_id = models.CharField(max_length=64)
+    client_timestamp = models.DateTimeField(null=True, blank=True)
+    result = models.CharField(max_length=20)
+    student = models.ForeignKey(
+        Student,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="synced_scans"
+    )
+    synced_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="synced_scans"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.device_id} - {self.idempotency_key} - {self.result}"
+
+
+class QRGenerationJob(models.Model):
+    """
+    Pending QR image render for a student, processed by core.qr_jobs so
+    nothing is lost if a worker dies before rendering.
+    """
+    STATUS_CHOICES = (
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    )
+
+    student = models.ForeignKey(
+        Student,
+        on_delete=models.CASCADE,
+        related_name="qr_jobs"
+    )
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='qrjob_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} - {self.status}"
@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Keyset pagination on -id, page size configurable with ?page_size=.
+    """
+    ordering = "-id"
+    page_size = getattr(settings, "CURSOR_PAGE_SIZE", 50)
+    page_size_query_param = "page_size"
+    max_page_size = getattr(settings, "CURSOR_MAX_PAGE_SIZE", 500)
+
+
+class DateCursorPagination(IdCursorPagination):
+    """
+    Keyset pagination on -date, for one student's attendance history.
+    """
+    ordering = "-date"
+
+
+def wants_pagination(request):
+    return "cursor" in request.query_params or "page_size" in request.query_params
+
+
+def wants_stream(request):
+    return request.query_params.get("stream") in ("1", "true")
+
+
+def stream_json_response(queryset, serializer_class, context=None, envelope=None, key="records"):
+    """
+    Streams the serialized queryset as a JSON array, reading rows with
+    .iterator() so memory stays flat regardless of the result size.
+
+    When `envelope` is given the output is that object with the array
+    added under `key`.
+    """
+    chunk_size = getattr(settings, "STREAM_CHUNK_SIZE", 1000)
+    encoder = JSONEncoder()
+
+    def rows():
+        if envelope:
+            yield encoder.encode(envelope)[:-1] + ', "%s": [' % key
+        else:
+            yield "["
+
+        first = True
+        for obj in queryset.iterator(chunk_size=chunk_size):
+            data = encoder.encode(serializer_class(obj, context=context).data)
+            yield data if first else "," + data
+            first = False
+
+        yield "]}" if envelope else "]"
+
+    return StreamingHttpResponse(rows(), content_type="application/json")
+
+
+def list_response(request, queryset, serializer_class, pagination_class=IdCursorPagination, context=None, view=None):
+    """
+    Full list by default, cursor pages with ?cursor= / ?page_size=,
+    streamed JSON with ?stream=1.
+    """
+    if wants_stream(request):
+        return stream_json_response(queryset, serializer_class, context=context)
+
+    if wants_pagination(request):
+        paginator = pagination_class()
+        page = paginator.paginate_queryset(queryset, request, view=view)
+        serializer = serializer_class(page, many=True, context=context)
+        return paginator.get_paginated_response(serializer.data)
+
+    serializer = serializer_class(queryset, many=True, context=context)
+    return Response(serializer.data, status=status.HTTP_200_OK)
@@ -1,6 +1,28 @@
+import ipaddress
+
+from django.conf import settings
 from rest_framework.permissions import BasePermission
 
+from .authentication import METRICS_SCRAPE
+
 class IsAdmin(BasePermission):
     def has_permission(self, request, view):
         return bool(request.user and request.user.is_authenticated and request.user.role == 'ADMIN')
-    
+
+class IsMetricsScraper(BasePermission):
+    """
+    Scrapes authenticated with METRICS_SCRAPE_TOKEN, or sent from an
+    address or network listed in METRICS_ALLOWED_IPS.
+    """
+
+    def has_permission(self, request, view):
+        if request.auth == METRICS_SCRAPE:
+            return True
+        allowed = getattr(settings, "METRICS_ALLOWED_IPS", [])
+        if not allowed:
+            return False
+        try:
+            address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+        except ValueError:
+            return False
+        return any(address in ipaddress.ip_network(network, strict=False) for network in allowed)
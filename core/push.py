@@ -0,0 +1,188 @@
+import asyncio
+import json
+import logging
+import threading
+
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import DailyClassAttendanceSummary
+
+logger = logging.getLogger(__name__)
+
+
+class InProcessSubscription:
+    def __init__(self, broker, class_ids, queue_size):
+        self.broker = broker
+        self.class_ids = class_ids
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(queue_size)
+
+    def offer(self, event):
+        # runs on the subscriber's loop; a slow client drops its oldest
+        # events, every event carries the class totals so the latest is enough
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def next_event(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """
+    Fans events out to the SSE streams of this process. Publishing may
+    happen on any thread (request threads, on_commit callbacks); delivery
+    is handed to each subscriber's event loop. Only reaches clients
+    connected to the same worker, use RedisBroker for several workers.
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.lock = threading.Lock()
+
+    def has_subscribers(self):
+        return bool(self.subscribers)
+
+    def publish(self, events):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            for event in events:
+                if subscription.class_ids is None or event["class_id"] in subscription.class_ids:
+                    try:
+                        subscription.loop.call_soon_threadsafe(subscription.offer, event)
+                    except RuntimeError:
+                        # loop already closed, the stream is going away
+                        self.unsubscribe(subscription)
+                        break
+
+    async def subscribe(self, class_ids=None):
+        subscription = InProcessSubscription(self, class_ids, self.queue_size)
+        with self.lock:
+            self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+
+class RedisSubscription:
+    def __init__(self, client, pubsub):
+        self.client = client
+        self.pubsub = pubsub
+
+    async def next_event(self, timeout):
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if message is None:
+            return None
+        return json.loads(message["data"])
+
+    async def close(self):
+        await self.pubsub.aclose()
+        await self.client.aclose()
+
+
+class RedisBroker:
+    """
+    Redis pub/sub, one channel per class, so every worker's streams see
+    every write. Requires the `redis` package.
+    """
+    channel_prefix = "attendance:class:"
+
+    def __init__(self, url):
+        import redis
+        import redis.asyncio
+
+        self.url = url
+        self.client = redis.Redis.from_url(url)
+        self.async_module = redis.asyncio
+
+    def has_subscribers(self):
+        return True
+
+    def publish(self, events):
+        pipeline = self.client.pipeline(transaction=False)
+        for event in events:
+            pipeline.publish(f"{self.channel_prefix}{event['class_id']}", json.dumps(event, cls=JSONEncoder))
+        pipeline.execute()
+
+    async def subscribe(self, class_ids=None):
+        client = self.async_module.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        if class_ids is None:
+            await pubsub.psubscribe(f"{self.channel_prefix}*")
+        else:
+            await pubsub.subscribe(*[f"{self.channel_prefix}{class_id}" for class_id in class_ids])
+        return RedisSubscription(client, pubsub)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def build_broker():
+    """
+    Builds the broker from settings.ATTENDANCE_PUSH:
+    {"BACKEND": "inprocess" | "redis", "URL": "redis://...", "QUEUE_SIZE": 100}
+    """
+    config = getattr(settings, "ATTENDANCE_PUSH", {})
+    if config.get("BACKEND", "inprocess") == "redis":
+        return RedisBroker(config["URL"])
+    return InProcessBroker(queue_size=config.get("QUEUE_SIZE", 100))
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = build_broker()
+    return _broker
+
+
+def class_count_events(keys):
+    """
+    One event per (class_id, date) with that day's totals, read from the
+    daily rollups in one query.
+    """
+    class_ids = {class_id for class_id, _ in keys}
+    dates = {date for _, date in keys}
+    found = {
+        (row.student_class_id, row.date): row
+        for row in DailyClassAttendanceSummary.objects.filter(student_class_id__in=class_ids, date__in=dates)
+    }
+
+    events = []
+    for class_id, date in sorted(keys):
+        row = found.get((class_id, date))
+        events.append({
+            "class_id": class_id,
+            "date": str(date),
+            "present": row.present if row else 0,
+            "absent": row.absent if row else 0,
+            "total": row.total if row else 0,
+        })
+    return events
+
+
+def publish_class_counts(keys):
+    """
+    Broadcasts the new per-class totals for the written (class_id, date)
+    pairs. Skipped entirely when nobody is listening.
+    """
+    broker = get_broker()
+    if not keys or not broker.has_subscribers():
+        return
+    try:
+        broker.publish(class_count_events(keys))
+    except Exception:
+        logger.exception("Attendance push publish failed")
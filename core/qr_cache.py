@@ -0,0 +1,195 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Student
+
+# What the QR hot path needs to validate a scan, without loading the Student row
+StudentKey = namedtuple("StudentKey", ["student_id", "class_id", "verification_key", "is_active"])
+
+
+class LRUKeyBackend:
+    """
+    Per-process LRU with a TTL. Invalidation only reaches this process, so
+    TIMEOUT bounds how stale other workers can be; use DjangoCacheKeyBackend
+    with a shared cache when that matters.
+    """
+
+    def __init__(self, max_entries=10000, timeout=300):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self.lock:
+            for key in keys:
+                entry = self.entries.get(key)
+                if entry is None:
+                    continue
+                value, expires = entry
+                if expires < now:
+                    del self.entries[key]
+                    continue
+                self.entries.move_to_end(key)
+                found[key] = value
+        return found
+
+    def set_many(self, values):
+        expires = time.monotonic() + self.timeout
+        with self.lock:
+            for key, value in values.items():
+                self.entries[key] = (value, expires)
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def size(self):
+        return len(self.entries)
+
+
+class DjangoCacheKeyBackend:
+    """
+    Stores entries in a Django cache alias (locmem in tests, a shared cache
+    such as Redis or Memcached in production so all workers see invalidations).
+    There is no clear(): the alias is shared, and entries expire or are
+    invalidated per key.
+    """
+    prefix = "qrkey:"
+
+    def __init__(self, alias="default", timeout=300):
+        self.cache = caches[alias]
+        self.timeout = timeout
+
+    def get_many(self, keys):
+        found = self.cache.get_many([self.prefix + key for key in keys])
+        return {key[len(self.prefix):]: StudentKey(*value) for key, value in found.items()}
+
+    def set_many(self, values):
+        self.cache.set_many({self.prefix + key: tuple(value) for key, value in values.items()}, self.timeout)
+
+    def delete_many(self, keys):
+        self.cache.delete_many([self.prefix + key for key in keys])
+
+    def size(self):
+        return None
+
+
+def payload_cache_key(payload):
+    """
+    Cache key for a parsed QR payload: the student_uid for legacy payloads,
+    "id:<pk>" for compact ones that only carry the primary key.
+    """
+    if payload.student_id is not None:
+        return f"id:{payload.student_id}"
+    return str(payload.student_uid)
+
+
+class StudentKeyCache:
+    """
+    Cache of StudentKey by student_uid or "id:<pk>" with hit/miss counters.
+    Misses are resolved together with at most one query per key kind.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get_many(self, keys):
+        keys = {str(key) for key in keys}
+        found = self.backend.get_many(keys)
+
+        missing = keys - set(found)
+        with self.lock:
+            self.hits += len(found)
+            self.misses += len(missing)
+
+        if missing:
+            missing_ids = {int(key[3:]) for key in missing if key.startswith("id:") and key[3:].isdigit()}
+            missing_uids = {key for key in missing if not key.startswith("id:")}
+            loaded = {}
+            for lookup, values in (("student_uid__in", missing_uids), ("id__in", missing_ids)):
+                if not values:
+                    continue
+                rows = Student.objects.filter(**{lookup: values}).values_list(
+                    "student_uid", "id", "student_class_id", "verification_key", "is_active"
+                )
+                for student_uid, student_id, class_id, verification_key, is_active in rows:
+                    entry = StudentKey(student_id, class_id, verification_key, is_active)
+                    loaded[str(student_uid)] = entry
+                    loaded[f"id:{student_id}"] = entry
+            # only the keys asked for: each set is a query on the database cache
+            loaded = {key: entry for key, entry in loaded.items() if key in missing}
+            self.backend.set_many(loaded)
+            found.update(loaded)
+
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(str(key))
+
+    def invalidate(self, *keys):
+        self.backend.delete_many([str(key) for key in keys])
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0,
+            "size": self.backend.size(),
+        }
+
+
+_key_cache = None
+_key_cache_lock = threading.Lock()
+
+
+def build_key_cache():
+    """
+    Builds the cache from settings.QR_KEY_CACHE:
+    {"BACKEND": "lru" | "django", "MAX_ENTRIES": 10000, "TIMEOUT": 300, "CACHE_ALIAS": "default"}
+    """
+    config = getattr(settings, "QR_KEY_CACHE", {})
+    timeout = config.get("TIMEOUT", 300)
+
+    if config.get("BACKEND", "lru") == "django":
+        backend = DjangoCacheKeyBackend(alias=config.get("CACHE_ALIAS", "default"), timeout=timeout)
+    else:
+        backend = LRUKeyBackend(max_entries=config.get("MAX_ENTRIES", 10000), timeout=timeout)
+
+    return StudentKeyCache(backend)
+
+
+def get_key_cache():
+    global _key_cache
+    if _key_cache is None:
+        with _key_cache_lock:
+            if _key_cache is None:
+                _key_cache = build_key_cache()
+    return _key_cache
+
+
+def reset_key_cache():
+    """
+    Drops the process-wide cache so the next call rebuilds it from settings (tests).
+    """
+    global _key_cache
+    _key_cache = None
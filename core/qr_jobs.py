@@ -0,0 +1,153 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Student, QRGenerationJob
+from .utils import build_qr_payload, render_qr_png, qr_filename
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, "QR_WORKER_THREADS", 4),
+                    thread_name_prefix="qr-worker"
+                )
+    return _executor
+
+
+def enqueue_qr_generation(student_ids):
+    """
+    Records one PENDING job per student and, once the surrounding
+    transaction commits, hands the batch to the worker pool.
+    Returns the number of jobs created.
+    """
+    jobs = QRGenerationJob.objects.bulk_create(
+        [QRGenerationJob(student_id=student_id) for student_id in student_ids],
+        batch_size=1000
+    )
+    if not jobs:
+        return 0
+
+    student_ids = list(student_ids)
+    if getattr(settings, "QR_JOBS_RUN_INLINE", False):
+        transaction.on_commit(lambda: process_pending_jobs(student_ids=student_ids))
+    else:
+        transaction.on_commit(lambda: get_executor().submit(run_in_worker, student_ids))
+
+    return len(jobs)
+
+
+def run_in_worker(student_ids):
+    try:
+        process_pending_jobs(student_ids=student_ids)
+    except Exception:
+        logger.exception("QR generation batch failed")
+    finally:
+        close_old_connections()
+
+
+def claim_jobs(student_ids=None, limit=None):
+    """
+    Moves PENDING jobs to RUNNING and returns them. Rows locked by another
+    worker are skipped where the database supports SKIP LOCKED.
+    """
+    with transaction.atomic():
+        pending = QRGenerationJob.objects.select_for_update(skip_locked=True).filter(status="PENDING").order_by("id")
+        if student_ids is not None:
+            pending = pending.filter(student_id__in=student_ids)
+        if limit:
+            pending = pending[:limit]
+
+        job_ids = list(pending.values_list("id", flat=True))
+        QRGenerationJob.objects.filter(id__in=job_ids).update(
+            status="RUNNING",
+            attempts=F("attempts") + 1,
+            updated_at=timezone.now()
+        )
+
+    return list(QRGenerationJob.objects.filter(id__in=job_ids).select_related("student"))
+
+
+def render_job(job):
+    """
+    Renders and stores one student's QR image. Runs on a pool thread.
+    Returns (job, stored name or None, error message).
+    """
+    student = job.student
+    try:
+        png = render_qr_png(build_qr_payload(student))
+        storage = student.qr_code_image.storage
+        name = student.qr_code_image.field.generate_filename(student, qr_filename(student))
+        if storage.exists(name):
+            storage.delete(name)
+        return job, storage.save(name, ContentFile(png)), ""
+    except Exception as exc:
+        logger.exception("QR render failed for student %s", student.pk)
+        return job, None, str(exc)
+
+
+def process_pending_jobs(student_ids=None, limit=None):
+    """
+    Claims pending jobs, renders their images in parallel, then writes all
+    new qr_code_image paths with one bulk_update and marks the jobs done.
+    Returns (done, failed).
+    """
+    jobs = claim_jobs(student_ids=student_ids, limit=limit)
+    if not jobs:
+        return 0, 0
+
+    # several jobs for the same student (e.g. create then rotate) render once
+    latest = {}
+    for job in jobs:
+        latest[job.student_id] = job
+    duplicates = [job.id for job in jobs if latest[job.student_id] is not job]
+
+    with ThreadPoolExecutor(max_workers=getattr(settings, "QR_WORKER_THREADS", 4)) as pool:
+        rendered = list(pool.map(render_job, latest.values()))
+
+    students = []
+    done_ids = list(duplicates)
+    failed = []
+    for job, name, error in rendered:
+        if name is None:
+            job.status = "FAILED"
+            job.error = error
+            failed.append(job)
+            continue
+        job.student.qr_code_image.name = name
+        students.append(job.student)
+        done_ids.append(job.id)
+
+    with transaction.atomic():
+        Student.objects.bulk_update(students, ["qr_code_image"], batch_size=500)
+        QRGenerationJob.objects.filter(id__in=done_ids).update(status="DONE", error="", updated_at=timezone.now())
+        if failed:
+            QRGenerationJob.objects.bulk_update(failed, ["status", "error"])
+
+    return len(done_ids), len(failed)
+
+
+def requeue_stale_jobs(older_than_minutes=10, max_attempts=3):
+    """
+    Puts RUNNING jobs whose worker died, and FAILED jobs with attempts
+    left, back to PENDING. Returns the number requeued.
+    """
+    cutoff = timezone.now() - timedelta(minutes=older_than_minutes)
+    stale = QRGenerationJob.objects.filter(status="RUNNING", updated_at__lt=cutoff)
+    retry = QRGenerationJob.objects.filter(status="FAILED", attempts__lt=max_attempts)
+    return stale.update(status="PENDING") + retry.update(status="PENDING")
@@ -0,0 +1,102 @@
+import hashlib
+from io import BytesIO
+
+import qrcode
+from django.conf import settings
+from django.core.cache import cache
+from PIL import Image, ImageDraw, ImageFont
+
+from .utils import build_qr_payload
+
+# A4 at 150 DPI, 3 x 4 cards per page
+PAGE_SIZE = (1240, 1754)
+COLUMNS = 3
+ROWS = 4
+MARGIN = 60
+CARDS_PER_PAGE = COLUMNS * ROWS
+
+
+def sheet_digest(school_class, students):
+    """
+    Fingerprint of everything printed on the sheet. The QR payload includes
+    the verification key, so rotating a key or changing the payload format
+    produces a new digest.
+    """
+    digest = hashlib.sha1(str(school_class).encode())
+    for student in students:
+        digest.update(f"|{student.id}|{student.roll_no}|{student.full_name}|{build_qr_payload(student)}".encode())
+    return digest.hexdigest()
+
+
+def render_card(student, class_name, size):
+    width, height = size
+    card = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(card)
+    draw.rectangle([0, 0, width - 1, height - 1], outline="black", width=2)
+
+    qr_side = min(width - 40, height - 110)
+    qr_image = qrcode.make(build_qr_payload(student)).get_image().convert("RGB")
+    card.paste(qr_image.resize((qr_side, qr_side), Image.NEAREST), ((width - qr_side) // 2, 15))
+
+    name_font = ImageFont.load_default(size=26)
+    info_font = ImageFont.load_default(size=20)
+    text_top = qr_side + 25
+    draw.text((width // 2, text_top), student.full_name[:28], fill="black", font=name_font, anchor="ma")
+    draw.text((width // 2, text_top + 38), f"Roll {student.roll_no}  |  {class_name}", fill="black", font=info_font, anchor="ma")
+    return card
+
+
+def render_pages(school_class, students):
+    """
+    Renders every student card and lays them out on A4 pages. Rendering is
+    sequential: qrcode and the PIL calls used here hold the GIL, so a thread
+    pool gains nothing, and repeat requests are served from the cache.
+    """
+    page_width, page_height = PAGE_SIZE
+    cell_width = (page_width - 2 * MARGIN) // COLUMNS
+    cell_height = (page_height - 2 * MARGIN) // ROWS
+    card_size = (cell_width - 20, cell_height - 20)
+    class_name = str(school_class)
+
+    cards = [render_card(student, class_name, card_size) for student in students]
+
+    pages = []
+    for start in range(0, max(len(cards), 1), CARDS_PER_PAGE):
+        page = Image.new("RGB", PAGE_SIZE, "white")
+        for position, card in enumerate(cards[start:start + CARDS_PER_PAGE]):
+            row, column = divmod(position, COLUMNS)
+            page.paste(card, (MARGIN + column * cell_width + 10, MARGIN + row * cell_height + 10))
+        pages.append(page)
+    return pages
+
+
+def get_class_sheet(school_class, students, output="pdf", page=1):
+    """
+    Returns (content, content_type) for the class sheet, served from the
+    cache while the class and its students' QR payloads are unchanged.
+    PDF contains all pages, PNG one page (1-based).
+    """
+    students = list(students)
+    page_count = max(1, -(-len(students) // CARDS_PER_PAGE))
+    if output == "png" and not 1 <= page <= page_count:
+        raise ValueError(f"page must be between 1 and {page_count}")
+
+    key = f"qr_sheet:{school_class.id}:{output}:{page if output == 'png' else 0}:{sheet_digest(school_class, students)}"
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    if output == "png":
+        students = students[(page - 1) * CARDS_PER_PAGE:page * CARDS_PER_PAGE]
+    pages = render_pages(school_class, students)
+
+    buffer = BytesIO()
+    if output == "png":
+        pages[0].save(buffer, format="PNG", optimize=True)
+        result = (buffer.getvalue(), "image/png")
+    else:
+        pages[0].save(buffer, format="PDF", save_all=True, append_images=pages[1:], resolution=150)
+        result = (buffer.getvalue(), "application/pdf")
+
+    cache.set(key, result, getattr(settings, "QR_SHEET_CACHE_TIMEOUT", 24 * 60 * 60))
+    return result
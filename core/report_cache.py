@@ -0,0 +1,142 @@
+import hashlib
+import json
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .report_utils import get_month_range
+
+REPORT_ENDPOINTS = ("daily", "weekly", "monthly", "register")
+
+
+def get_report_cache():
+    # must be shared by every worker (see CACHES in settings), or writes only
+    # invalidate the reports cached by the worker that handled them
+    return caches[getattr(settings, "REPORT_CACHE_ALIAS", "default")]
+
+
+def entry_key(endpoint, class_id, period_start):
+    return f"report:{endpoint}:{class_id}:{period_start.isoformat()}"
+
+
+def generation_key(class_id):
+    return f"report_gen:{class_id}"
+
+
+def month_version_key(class_id, month_start):
+    return f"report_ver:{class_id}:{month_start.isoformat()}"
+
+
+def period_version_keys(class_id, period_start, period_end):
+    """
+    Version keys of the months a report period overlaps: one, or two for a
+    week across a month boundary. A write bumps only its own month, which
+    keeps the number of cache writes per scan at one.
+    """
+    keys = []
+    month_start = get_month_range(period_start)[0]
+    while month_start <= period_end:
+        keys.append(month_version_key(class_id, month_start))
+        month_start = get_month_range(month_start)[1] + timedelta(days=1)
+    return keys
+
+
+def fresh_version():
+    # unique rather than incremented: the database cache has no atomic incr,
+    # and a version must never repeat one an old entry was stored under
+    return uuid.uuid4().hex
+
+
+def bump_versions(cache, keys):
+    version = fresh_version()
+    cache.set_many({key: version for key in keys}, None)
+
+
+def read_versions(cache, keys, found):
+    """
+    Current value of each version key, taken from `found` (a get_many
+    result) where present; missing ones are started at a fresh version.
+    """
+    missing = [key for key in keys if key not in found]
+    for key in missing:
+        cache.add(key, fresh_version(), None)
+    if missing:
+        found.update(cache.get_many(missing))
+    return tuple(found.get(key) for key in keys)
+
+
+def invalidate_reports(keys):
+    """
+    Invalidates the cached reports for the given (class_id, date) pairs by
+    bumping the version of each (class, month). Call after the write
+    commits: entries built from rows read before the commit carry the old
+    version and are never served, even if they are stored after this runs.
+    """
+    version_keys = {month_version_key(class_id, get_month_range(date)[0]) for class_id, date in keys}
+    bump_versions(get_report_cache(), sorted(version_keys))
+
+
+def bump_class_generation(class_id):
+    """
+    Invalidates every cached report of a class at once (names shown in the
+    daily report changed), without having to enumerate its keys.
+    """
+    bump_versions(get_report_cache(), [generation_key(class_id)])
+
+
+def compute_etag(data):
+    return '"%s"' % hashlib.sha1(json.dumps(data, cls=JSONEncoder, sort_keys=True).encode()).hexdigest()
+
+
+def not_modified(request, etag):
+    if_none_match = request.headers.get("If-None-Match")
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return "*" in etags or etag in etags
+
+
+def cached_report_response(request, endpoint, class_id, period_start, period_end, build):
+    """
+    Serves a class report from the cache, keyed by (endpoint, class, period
+    start), and answers If-None-Match with 304.
+
+    `build()` returns the response data on a miss. Entries covering today
+    live for REPORT_CACHE_TODAY_TIMEOUT, closed periods for
+    REPORT_CACHE_TIMEOUT. Each entry records the class generation and the
+    versions of the months it covers, read before build() ran; writes bump
+    those, so an entry is only served while nothing in its months has
+    changed since its rows were read.
+    """
+    cache = get_report_cache()
+    key = entry_key(endpoint, class_id, period_start)
+    version_keys = [generation_key(class_id)] + period_version_keys(class_id, period_start, period_end)
+    found = cache.get_many([key] + version_keys)
+    versions = read_versions(cache, version_keys, found)
+
+    entry = found.get(key)
+    if entry is not None and entry[0] == versions:
+        _, etag, data = entry
+    else:
+        data = build()
+        etag = compute_etag(data)
+        if period_end >= timezone.now().date():
+            timeout = getattr(settings, "REPORT_CACHE_TODAY_TIMEOUT", 60)
+        else:
+            timeout = getattr(settings, "REPORT_CACHE_TIMEOUT", 24 * 60 * 60)
+        cache.set(key, (versions, etag, data), timeout)
+
+    if not_modified(request, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(data, status=status.HTTP_200_OK)
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
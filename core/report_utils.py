@@ -1,5 +1,6 @@
 from datetime import timedelta
 from django.utils import timezone
+from django.db.models import Count, Q, Sum
 
 def get_week_range(date):
     """
@@ -25,3 +26,110 @@ def get_month_range(date):
 
     end = next_month - timedelta(days=1)
     return start, end
+
+
+def attendance_percent(present, total):
+    """
+    Returns present/total as a percentage rounded to 2 places (0 when total is 0).
+    """
+    if total > 0:
+        return round((present / total) * 100, 2)
+    return 0
+
+
+def summarize_attendance(records):
+    """
+    Returns present, absent, total and percent for an AttendanceRecord
+    queryset using a single aggregate query.
+    """
+    counts = records.order_by().aggregate(
+        present=Count("id", filter=Q(status="P")),
+        absent=Count("id", filter=Q(status="A")),
+        total=Count("id")
+    )
+
+    return {
+        "present": counts["present"],
+        "absent": counts["absent"],
+        "total": counts["total"],
+        "percent": attendance_percent(counts["present"], counts["total"])
+    }
+
+
+def summarize_attendance_by_class(records):
+    """
+    Same as summarize_attendance but grouped by class in one GROUP BY query.
+    Returns {class_id: summary}; classes without records are absent from the dict.
+    """
+    rows = records.values("student_class_id").annotate(
+        present=Count("id", filter=Q(status="P")),
+        absent=Count("id", filter=Q(status="A")),
+        total=Count("id")
+    ).order_by()
+
+    return {
+        row["student_class_id"]: {
+            "present": row["present"],
+            "absent": row["absent"],
+            "total": row["total"],
+            "percent": attendance_percent(row["present"], row["total"])
+        }
+        for row in rows
+    }
+
+
+def empty_summary():
+    return {"present": 0, "absent": 0, "total": 0, "percent": 0}
+
+
+def daily_summary_totals():
+    return {"present": Sum("present"), "absent": Sum("absent"), "total": Sum("total")}
+
+
+def daily_totals_summary(totals):
+    present = totals["present"] or 0
+    total = totals["total"] or 0
+
+    return {
+        "present": present,
+        "absent": totals["absent"] or 0,
+        "total": total,
+        "percent": attendance_percent(present, total)
+    }
+
+
+def summarize_daily_summaries(summaries):
+    """
+    Sums a DailyClassAttendanceSummary queryset into the same shape as
+    summarize_attendance, in one aggregate query over the rollup rows.
+    """
+    return daily_totals_summary(summaries.order_by().aggregate(**daily_summary_totals()))
+
+
+async def asummarize_daily_summaries(summaries):
+    """
+    Async version of summarize_daily_summaries.
+    """
+    return daily_totals_summary(await summaries.order_by().aaggregate(**daily_summary_totals()))
+
+
+def summarize_daily_summaries_by_class(summaries):
+    """
+    Same as summarize_daily_summaries but grouped by class.
+    Returns {class_id: summary}.
+    """
+    rows = summaries.values("student_class_id").annotate(
+        present=Sum("present"),
+        absent=Sum("absent"),
+        total=Sum("total")
+    ).order_by()
+
+    return {
+        row["student_class_id"]: {
+            "present": row["present"],
+            "absent": row["absent"],
+            "total": row["total"],
+            "percent": attendance_percent(row["present"], row["total"])
+        }
+        for row in rows
+    }
@@ -0,0 +1,221 @@
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import AttendanceRecord, DailyClassAttendanceSummary, StudentMonthlyAttendance, StudentAttendanceStats
+from .report_utils import get_month_range
+
+
+def upsert(model, objs, unique_fields, update_fields, batch_size=1000):
+    """
+    bulk_create with update_conflicts. MySQL upserts on any unique key and
+    rejects unique_fields, other backends need them.
+    """
+    if not objs:
+        return
+    if not connection.features.supports_update_conflicts_with_target:
+        unique_fields = None
+    model.objects.bulk_create(
+        objs,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=update_fields
+    )
+
+
+def lock_rows(model, objs, unique_fields):
+    """
+    Locks the given rollup rows until the transaction ends, creating the
+    missing ones with zero counts: an upsert that only touches updated_at.
+    A concurrent writer of the same rows waits here until this transaction
+    commits, so the recount that follows sees its records (READ COMMITTED).
+    `objs` must be sorted so writers take the locks in the same order.
+    """
+    upsert(model, objs, unique_fields=unique_fields, update_fields=["updated_at"])
+
+
+def count_by_class_and_date(records):
+    return records.values("student_class_id", "date").annotate(
+        present=Count("id", filter=Q(status="P")),
+        absent=Count("id", filter=Q(status="A")),
+        total=Count("id")
+    ).order_by()
+
+
+def refresh_daily_summaries(keys):
+    """
+    Recomputes the DailyClassAttendanceSummary rows for the given
+    (class_id, date) keys from the raw records: the rows are locked
+    first, then one grouped query, one upsert, and one delete for keys
+    that no longer have records.
+    """
+    keys = sorted(set(keys))
+    if not keys:
+        return
+
+    with transaction.atomic(savepoint=False):
+        # Step 1: lock the rows, concurrent writers of a class/day recount one after another
+        lock_rows(
+            DailyClassAttendanceSummary,
+            [DailyClassAttendanceSummary(student_class_id=class_id, date=date) for class_id, date in keys],
+            unique_fields=["student_class", "date"]
+        )
+
+        # Step 2: recount from the raw records
+        rows = count_by_class_and_date(AttendanceRecord.objects.filter(
+            student_class_id__in={class_id for class_id, _ in keys},
+            date__in={date for _, date in keys}
+        ))
+
+        empty = set(keys)
+        summaries = []
+        for row in rows:
+            key = (row["student_class_id"], row["date"])
+            if key in empty:
+                empty.discard(key)
+                summaries.append(DailyClassAttendanceSummary(**row))
+
+        upsert(
+            DailyClassAttendanceSummary,
+            summaries,
+            unique_fields=["student_class", "date"],
+            update_fields=["present", "absent", "total", "updated_at"]
+        )
+
+        # whatever is left has no records any more
+        if empty:
+            condition = Q()
+            for class_id, date in empty:
+                condition |= Q(student_class_id=class_id, date=date)
+            DailyClassAttendanceSummary.objects.filter(condition).delete()
+
+
+def rebuild_daily_summaries(date_from, date_to, class_ids=None):
+    """
+    Drops and rebuilds the rollups for a date range (optionally limited to
+    some classes) from the raw records in one streaming pass.
+    Returns the number of rollup rows written.
+    """
+    records = AttendanceRecord.objects.filter(date__range=[date_from, date_to])
+    summaries = DailyClassAttendanceSummary.objects.filter(date__range=[date_from, date_to])
+    if class_ids:
+        records = records.filter(student_class_id__in=class_ids)
+        summaries = summaries.filter(student_class_id__in=class_ids)
+
+    summaries.delete()
+
+    written = 0
+    batch = []
+    for row in count_by_class_and_date(records).iterator(chunk_size=2000):
+        batch.append(DailyClassAttendanceSummary(**row))
+        if len(batch) >= 2000:
+            DailyClassAttendanceSummary.objects.bulk_create(batch)
+            written += len(batch)
+            batch = []
+    DailyClassAttendanceSummary.objects.bulk_create(batch)
+    written += len(batch)
+
+    return written
+
+
+
+def count_by_student_and_month(records):
+    return records.annotate(month=TruncMonth("date")).values("student_id", "month").annotate(
+        present=Count("id", filter=Q(status="P")),
+        absent=Count("id", filter=Q(status="A")),
+        total=Count("id")
+    ).order_by()
+
+
+def refresh_student_counters(keys):
+    """
+    Recomputes StudentMonthlyAttendance for the given (student_id, month)
+    keys from the raw records and moves each student's all-time
+    StudentAttendanceStats by the difference between the new and the old
+    month rows, so the lifetime row is never re-summed.
+
+    The students' stats rows are locked first, which serializes concurrent
+    writers of one student's counters; a write of one student and day
+    costs five queries whatever the student's history.
+    """
+    keys = {(student_id, get_month_range(date)[0]) for student_id, date in keys}
+    if not keys:
+        return
+
+    student_ids = sorted({student_id for student_id, _ in keys})
+    months = {month for _, month in keys}
+
+    with transaction.atomic(savepoint=False):
+        # Step 1: lock the lifetime rows (created at zero when missing)
+        lock_rows(
+            StudentAttendanceStats,
+            [StudentAttendanceStats(student_id=student_id) for student_id in student_ids],
+            unique_fields=["student"]
+        )
+
+        # Step 2: the month rows as they were, and recounted from the raw records
+        before = {
+            (student_id, month): (present, absent, total)
+            for student_id, month, present, absent, total in StudentMonthlyAttendance.objects.filter(
+                student_id__in=student_ids,
+                month__in=months
+            ).values_list("student_id", "month", "present", "absent", "total")
+        }
+
+        rows = count_by_student_and_month(AttendanceRecord.objects.filter(
+            student_id__in=student_ids,
+            date__range=[min(months), get_month_range(max(months))[1]]
+        ))
+
+        after = {}
+        for row in rows:
+            key = (row["student_id"], row["month"])
+            if key in keys:
+                after[key] = (row["present"], row["absent"], row["total"])
+
+        upsert(
+            StudentMonthlyAttendance,
+            [
+                StudentMonthlyAttendance(student_id=student_id, month=month, present=present, absent=absent, total=total)
+                for (student_id, month), (present, absent, total) in after.items()
+            ],
+            unique_fields=["student", "month"],
+            update_fields=["present", "absent", "total", "updated_at"]
+        )
+
+        empty = [key for key in keys if key not in after and key in before]
+        if empty:
+            condition = Q()
+            for student_id, month in empty:
+                condition |= Q(student_id=student_id, month=month)
+            StudentMonthlyAttendance.objects.filter(condition).delete()
+
+        # Step 3: lifetime rows move by the month differences, one update per distinct delta
+        deltas = defaultdict(lambda: [0, 0, 0])
+        for key in keys:
+            student_delta = deltas[key[0]]
+            for position, (new, old) in enumerate(zip(after.get(key, (0, 0, 0)), before.get(key, (0, 0, 0)))):
+                student_delta[position] += new - old
+
+        by_delta = defaultdict(list)
+        for student_id, delta in deltas.items():
+            by_delta[tuple(delta)].append(student_id)
+
+        now = timezone.now()
+        for (present, absent, total), ids in by_delta.items():
+            if present or absent or total:
+                StudentAttendanceStats.objects.filter(student_id__in=ids).update(
+                    present=F("present") + present,
+                    absent=F("absent") + absent,
+                    total=F("total") + total,
+                    updated_at=now
+                )
+
+        # students left without records (or only just locked into existence)
+        maybe_empty = [student_id for student_id, delta in deltas.items() if delta[2] <= 0]
+        if maybe_empty:
+            StudentAttendanceStats.objects.filter(student_id__in=maybe_empty, total=0).delete()
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import SchoolClass, Student, AttendanceRecord
+from .models import SchoolClass, Student, AttendanceRecord, StudentAbsenceState
 from rest_framework.exceptions import ValidationError
 User = get_user_model()
 
@@ -53,6 +53,11 @@ class SchoolClassSerializer(serializers.ModelSerializer):
             'class_teacher_name',
             'created_at'
         ]
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Relations read by the method fields, loaded in the same query."""
+        return queryset.select_related('class_teacher')
         
     def get_class_teacher_name(self, obj):
         if obj.class_teacher:
@@ -83,6 +88,11 @@ class StudentSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['student_uid', 'verification_key', 'qr_code_image']
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Relations read by the method fields, loaded in the same query."""
+        return queryset.select_related('student_class')
+
     def get_class_name(self, obj):
         return str(obj.student_class)
 
@@ -94,6 +104,23 @@ class StudentSerializer(serializers.ModelSerializer):
 
 
 
+class PreloadedClassField(serializers.PrimaryKeyRelatedField):
+    """
+    Resolves the class from context["classes"] ({id: SchoolClass}) instead of
+    one query per row, for bulk imports.
+    """
+
+    def to_internal_value(self, data):
+        try:
+            return self.context["classes"][int(data)]
+        except (KeyError, TypeError, ValueError):
+            self.fail('does_not_exist', pk_value=data)
+
+
+class StudentImportSerializer(StudentSerializer):
+    student_class = PreloadedClassField(queryset=SchoolClass.objects.all())
+
+
 class AttendanceRecordSerializer(serializers.ModelSerializer):
     student_name = serializers.SerializerMethodField(read_only=True)
     class_name = serializers.SerializerMethodField(read_only=True)
@@ -116,6 +143,11 @@ class AttendanceRecordSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['marked_by', 'marked_at', 'method']
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Relations read by the method fields, loaded in the same query."""
+        return queryset.select_related('student', 'student_class', 'marked_by')
+
     def get_student_name(self, obj):
         return obj.student.full_name
 
@@ -126,3 +158,36 @@ class AttendanceRecordSerializer(serializers.ModelSerializer):
         if obj.marked_by:
             return obj.marked_by.username
         return None
+
+
+class StudentAbsenceStateSerializer(serializers.ModelSerializer):
+    student_name = serializers.CharField(source='student.full_name', read_only=True)
+    roll_no = serializers.IntegerField(source='student.roll_no', read_only=True)
+    student_class = serializers.IntegerField(source='student.student_class_id', read_only=True)
+    class_name = serializers.SerializerMethodField(read_only=True)
+    window_percent = serializers.SerializerMethodField(read_only=True)
+
+    class Meta:
+        model = StudentAbsenceState
+        fields = [
+            'student',
+            'student_name',
+            'roll_no',
+            'student_class',
+            'class_name',
+            'absent_streak',
+            'last_date',
+            'window',
+            'window_present',
+            'window_absent',
+            'window_percent'
+        ]
+
+    def get_class_name(self, obj):
+        return str(obj.student.student_class)
+
+    def get_window_percent(self, obj):
+        # annotated by core.absenteeism.at_risk_states
+        if obj.window_percent is None:
+            return None
+        return round(obj.window_percent, 2)
@@ -0,0 +1,201 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from .models import User, SchoolClass, Student, AttendanceRecord
+from .rollups import refresh_daily_summaries, refresh_student_counters
+from .absenteeism import update_absence_states
+from .qr_cache import get_key_cache
+from .report_cache import invalidate_reports, bump_class_generation
+from .push import publish_class_counts
+from .authentication import get_user_cache
+from .teacher_scope import get_teacher_scope_cache
+
+# Student fields that change a teacher's class membership counts
+SCOPE_FIELDS = {"student_class", "student_class_id", "is_active"}
+
+# Student fields shown in cached reports (the register lists the class's
+# active students by roll number and name)
+REPORT_FIELDS = SCOPE_FIELDS | {"full_name", "roll_no"}
+
+# Sent whenever AttendanceRecord rows are written, including bulk writes that
+# bypass post_save. `changes` is a list of (student_id, student_class_id, date);
+# `students_deleted` is set when the students themselves are gone.
+attendance_changed = Signal()
+
+
+def record_key(values):
+    """
+    (student_id, student_class_id, date) from an instance's field values,
+    or None when one of them was not loaded.
+    """
+    try:
+        date = AttendanceRecord._meta.get_field("date").to_python(values["date"])
+        return (values["student_id"], values["student_class_id"], date)
+    except KeyError:
+        return None
+
+
+def is_origin(origin, model):
+    if isinstance(origin, QuerySet):
+        return origin.model is model
+    return isinstance(origin, model)
+
+
+def is_attendance_origin(origin):
+    return is_origin(origin, AttendanceRecord)
+
+
+@receiver(post_save, sender=AttendanceRecord)
+def attendance_record_saved(sender, instance, **kwargs):
+    changes = [record_key(instance.__dict__)]
+
+    loaded = getattr(instance, "_loaded_values", None)
+    if loaded and record_key(loaded) not in (None, changes[0]):
+        changes.append(record_key(loaded))
+
+    attendance_changed.send(sender=AttendanceRecord, changes=changes)
+    instance._loaded_values = dict(instance.__dict__)
+
+
+@receiver(post_delete, sender=AttendanceRecord)
+def attendance_record_deleted(sender, instance, origin=None, **kwargs):
+    # cascades from Student deletion are handled in one go below
+    if origin is not None and not is_attendance_origin(origin):
+        return
+    attendance_changed.send(sender=AttendanceRecord, changes=[record_key(instance.__dict__)])
+
+
+@receiver(pre_delete, sender=Student)
+def student_deleting(sender, instance, origin=None, **kwargs):
+    # deleting a class takes its rollups along, nothing to refresh
+    if is_origin(origin, SchoolClass):
+        return
+    instance._attendance_keys = list(
+        AttendanceRecord.objects.filter(student_id=instance.pk).values_list("student_id", "student_class_id", "date")
+    )
+
+
+@receiver(post_delete, sender=Student)
+def student_deleted(sender, instance, **kwargs):
+    changes = getattr(instance, "_attendance_keys", None)
+    if changes:
+        attendance_changed.send(sender=AttendanceRecord, changes=changes, students_deleted=True)
+
+
+@receiver(attendance_changed)
+def update_daily_summaries(sender, changes, **kwargs):
+    refresh_daily_summaries({(class_id, date) for _, class_id, date in changes})
+
+
+@receiver(attendance_changed)
+def update_student_counters(sender, changes, students_deleted=False, **kwargs):
+    # the counters went with the students (cascade)
+    if students_deleted:
+        return
+    refresh_student_counters({(student_id, date) for student_id, _, date in changes})
+
+
+@receiver(attendance_changed)
+def update_absenteeism(sender, changes, **kwargs):
+    update_absence_states({(student_id, date) for student_id, _, date in changes})
+
+
+@receiver(attendance_changed)
+def invalidate_cached_reports(sender, changes, **kwargs):
+    # on commit: a report built from the pre-commit rows then holds an old version
+    keys = {(class_id, date) for _, class_id, date in changes}
+    transaction.on_commit(lambda: invalidate_reports(keys))
+
+
+@receiver(attendance_changed)
+def push_class_counts(sender, changes, **kwargs):
+    # after commit, so subscribers re-read the rollups the write produced
+    keys = {(class_id, date) for _, class_id, date in changes}
+    transaction.on_commit(lambda: publish_class_counts(keys))
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def invalidate_student_reports(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not REPORT_FIELDS & set(update_fields):
+        return
+    # a student moving class leaves the previous class's reports too
+    class_ids = {instance.student_class_id, getattr(instance, "_previous_class_id", None)} - {None}
+
+    def bump():
+        for class_id in class_ids:
+            bump_class_generation(class_id)
+
+    transaction.on_commit(bump)
+
+
+@receiver(post_save, sender=SchoolClass)
+@receiver(post_delete, sender=SchoolClass)
+def invalidate_class_reports(sender, instance, **kwargs):
+    class_id = instance.pk
+    transaction.on_commit(lambda: bump_class_generation(class_id))
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def invalidate_student_key(sender, instance, **kwargs):
+    # again on commit, so a concurrent miss cannot re-cache the old row;
+    # keys are captured now because Django clears pk after a delete
+    cache = get_key_cache()
+    keys = (instance.student_uid, f"id:{instance.pk}")
+    cache.invalidate(*keys)
+    transaction.on_commit(lambda: cache.invalidate(*keys))
+
+
+def invalidate_users(*user_ids):
+    # the teacher scope is keyed by user id and changes with the same writes
+    for cache in (get_user_cache(), get_teacher_scope_cache()):
+        cache.invalidate(*user_ids)
+        transaction.on_commit(lambda cache=cache: cache.invalidate(*user_ids))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # soft delete, deactivation and role changes must reach auth quickly
+    invalidate_users(instance.pk)
+
+
+@receiver(pre_save, sender=SchoolClass)
+def remember_class_teacher(sender, instance, **kwargs):
+    if instance.pk:
+        instance._previous_teacher_id = SchoolClass.objects.filter(pk=instance.pk).values_list(
+            "class_teacher_id", flat=True
+        ).first()
+
+
+@receiver(post_save, sender=SchoolClass)
+@receiver(post_delete, sender=SchoolClass)
+def invalidate_class_teachers(sender, instance, **kwargs):
+    # both the new and the previous teacher's class ids changed
+    invalidate_users(instance.class_teacher_id, getattr(instance, "_previous_teacher_id", None))
+
+
+@receiver(pre_save, sender=Student)
+def remember_student_class(sender, instance, update_fields=None, **kwargs):
+    if instance.pk and not (update_fields and not SCOPE_FIELDS & set(update_fields)):
+        instance._previous_class_id = Student.objects.filter(pk=instance.pk).values_list(
+            "student_class_id", flat=True
+        ).first()
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def invalidate_student_scopes(sender, instance, update_fields=None, origin=None, **kwargs):
+    if update_fields and not SCOPE_FIELDS & set(update_fields):
+        return
+    # deleting a class invalidates its teacher once, not per student
+    if isinstance(origin, SchoolClass):
+        return
+    class_ids = {instance.student_class_id, getattr(instance, "_previous_class_id", None)} - {None}
+    cache = get_teacher_scope_cache()
+    teacher_ids = list(SchoolClass.objects.filter(id__in=class_ids).values_list("class_teacher_id", flat=True))
+    cache.invalidate(*teacher_ids)
+    transaction.on_commit(lambda: cache.invalidate(*teacher_ids))
@@ -0,0 +1,137 @@
+import base64
+import json
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AttendanceRecord
+
+
+class SyncPayloadError(ValueError):
+    pass
+
+
+def decode_sync_body(body, content_encoding):
+    """
+    Returns the JSON sync payload from a raw request body, gunzipping it
+    when the client sent Content-Encoding: gzip. The decompressed size is
+    capped by SYNC_MAX_BODY_BYTES so a small upload cannot expand unbounded.
+    """
+    max_bytes = getattr(settings, "SYNC_MAX_BODY_BYTES", 5 * 1024 * 1024)
+
+    if content_encoding == "gzip":
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            body = decompressor.decompress(body, max_bytes)
+        except zlib.error:
+            raise SyncPayloadError("Invalid gzip body")
+        if decompressor.unconsumed_tail:
+            raise SyncPayloadError("Sync payload too large")
+    elif content_encoding not in ("", "identity"):
+        raise SyncPayloadError(f"Unsupported Content-Encoding: {content_encoding}")
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise SyncPayloadError("Body is not valid JSON")
+
+    if not isinstance(payload, dict):
+        raise SyncPayloadError("Body must be a JSON object")
+
+    return payload
+
+
+def scan_date_from_client_timestamp(value):
+    """
+    Returns (client_ts, attendance date) for an offline scan. The date is
+    None when the timestamp is missing, unparsable, in the future or older
+    than SYNC_MAX_SCAN_AGE_DAYS.
+    """
+    try:
+        client_ts = parse_datetime(value) if isinstance(value, str) else None
+    except ValueError:
+        client_ts = None
+    if client_ts is None:
+        return None, None
+
+    if timezone.is_naive(client_ts):
+        client_ts = timezone.make_aware(client_ts)
+
+    scan_date = timezone.localdate(client_ts)
+    today = timezone.localdate()
+    max_age = getattr(settings, "SYNC_MAX_SCAN_AGE_DAYS", 7)
+    if scan_date > today or scan_date < today - timedelta(days=max_age):
+        return client_ts, None
+
+    return client_ts, scan_date
+
+
+def encode_cursor(updated_at, record_id):
+    raw = f"{updated_at.isoformat()}|{record_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Returns (updated_at, record_id) or None for an empty cursor.
+    """
+    if not cursor:
+        return None
+    if not isinstance(cursor, str):
+        raise SyncPayloadError("Invalid cursor")
+    try:
+        updated_at, record_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        updated_at = parse_datetime(updated_at)
+        if updated_at is None:
+            raise ValueError
+        return updated_at, int(record_id)
+    except (ValueError, UnicodeDecodeError):
+        raise SyncPayloadError("Invalid cursor")
+
+
+def parse_class_ids(value):
+    """
+    The optional class_ids filter of a sync payload: None when absent,
+    otherwise a list of ints.
+    """
+    if value is None or value == []:
+        return None
+    if not isinstance(value, list) or not all(isinstance(class_id, int) and not isinstance(class_id, bool) for class_id in value):
+        raise SyncPayloadError("class_ids must be a list of integers")
+    return value
+
+
+def records_changed_since(class_ids, position, limit):
+    """
+    Records of the given classes changed after the decoded cursor
+    `position` (see decode_cursor), in (updated_at, id) keyset order.
+    Returns (rows, next_cursor, has_more) where each row is
+    [id, student_id, class_id, "YYYY-MM-DD", status].
+    """
+    records = AttendanceRecord.objects.filter(student_class_id__in=class_ids)
+
+    if position:
+        updated_at, record_id = position
+        records = records.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=record_id))
+
+    fetched = list(
+        records.order_by("updated_at", "id").values_list(
+            "id", "student_id", "student_class_id", "date", "status", "updated_at"
+        )[:limit + 1]
+    )
+
+    has_more = len(fetched) > limit
+    fetched = fetched[:limit]
+
+    if fetched:
+        last = fetched[-1]
+        next_cursor = encode_cursor(last[5], last[0])
+    else:
+        next_cursor = encode_cursor(*position) if position else None
+
+    rows = [[record_id, student_id, class_id, str(date), status] for record_id, student_id, class_id, date, status, _ in fetched]
+    return rows, next_cursor, has_more
@@ -0,0 +1,74 @@
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+from .models import SchoolClass
+from .qr_cache import LRUKeyBackend
+
+# What the teacher dashboards need about a teacher's classes; `classes` is
+# a tuple of {"id", "name", "students", "active_students"}, by id.
+TeacherScope = namedtuple("TeacherScope", ["class_ids", "classes", "total_students", "active_students"])
+
+
+def load_teacher_scope(teacher_id):
+    """
+    Builds a TeacherScope with one grouped query over the teacher's classes.
+    """
+    classes = SchoolClass.objects.filter(class_teacher_id=teacher_id).annotate(
+        student_count=Count("students"),
+        active_count=Count("students", filter=Q(students__is_active=True))
+    ).order_by("id")
+
+    rows = tuple(
+        {"id": cls.id, "name": str(cls), "students": cls.student_count, "active_students": cls.active_count}
+        for cls in classes
+    )
+    return TeacherScope(
+        class_ids=tuple(row["id"] for row in rows),
+        classes=rows,
+        total_students=sum(row["students"] for row in rows),
+        active_students=sum(row["active_students"] for row in rows),
+    )
+
+
+class TeacherScopeCache:
+    """
+    Short-TTL cache of TeacherScope by teacher id. Invalidated by
+    core.signals on SchoolClass, Student and User writes and after student
+    imports; the TTL bounds staleness in other processes.
+    """
+
+    def __init__(self, max_entries=10000, timeout=60):
+        self.backend = LRUKeyBackend(max_entries=max_entries, timeout=timeout)
+
+    def get(self, teacher_id):
+        key = str(teacher_id)
+        scope = self.backend.get_many([key]).get(key)
+        if scope is None:
+            scope = load_teacher_scope(teacher_id)
+            self.backend.set_many({key: scope})
+        return scope
+
+    def invalidate(self, *teacher_ids):
+        self.backend.delete_many([str(teacher_id) for teacher_id in teacher_ids if teacher_id is not None])
+
+    def clear(self):
+        self.backend.clear()
+
+
+_scope_cache = None
+_scope_cache_lock = threading.Lock()
+
+
+def get_teacher_scope_cache():
+    global _scope_cache
+    if _scope_cache is None:
+        with _scope_cache_lock:
+            if _scope_cache is None:
+                _scope_cache = TeacherScopeCache(
+                    max_entries=getattr(settings, "TEACHER_SCOPE_CACHE_MAX_ENTRIES", 10000),
+                    timeout=getattr(settings, "TEACHER_SCOPE_CACHE_TIMEOUT", 60)
+                )
+    return _scope_cache
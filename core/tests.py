@@ -1,3 +1,1490 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import re
+import shutil
+import tempfile
+import time
+from datetime import date, timedelta
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .absenteeism import WINDOW_DAYS, rebuild_absence_states
+from .attendance_utils import finalize_attendance
+from .authentication import AttendanceTokenObtainPairSerializer, get_user_cache
+from .export_utils import register_matrix
+from .metrics import Histogram
+from . import qr_sheet
+from .qr_sheet import CARDS_PER_PAGE, PAGE_SIZE
+from .qr_jobs import claim_jobs, enqueue_qr_generation, process_pending_jobs, requeue_stale_jobs, run_in_worker
+from .qr_cache import DjangoCacheKeyBackend, StudentKeyCache, get_key_cache, reset_key_cache
+from .models import (
+    SchoolClass, Student, AttendanceRecord, DailyClassAttendanceSummary, StudentMonthlyAttendance, StudentAttendanceStats,
+    StudentAbsenceState, SyncedScan, QRGenerationJob
+)
+from .report_cache import cached_report_response, get_report_cache, invalidate_reports
+from .teacher_scope import TeacherScopeCache, get_teacher_scope_cache
+from .utils import (
+    QR_PAYLOAD_VERSION, QRSignatureError, build_legacy_qr_payload, build_qr_payload, parse_qr_data, qr_key_matches
+)
+
+User = get_user_model()
+
+
+class ListEndpointQueryCountTests(TestCase):
+    """
+    Guards against N+1 queries: the number of queries a list endpoint runs
+    must not grow with the number of rows it returns.
+    """
+
+    def setUp(self):
+        self.admin = User.objects.create(username="admin", role="ADMIN")
+        self.teacher = User.objects.create(username="teacher", role="TEACHER")
+        self.school_class = SchoolClass.objects.create(class_name="5", section="A", class_teacher=self.teacher)
+        self.today = timezone.now().date()
+        self.student = None
+
+        self.admin_client = APIClient()
+        self.admin_client.force_authenticate(self.admin)
+        self.teacher_client = APIClient()
+        self.teacher_client.force_authenticate(self.teacher)
+
+    def add_rows(self, count):
+        """Adds `count` students to the class, each with today's absent record and past history."""
+        for _ in range(count):
+            teacher = User.objects.create(username=f"teacher{User.objects.count()}", role="TEACHER")
+            SchoolClass.objects.create(class_name="6", class_teacher=teacher)
+
+            student = Student.objects.create(
+                full_name=f"Student {Student.objects.count()}",
+                roll_no=Student.objects.count() + 1,
+                student_class=self.school_class
+            )
+            AttendanceRecord.objects.create(
+                student=student, student_class=self.school_class,
+                date=self.today, status="A", marked_by=self.teacher, method="AUTO"
+            )
+            if self.student is None:
+                self.student = student
+            AttendanceRecord.objects.create(
+                student=self.student, student_class=self.school_class,
+                date=self.today - timedelta(days=AttendanceRecord.objects.filter(student=self.student).count()),
+                status="P", marked_by=self.teacher
+            )
+
+    def count_queries(self, client, url):
+        get_report_cache().clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertQueryCountFlat(self, client, url_factory):
+        self.add_rows(2)
+        small = self.count_queries(client, url_factory())
+        self.add_rows(5)
+        large = self.count_queries(client, url_factory())
+        self.assertEqual(small, large, f"query count grew with result size ({small} -> {large})")
+
+    def test_student_list(self):
+        self.assertQueryCountFlat(self.admin_client, lambda: "/api/students/")
+
+    def test_class_list(self):
+        self.assertQueryCountFlat(self.admin_client, lambda: "/api/classes/")
+
+    def test_today_attendance_by_class(self):
+        self.assertQueryCountFlat(self.teacher_client, lambda: f"/api/attendance/today/{self.school_class.id}/")
+
+    def test_daily_report(self):
+        self.assertQueryCountFlat(self.teacher_client, lambda: f"/api/reports/daily/{self.school_class.id}/")
+
+    def test_student_history(self):
+        self.assertQueryCountFlat(self.teacher_client, lambda: f"/api/reports/student/{self.student.id}/?include_records=true")
+
+    def test_teacher_absent_today(self):
+        self.assertQueryCountFlat(self.teacher_client, lambda: "/api/dashboard/teacher/absent-today/")
+
+    def test_admin_classwise_today(self):
+        self.assertQueryCountFlat(self.admin_client, lambda: "/api/dashboard/admin/classwise-today/")
+
+
+class DailySummaryRollupTests(TestCase):
+    """
+    DailyClassAttendanceSummary must follow every write to the raw records.
+    """
+
+    def setUp(self):
+        self.teacher = User.objects.create(username="teacher", role="TEACHER")
+        self.school_class = SchoolClass.objects.create(class_name="5", section="A", class_teacher=self.teacher)
+        self.students = [
+            Student.objects.create(full_name=f"Student {i}", roll_no=i, student_class=self.school_class)
+            for i in range(3)
+        ]
+        self.today = timezone.now().date()
+
+    def mark(self, student, status="P"):
+        return AttendanceRecord.objects.create(
+            student=student, student_class=self.school_class, date=self.today, status=status, marked_by=self.teacher
+        )
+
+    def summary(self):
+        return DailyClassAttendanceSummary.objects.filter(
+            student_class=self.school_class, date=self.today
+        ).values_list("present", "absent", "total").first()
+
+    def test_totals_follow_insert_status_change_and_delete(self):
+        first = self.mark(self.students[0])
+        self.assertEqual(self.summary(), (1, 0, 1))
+
+        finalize_attendance([self.school_class.id], self.teacher, self.today)
+        self.assertEqual(self.summary(), (1, 2, 3))
+
+        flipped = AttendanceRecord.objects.get(student=self.students[1], date=self.today)
+        flipped.status = "P"
+        flipped.save()
+        self.assertEqual(self.summary(), (2, 1, 3))
+
+        first.delete()
+        self.assertEqual(self.summary(), (1, 1, 2))
+
+        AttendanceRecord.objects.all().delete()
+        self.assertIsNone(self.summary())
+
+    def test_summary_row_is_locked_before_recount(self):
+        # a concurrent writer must wait for this transaction before counting,
+        # otherwise both upsert totals that miss the other's record
+        with CaptureQueriesContext(connection) as queries:
+            self.mark(self.students[0])
+
+        statements = [query["sql"].upper() for query in queries]
+        summary_table = DailyClassAttendanceSummary._meta.db_table.upper()
+        record_table = AttendanceRecord._meta.db_table.upper()
+        lock = next(i for i, sql in enumerate(statements) if sql.startswith("INSERT") and summary_table in sql)
+        count = next(i for i, sql in enumerate(statements) if sql.startswith("SELECT") and "COUNT(" in sql and record_table in sql)
+        self.assertLess(lock, count)
+
+
+class StudentCounterRollupTests(TestCase):
+    """
+    StudentMonthlyAttendance and StudentAttendanceStats must follow every
+    write without re-summing a student's history.
+    """
+
+    def setUp(self):
+        self.teacher = User.objects.create(username="teacher", role="TEACHER")
+        self.school_class = SchoolClass.objects.create(class_name="5", section="A", class_teacher=self.teacher)
+        self.student = Student.objects.create(full_name="Student", roll_no=1, student_class=self.school_class)
+        self.other = Student.objects.create(full_name="Other", roll_no=2, student_class=self.school_class)
+        self.today = timezone.now().date()
+        self.last_month = (self.today.replace(day=1) - timedelta(days=1)).replace(day=1)
+
+    def mark(self, student, date, status):
+        return AttendanceRecord.objects.create(
+            student=student, student_class=self.school_class, date=date, status=status, marked_by=self.teacher
+        )
+
+    def counters(self, student):
+        months = {
+            month: [present, absent, total]
+            for month, present, absent, total in StudentMonthlyAttendance.objects.filter(student=student).values_list(
+                "month", "present", "absent", "total"
+            )
+        }
+        stats = StudentAttendanceStats.objects.filter(student=student).values_list("present", "absent", "total").first()
+        return months, stats
+
+    def test_record_flip_moves_month_and_lifetime_counters(self):
+        self.mark(self.student, self.last_month, "P")
+        record = self.mark(self.student, self.today, "P")
+        this_month = self.today.replace(day=1)
+        self.assertEqual(self.counters(self.student), ({self.last_month: [1, 0, 1], this_month: [1, 0, 1]}, (2, 0, 2)))
+
+        record.status = "A"
+        with CaptureQueriesContext(connection) as queries:
+            record.save()
+        self.assertEqual(self.counters(self.student), ({self.last_month: [1, 0, 1], this_month: [0, 1, 1]}, (1, 1, 2)))
+        self.assertFalse(any("SUM(" in query["sql"].upper() for query in queries), "lifetime counters were re-summed")
+
+        record.delete()
+        self.assertEqual(self.counters(self.student), ({self.last_month: [1, 0, 1]}, (1, 0, 1)))
+
+    def test_deleting_last_record_drops_counters(self):
+        record = self.mark(self.student, self.today, "A")
+        record.delete()
+        self.assertEqual(self.counters(self.student), ({}, None))
+
+    def test_student_delete(self):
+        self.mark(self.student, self.today, "P")
+        self.mark(self.other, self.today, "A")
+        self.mark(self.other, self.last_month, "P")
+
+        student_id = self.student.id
+        self.student.delete()
+
+        self.assertFalse(StudentAttendanceStats.objects.filter(student_id=student_id).exists())
+        self.assertFalse(StudentMonthlyAttendance.objects.filter(student_id=student_id).exists())
+        self.assertEqual(self.counters(self.other)[1], (1, 1, 2))
+        self.assertEqual(
+            DailyClassAttendanceSummary.objects.filter(student_class=self.school_class, date=self.today).values_list(
+                "present", "absent", "total"
+            ).first(),
+            (0, 1, 1)
+        )
+
+
+class AttendanceEventStreamTests(TestCase):
+    """
+    The event stream opens with a short-lived ticket instead of an access
+    token in the URL, pushes class totals to teachers of that class only,
+    and refuses to run under WSGI.
+    """
+
+    url = "/api/attendance/events/"
+
+    def setUp(self):
+        get_user_cache().clear()
+        self.teacher = User.objects.create(username="teacher", role="TEACHER")
+        self.other_teacher = User.objects.create(username="other", role="TEACHER")
+        self.school_class = SchoolClass.objects.create(class_name="5", section="A", class_teacher=self.teacher)
+        SchoolClass.objects.create(class_name="5", section="B", class_teacher=self.other_teacher)
+        self.student = Student.objects.create(full_name="Student", roll_no=1, student_class=self.school_class)
+
+    def ticket(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post("/api/attendance/events/ticket/")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["ticket"]
+
+    def test_wsgi_request_is_refused(self):
+        # an endless stream would be buffered forever by the WSGI handler
+        response = self.client.get(self.url, {"ticket": self.ticket(self.teacher)})
+        self.assertEqual(response.status_code, 501)
+
+    async def test_access_token_in_query_is_refused(self):
+        response = await self.async_client.get(self.url, {"token": str(AccessToken.for_user(self.teacher))})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_expired_or_foreign_ticket_is_refused(self):
+        ticket = await sync_to_async(self.ticket)(self.teacher)
+        with override_settings(STREAM_TICKET_MAX_AGE=-1):
+            response = await self.async_client.get(self.url, {"ticket": ticket})
+        self.assertEqual((response.status_code, response.json()["code"]), (401, "ticket_expired"))
+
+        # a value signed for another purpose is not a ticket
+        response = await self.async_client.get(self.url, {"ticket": signing.dumps({"user_id": self.teacher.id})})
+        self.assertEqual((response.status_code, response.json()["code"]), (401, "ticket_invalid"))
+
+    async def test_other_class_teacher_is_refused(self):
+        ticket = await sync_to_async(self.ticket)(self.other_teacher)
+        response = await self.async_client.get(self.url, {"ticket": ticket, "class_id": self.school_class.id})
+        self.assertEqual(response.status_code, 403)
+
+    def mark_and_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            AttendanceRecord.objects.create(
+                student=self.student, student_class=self.school_class,
+                date=timezone.now().date(), status="P", marked_by=self.teacher
+            )
+
+    async def test_marked_attendance_is_pushed(self):
+        ticket = await sync_to_async(self.ticket)(self.teacher)
+        response = await self.async_client.get(self.url, {"ticket": ticket})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+
+        events = aiter(response.streaming_content)
+        try:
+            self.assertEqual(await anext(events), b"retry: 3000\n\n")
+            snapshot = json.loads((await anext(events)).decode().split("data: ", 1)[1])
+            self.assertEqual((snapshot["class_id"], snapshot["total"]), (self.school_class.id, 0))
+
+            await sync_to_async(self.mark_and_commit)()
+            pushed = await asyncio.wait_for(anext(events), 5)
+        finally:
+            await events.aclose()
+
+        self.assertTrue(pushed.startswith(b"event: attendance\ndata: "))
+        event = json.loads(pushed.decode().split("data: ", 1)[1])
+        self.assertEqual(
+            (event["class_id"], event["present"], event["total"]),
+            (self.school_class.id, 1, 1)
+        )
+
+
+class AsyncViewParityTests(TestCase):
+    """
+    The async endpoints under /api/async/ answer exactly like their sync
+    counterparts: same status codes, payloads and permission denials.
+    """
+
+    def setUp(self):
+        get_user_cache().clear()
+        reset_key_cache()
+        self.addCleanup(reset_key_cache)
+        self.admin = User.objects.create(username="admin", role="ADMIN")
+        self.teacher = User.objects.create(username="teacher", role="TEACHER")
+        self.outsider = User.objects.create(username="outsider", role="STAFF")
+        self.school_class = SchoolClass.objects.create(class_name="5", section="A", class_teacher=self.teacher)
+        self.students = [
+            Student.objects.create(full_name=f"Student {i}", roll_no=i, student_class=self.school_class)
+            for i in range(2)
+        ]
+        self.qr_data = [build_qr_payload(student) for student in self.students]
+        self.tokens = {
+            user: str(AttendanceTokenObtainPairSerializer.get_token(user).access_token)
+            for user in (self.admin, self.teacher, self.outsider)
+        }
+
+    def headers(self, user, token=None):
+        if user is None and token is None:
+            return {}
+        return {"Authorization": f"Bearer {token or self.tokens[user]}"}
+
+    async def get_both(self, path, user, token=None):
+        headers = self.headers(user, token)
+        sync_response = await sync_to_async(self.client.get)(f"/api/{path}", headers=headers)
+        async_response = await self.async_client.get(f"/api/async/{path}", headers=headers)
+        return sync_response, async_response
+
+    async def post_both(self, path, user, data, token=None):
+        headers = self.headers(user, token)
+        sync_response = await sync_to_async(self.client.post)(
+            f"/api/{path}", data, content_type="application/json", headers=headers
+        )
+        async_response = await self.async_client.post(
+            f"/api/async/{path}", data, content_type="application/json", headers=headers
+        )
+        return sync_response, async_response
+
+    def assertSameResponse(self, responses, status_code):
+        sync_response, async_response = responses
+        self.assertEqual((sync_response.status_code, async_response.status_code), (status_code, status_code))
+        self.assertEqual(sync_response.json(), async_response.json())
+
+    async def test_mark_rejections_match(self):
+        tampered = self.qr_data[0][:-1] + ("A" if self.qr_data[0][-1] != "A" else "B")
+        cases = [
+            (None, {"qr_data": self.qr_data[0]}, None, 401),
+            (None, {"qr_data": self.qr_data[0]}, "not-a-jwt", 401),
+            (self.outsider, {"qr_data": self.qr_data[0]}, None, 403),
+            (self.teacher, {}, None, 400),
+            (self.teacher, {"qr_data": "junk"}, None, 400),
+            (self.teacher, {"qr_data": tampered}, None, 401),
+        ]
+        for user, data, token, status_code in cases:
+            with self.subTest(user=user and user.username, data=data, token=token):
+                self.assertSameResponse(await self.post_both("attendance/mark/", user, data, token), status_code)
+        self.assertFalse(await AttendanceRecord.objects.aexists())
+
+    async def test_mark_and_duplicate_match(self):
+        data = {"qr_data": self.qr_data[0]}
+        sync_response = await sync_to_async(self.client.post)(
+            "/api/attendance/mark/", data, content_type="application/json", headers=self.headers(self.teacher)
+        )
+        await AttendanceRecord.objects.filter(student=self.students[0]).adelete()
+        async_response = await self.async_client.post(
+            "/api/async/attendance/mark/", data, content_type="application/json", headers=self.headers(self.teacher)
+        )
+
+        self.assertEqual((sync_response.status_code, async_response.status_code), (201, 201))
+        sync_body, async_body = sync_response.json(), async_response.json()
+        for body in (sync_body, async_body):
+            del body["data"]["id"], body["data"]["marked_at"]
+        self.assertEqual(sync_body, async_body)
+        self.assertEqual(async_body["data"]["method"], "QR")
+
+        self.assertSameResponse(await self.post_both("attendance/mark/", self.teacher, data), 409)
+
+    async def test_today_matches(self):
+        for student, status in zip(self.students, ("P", "A")):
+            await AttendanceRecord.objects.acreate(
+                student=student, student_class=self.school_class,
+                date=timezone.now().date(), status=status, marked_by=self.teacher
+            )
+
+        path = f"attendance/today/{self.school_class.id}/"
+        self.assertSameResponse(await self.get_both(path, self.teacher), 200)
+        self.assertEqual(len((await self.async_client.get(f"/api/async/{path}", headers=self.headers(self.admin))).json()), 2)
+        self.assertSameResponse(await self.get_both(path, self.outsider), 403)
+        self.assertSameResponse(await self.get_both(path, None), 401)
+
+    async def test_admin_overview_matches(self):
+        await AttendanceRecord.objects.acreate(
+            student=self.students[0], student_class=self.school_class,
+            date=timezone.now().date(), status="P", marked_by=self.teacher
+        )
+
+        path = "dashboard/admin/overview/"
+        self.assertSameResponse(await self.get_both(path, self.admin), 200)
+        self.assertSameResponse(await self.get_both(path, self.teacher), 403)
+        self.assertSameResponse(await self.get_both(path, None), 401)
+
+
+class OfflineSyncValidationTests(TestCase):
+    """
+    A malformed sync request is rejected before any scan is applied.
+    """
+
+    def setUp(self):
+        self.teacher = User.objects.create(username="teacher", role="TEACHER")
+        self.school_class = SchoolClass.objects.create(class_name="5", section="A", class_teacher=self.teacher)
+        self.student = Student.objects.create(full_name="Student", roll_no=1, student_class=self.school_class)
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def sync(self, **extra):
+        payload = {
+            "device_id": "tablet-1",
+            "scans": [{
+                "idempotency_key": "scan-1",
+                "qr_data": build_qr_payload(self.student),
+                "client_ts": timezone.now().isoformat()
+            }],
+            **extra
+        }
+        return self.client.post("/api/attendance/sync/", payload, format="json")
+
+    def assertNothingApplied(self):
+        self.assertFalse(AttendanceRecord.objects.exists())
+        self.assertFalse(SyncedScan.objects.exists())
+
+    def test_class_ids_must_be_a_list_of_ints(self):
+        for class_ids in ("abc", [{"x": 1}], ["1"], 5):
+            with self.subTest(class_ids=class_ids):
+                self.assertEqual(self.sync(class_ids=class_ids).status_code, 400)
+        self.assertNothingApplied()
+
+    def test_bad_cursor_applies_no_scans(self):
+        for cursor in ("not-a-cursor", 12):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.sync(cursor=cursor).status_code, 400)
+        self.assertNothingApplied()
+
+    def test_valid_sync(self):
+        response = self.sync(class_ids=[self.school_class.id])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"], [["scan-1", "created"]])
+        self.assertEqual(len(response.json()["changes"]), 1)
+        self.assertTrue(SyncedScan.objects.filter(idempotency_key="scan-1").exists())
+
+
+class BulkQRScanTests(TestCase):
+    """
+    /api/attendance/mark/bulk/ reports one status per scan, inserts the
+    batch with a fixed number of queries, and reports scans that lost the
+    (student, date) race as duplicates.
+    """
+
+    url = "/api/attendance/mark/bulk/"
+
+    def setUp(self):
+        reset_key_cache()
+        self.teacher = User.objects.create(username="teacher", role="TEACHER")
+        self.school_class = SchoolClass.objects.create(class_name="5", section="A", class_teacher=self.teacher)
+        self.other_class = SchoolClass.objects.create(class_name="6", section="A")
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def add_students(self, count):
+        start = Student.objects.count()
+        return [
+            Student.objects.create(full_name=f"Student {start + n}", roll_no=start + n + 1, student_class=self.school_class)
+            for n in range(count)
+        ]
+
+    def scan(self, scans):
+        response = self.client.post(self.url, {"scans": scans}, format="json")
+        self.assertEqual(response.status_code, 200)
+        return [result["status"] for result in response.data["results"]]
+
+    def test_statuses(self):
+        first, second = self.add_students(2)
+        tampered = build_qr_payload(second)[:-1] + ("A" if build_qr_payload(second)[-1] != "A" else "B")
+        mismatch = json.dumps({**json.loads(build_legacy_qr_payload(second)), "class_id": self.other_class.id})
+
+        statuses = self.scan([build_qr_payload(first), {"qr_data": build_qr_payload(first)}, tampered, mismatch, "junk"])
+        self.assertEqual(statuses, ["created", "duplicate", "verification_failed", "class_mismatch", "invalid_format"])
+        self.assertEqual(self.scan([build_qr_payload(first)]), ["duplicate"])
+        self.assertEqual(
+            list(AttendanceRecord.objects.values_list("student_id", "status", "marked_by_id", "method")),
+            [(first.id, "P", self.teacher.id, "QR")]
+        )
+
+    @override_settings(QR_KEY_CACHE={"BACKEND": "lru"})
+    def test_query_count_is_flat(self):
+        # the in-process key cache, so only the scan's own queries are counted
+        reset_key_cache()
+        self.addCleanup(reset_key_cache)
+
+        def count(students):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.scan([build_qr_payload(student) for student in students]), ["created"] * len(students))
+            return len(queries)
+
+        small = count(self.add_students(2))
+        large = count(self.add_students(6))
+        self.assertEqual(small, large, f"query count grew with batch size ({small} -> {large})")
+
+    def test_lost_race_is_reported_as_duplicate(self):
+        first, second = self.add_students(2)
+        bulk_create = AttendanceRecord.objects.bulk_create
+
+        def finalized_meanwhile(records, **kwargs):
+            # finalization marks `second` absent between the check and the insert
+            AttendanceRecord.objects.create(
+                student=second, student_class=self.school_class, date=records[0].date, status="A", method="AUTO"
+            )
+            return bulk_create(records, **kwargs)
+
+        with mock.patch.object(AttendanceRecord.objects, "bulk_create", side_effect=finalized_meanwhile):
+            statuses = self.scan([build_qr_payload(first), build_qr_payload(second)])
+        self.assertEqual(statuses, ["created", "duplicate"])
+        self.assertEqual(AttendanceRecord.objects.get(student=second).status, "A")
+        self.assertEqual(StudentAttendanceStats.objects.get(student=second).absent, 1)
+
+
+@override_settings(QR_KEY_CACHE={"BACKEND": "lru"})
+class SingleScanQueryCountTests(TestCase):
+    """
+    Pins the cost of one QR scan: the insert plus the attendance_changed
+    receivers (daily summary, student counters, absence state) run in the
+    request transaction. See "What one QR scan costs" in the README.
+    """
+
+    def setUp(self):
+        reset_key_cache()
+        self.addCleanup(reset_key_cache)
+        self.teacher = User.objects.create(username="teacher", role="TEACHER")
+        self.school_class = SchoolClass.objects.create(class_name="5", section="A", class_teacher=self.teacher)
+        self.student = Student.objects.create(full_name="Student", roll_no=1, student_class=self.school_class)
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def test_single_scan(self):
+        qr_data = build_qr_payload(self.student)
+        get_key_cache().get(f"id:{self.student.id}")
+
+        with self.assertNumQueries(16):
+            response = self.client.post("/api/attendance/mark/", {"qr_data": qr_data}, format="json")
+        self.assertEqual(response.status_code, 201)
+
+
+class QRKeyCacheTests(TestCase):
+    """
+    Verification keys are cached where every worker sees the invalidation,
+    and a scan of a student deleted behind a cached key is a 404.
+    """
+
+    def setUp(self):
+        reset_key_cache()
+        self.admin = User.objects.create(username="admin", role="ADMIN")
+        self.school_class = SchoolClass.objects.create(class_name="5", section="A")
+        self.student = Student.objects.create(full_name="Student", roll_no=1, student_class=self.school_class)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_rotation_reaches_other_workers(self):
+        # another worker's key cache, on its own connection to the same alias
+        self.assertIsInstance(get_key_cache().backend, DjangoCacheKeyBackend)
+        backend = DjangoCacheKeyBackend(alias=settings.QR_KEY_CACHE["CACHE_ALIAS"])
+        backend.cache = caches.create_connection(settings.QR_KEY_CACHE["CACHE_ALIAS"])
+        self.assertNotIsInstance(backend.cache, LocMemCache, "the key cache must be shared across processes")
+        other_worker = StudentKeyCache(backend)
+
+        key = f"id:{self.student.id}"
+        old_key = other_worker.get(key).verification_key
+        self.assertEqual(self.client.post(f"/api/students/{self.student.id}/rotate-key/").status_code, 200)
+        self.student.refresh_from_db()
+        self.assertNotEqual(self.student.verification_key, old_key)
+        self.assertEqual(other_worker.get(key).verification_key, self.student.verification_key)
+
+    def test_scan_of_deleted_student_is_not_found(self):
+        qr_data = build_qr_payload(self.student)
+        self.assertIsNotNone(get_key_cache().get(f"id:{self.student.id}"))
+
+        # the student row went away after the key was read from the cache
+        with mock.patch.object(AttendanceRecord.objects, "get_or_create", side_effect=IntegrityError):
+            response = self.client.post("/api/attendance/mark/", {"qr_data": qr_data}, format="json")
+        self.assertEqual(response.status_code, 404)
+
+
+class QRPayloadTests(TestCase):
+    """
+    The compact signed QR format and the legacy formats it replaced.
+    """
+
+    def setUp(self):
+        self.admin = User.objects.create(username="admin", role="ADMIN")
+        self.school_class = SchoolClass.objects.create(class_name="5", section="A")
+        self.student = Student.objects.create(full_name="Student", roll_no=1, student_class=self.school_class)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def scan(self, qr_data):
+        return self.client.post("/api/attendance/mark/", {"qr_data": qr_data}, format="json")
+
+    def test_compact_round_trip(self):
+        qr_data = build_qr_payload(self.student)
+        self.assertTrue(qr_data.startswith(QR_PAYLOAD_VERSION))
+        self.assertEqual(len(qr_data), 34)
+
+        payload = parse_qr_data(qr_data)
+        self.assertEqual(payload.version, QR_PAYLOAD_VERSION)
+        self.assertEqual(payload.student_id, self.student.id)
+        self.assertEqual(payload.class_id, str(self.school_class.id))
+        self.assertIsNone(payload.verification_key)
+        self.assertTrue(qr_key_matches(payload, self.student.verification_key))
+        self.assertFalse(qr_key_matches(payload, "some-other-key"))
+
+        self.assertEqual(self.scan(qr_data).status_code, 201)
+
+    def test_tampered_payload_fails_signature(self):
+        qr_data = build_qr_payload(self.student)
+        # last character lies in the MAC, the one after the prefix in the student id
+        for position in (len(qr_data) - 1, len(QR_PAYLOAD_VERSION)):
+            replacement = "A" if qr_data[position] != "A" else "B"
+            tampered = qr_data[:position] + replacement + qr_data[position + 1:]
+            with self.subTest(position=position):
+                with self.assertRaises(QRSignatureError):
+                    parse_qr_data(tampered)
+                response = self.scan(tampered)
+                self.assertEqual(response.status_code, 401)
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+    def test_rotated_key_invalidates_printed_card(self):
+        old_card = build_qr_payload(self.student)
+        response = self.client.post(f"/api/students/{self.student.id}/rotate-key/")
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.scan(old_card).status_code, 401)
+        self.student.refresh_from_db()
+        self.assertEqual(self.scan(build_qr_payload(self.student)).status_code, 201)
+
+    def test_legacy_payloads_are_accepted(self):
+        other = Student.objects.create(full_name="Other", roll_no=2, student_class=self.school_class)
+        json_card = build_legacy_qr_payload(self.student)
+        pipe_card = f"{other.student_uid}|{other.student_class_id}|{other.verification_key}"
+
+        payload = parse_qr_data(json_card)
+        self.assertEqual(payload.version, "legacy")
+        self.assertEqual(payload.student_uid, str(self.student.student_uid))
+        self.assertTrue(qr_key_matches(payload, self.student.verification_key))
+
+        self.assertEqual(self.scan(json_card).status_code, 201)
+        self.assertEqual(self.scan(pipe_card).status_code, 201)
+        self.assertEqual(self.scan(f"{other.student_uid}|{other.student_class_id}|wrong-key").status_code, 401)
+
+    def test_unknown_format_is_rejected(self):
+        for qr_data in ("garbage", QR_PAYLOAD_VERSION + "!" * 32, '{"student_uid": 1}'):
+            with self.subTest(qr_data=qr_data):
+                with self.assertRaises(ValueError):
+                    parse_qr_data(qr_data)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    """
+    Users are rebuilt from a short-TTL cache; writes that change access
+    must reach it immediately.
+    """
+
+    def setUp(self):
+        self.admin = User.objects.create(username="admin", role="ADMIN")
+        self.teacher = User.objects.create(username="teacher", role="TEACHER")
+        self.school_class = SchoolClass.objects.create(class_name="5", section="A", class_teacher=self.teacher)
+
+    def client_for(self, user):
+        client = APIClient()
+        token = AttendanceTokenObtainPairSerializer.get_token(user).access_token
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        return client
+
+    def test_deactivated_teacher_is_rejected(self):
+        client = self.client_for(self.teacher)
+        self.assertEqual(client.get("/api/profile/").status_code, 200)
+
+        self.teacher.is_active = False
+        self.teacher.save()
+
+        response = client.get("/api/profile/")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()["code"], "user_inactive")
+
+    def test_soft_deleted_teacher_is_rejected(self):
+        client = self.client_for(self.teacher)
+        self.assertEqual(client.get("/api/profile/").status_code, 200)
+
+        response = self.client_for(self.admin).delete(f"/api/teachers/{self.teacher.id}/delete/")
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(client.get("/api/profile/").status_code, 401)
+
+    def test_role_claim_mismatch_is_rejected(self):
+        client = self.client_for(self.teacher)
+        self.assertEqual(client.get("/api/profile/").status_code, 200)
+
+        self.teacher.role = "ADMIN"
+        self.teacher.save()
+
+        response = client.get("/api/profile/")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()["code"], "role_changed")
+
+    def test_reassigning_class_teacher_invalidates_both_teachers(self):
+        other = User.objects.create(username="other", role="TEACHER")
+        for user in (self.teacher, other):
+            self.assertEqual(self.client_for(user).get("/api/profile/").status_code, 200)
+        cache = get_user_cache()
+        self.assertEqual(cache.get(self.teacher.id)["class_ids"], [self.school_class.id])
+        self.assertEqual(cache.get(other.id)["class_ids"], [])
+
+        self.school_class.class_teacher = other
+        self.school_class.save()
+
+        self.assertEqual(cache.get(self.teacher.id)["class_ids"], [])
+        self.assertEqual(cache.get(other.id)["class_ids"], [self.school_class.id])
+
+
+class TeacherScopeCacheTests(TestCase):
+    """
+    A teacher's cached classes and student counts follow class and student
+    writes in this worker; other workers catch up within the TTL.
+    """
+
+    def setUp(self):
+        get_teacher_scope_cache().clear()
+        self.teacher = User.objects.create(username="teacher", role="TEACHER")
+        self.other = User.objects.create(username="other", role="TEACHER")
+        self.first = SchoolClass.objects.create(class_name="5", section="A", class_teacher=self.teacher)
+        self.second = SchoolClass.objects.create(class_name="6", section="B", class_teacher=self.teacher)
+        SchoolClass.objects.create(class_name="7", class_teacher=self.other)
+        for roll_no, active in ((1, True), (2, False)):
+            Student.objects.create(full_name=f"Student {roll_no}", roll_no=roll_no, student_class=self.first, is_active=active)
+
+    def test_scope_contents(self):
+        scope = get_teacher_scope_cache().get(self.teacher.id)
+        self.assertEqual(scope.class_ids, (self.first.id, self.second.id))
+        self.assertEqual(scope.classes, (
+            {"id": self.first.id, "name": str(self.first), "students": 2, "active_students": 1},
+            {"id": self.second.id, "name": str(self.second), "students": 0, "active_students": 0},
+        ))
+        self.assertEqual((scope.total_students, scope.active_students), (2, 1))
+
+    def test_class_teacher_change_invalidates_both_teachers(self):
+        cache = get_teacher_scope_cache()
+        self.assertEqual(len(cache.get(self.other.id).class_ids), 1)
+        self.assertEqual(cache.get(self.teacher.id).total_students, 2)
+
+        self.first.class_teacher = self.other
+        self.first.save()
+
+        self.assertEqual(cache.get(self.teacher.id).class_ids, (self.second.id,))
+        self.assertEqual(cache.get(self.teacher.id).total_students, 0)
+        self.assertIn(self.first.id, cache.get(self.other.id).class_ids)
+        self.assertEqual(cache.get(self.other.id).total_students, 2)
+
+    def test_student_writes_refresh_counts(self):
+        cache = get_teacher_scope_cache()
+        self.assertEqual(cache.get(self.teacher.id).active_students, 1)
+
+        student = Student.objects.create(full_name="New", roll_no=3, student_class=self.second)
+        self.assertEqual(cache.get(self.teacher.id).active_students, 2)
+
+        student.is_active = False
+        student.save()
+        self.assertEqual(cache.get(self.teacher.id).active_students, 1)
+
+    def test_other_workers_refresh_after_the_timeout(self):
+        other_worker = TeacherScopeCache(timeout=settings.TEACHER_SCOPE_CACHE_TIMEOUT)
+        self.assertEqual(len(other_worker.get(self.teacher.id).class_ids), 2)
+
+        self.first.class_teacher = self.other
+        self.first.save()
+        # invalidation only reached this worker's cache
+        self.assertEqual(len(other_worker.get(self.teacher.id).class_ids), 2)
+
+        later = time.monotonic() + settings.TEACHER_SCOPE_CACHE_TIMEOUT + 1
+        with mock.patch("core.qr_cache.time.monotonic", return_value=later):
+            self.assertEqual(other_worker.get(self.teacher.id).class_ids, (self.second.id,))
+
+
+class ReportCacheTests(TestCase):
+    """
+    Cached class reports answer If-None-Match with 304, and a committed
+    attendance write is visible on the next request, including when the
+    write commits while a report is being built.
+    """
+
+    def setUp(self):
+        get_report_cache().clear()
+        self.teacher = User.objects.create(username="teacher", role="TEACHER")
+        self.school_class = SchoolClass.objects.create(class_name="5", section="A", class_teacher=self.teacher)
+        self.student = Student.objects.create(full_name="Student", roll_no=1, student_class=self.school_class)
+        self.today = timezone.now().date()
+        self.url = f"/api/reports/daily/{self.school_class.id}/"
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def mark(self, status):
+        with self.captureOnCommitCallbacks(execute=True):
+            AttendanceRecord.objects.update_or_create(
+                student=self.student, student_class=self.school_class, date=self.today,
+                defaults={"status": status, "marked_by": self.teacher}
+            )
+
+    def test_etag_and_invalidation(self):
+        self.mark("P")
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total_present"], 1)
+        etag = response["ETag"]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertFalse(any("core_attendancerecord" in query["sql"] for query in queries.captured_queries))
+
+        self.mark("A")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.data["total_present"], 0)
+        self.assertEqual(response.data["total_absent"], 1)
+
+    def test_write_committing_during_build_is_not_cached(self):
+        request = APIClient().get(self.url).wsgi_request
+
+        def stale_build():
+            # the write commits after the rows were read, before the entry is stored
+            invalidate_reports({(self.school_class.id, self.today)})
+            return {"stale": True}
+
+        cached_report_response(request, "daily", self.school_class.id, self.today, self.today, stale_build)
+        response = cached_report_response(
+            request, "daily", self.school_class.id, self.today, self.today, lambda: {"stale": False}
+        )
+        self.assertEqual(response.data, {"stale": False})
+
+    def test_week_across_months_follows_both_months(self):
+        request = APIClient().get(self.url).wsgi_request
+        week_start, week_end = date(2025, 9, 29), date(2025, 10, 5)
+        builds = []
+
+        def get():
+            return cached_report_response(
+                request, "weekly", self.school_class.id, week_start, week_end, lambda: builds.append(1) or {}
+            )
+
+        get()
+        for written, rebuilt in ((date(2025, 8, 30), False), (date(2025, 9, 30), True), (date(2025, 10, 2), True)):
+            with self.subTest(written=written):
+                built = len(builds)
+                invalidate_reports({(self.school_class.id, written)})
+                get()
+                self.assertEqual(len(builds) > built, rebuilt)
+
+    def test_invalidation_reaches_other_workers(self):
+        # each worker holds its own connection to the shared cache alias
+        alias = settings.REPORT_CACHE_ALIAS
+        reader, writer = caches.create_connection(alias), caches.create_connection(alias)
+        self.assertNotIsInstance(reader, LocMemCache, "the report cache must be shared across processes")
+
+        self.mark("P")
+        with mock.patch("core.report_cache.get_report_cache", return_value=reader):
+            self.assertEqual(self.client.get(self.url).data["total_present"], 1)
+        with mock.patch("core.report_cache.get_report_cache", return_value=writer):
+            self.mark("A")
+        with mock.patch("core.report_cache.get_report_cache", return_value=reader):
+            self.assertEqual(self.client.get(self.url).data["total_present"], 0)
+
+
+class AttendanceRegisterTests(TestCase):
+    """
+    The monthly register encodes each day as P, A or - and totals per
+    student and per day; the cached register follows students that move
+    class or change roll number.
+    """
+
+    def setUp(self):
+        get_report_cache().clear()
+        self.teacher = User.objects.create(username="teacher", role="TEACHER")
+        self.school_class = SchoolClass.objects.create(class_name="5", section="A", class_teacher=self.teacher)
+        self.other_class = SchoolClass.objects.create(class_name="5", section="B", class_teacher=self.teacher)
+        self.first = Student.objects.create(full_name="First", roll_no=1, student_class=self.school_class)
+        self.second = Student.objects.create(full_name="Second", roll_no=2, student_class=self.school_class)
+        self.month_start = timezone.now().date().replace(day=1)
+        self.url = f"/api/reports/register/{self.school_class.id}/?date={self.month_start}"
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def mark(self, student, offset, status):
+        AttendanceRecord.objects.create(
+            student=student, student_class=self.school_class,
+            date=self.month_start + timedelta(days=offset), status=status, marked_by=self.teacher
+        )
+
+    def test_marks_and_totals(self):
+        self.mark(self.first, 0, "P")
+        self.mark(self.first, 2, "A")
+        self.mark(self.second, 0, "A")
+
+        matrix = register_matrix(self.school_class.id, self.month_start, self.month_start + timedelta(days=3))
+        self.assertEqual(
+            [(row["roll_no"], row["marks"], row["present"], row["absent"]) for row in matrix["students"]],
+            [(1, "P-A-", 1, 1), (2, "A---", 0, 1)]
+        )
+        self.assertEqual(matrix["day_totals"], {"present": [1, 0, 0, 0], "absent": [1, 0, 1, 0]})
+        self.assertEqual(matrix["totals"], {"present": 1, "absent": 2})
+
+    def test_cached_register_follows_class_and_roll_changes(self):
+        self.mark(self.first, 0, "P")
+        other_url = f"/api/reports/register/{self.other_class.id}/?date={self.month_start}"
+        self.assertEqual(len(self.client.get(self.url).data["students"]), 2)
+        self.assertEqual(self.client.get(other_url).data["students"], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.second.student_class = self.other_class
+            self.second.save(update_fields=["student_class"])
+        self.assertEqual([row["id"] for row in self.client.get(self.url).data["students"]], [self.first.id])
+        self.assertEqual([row["id"] for row in self.client.get(other_url).data["students"]], [self.second.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first.roll_no = 7
+            self.first.save(update_fields=["roll_no"])
+        self.assertEqual(self.client.get(self.url).data["students"][0]["roll_no"], 7)
+
+
+class RegisterExportTests(TestCase):
+    """
+    The streamed CSV and XLSX exports carry the same rows as
+    register_matrix, and the XLSX temp file is closed when the client
+    goes away mid-download.
+    """
+
+    def setUp(self):
+        self.admin = User.objects.create(username="admin", role="ADMIN")
+        self.school_class = SchoolClass.objects.create(class_name="5", section="A")
+        self.first = Student.objects.create(full_name="First", roll_no=1, student_class=self.school_class)
+        self.second = Student.objects.create(full_name="Second", roll_no=2, student_class=self.school_class)
+        self.left = Student.objects.create(full_name="Left", roll_no=3, student_class=self.school_class)
+        self.date_from = date(2024, 3, 1)
+        self.date_to = date(2024, 3, 5)
+
+        for student, offset, status in [(self.first, 0, "P"), (self.first, 2, "A"), (self.second, 4, "A"), (self.left, 1, "P")]:
+            AttendanceRecord.objects.create(
+                student=student, student_class=self.school_class,
+                date=self.date_from + timedelta(days=offset), status=status, marked_by=self.admin
+            )
+        self.left.is_active = False
+        self.left.save(update_fields=["is_active"])
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def export(self, output):
+        return self.client.get(
+            "/api/reports/export/",
+            {"from": self.date_from, "to": self.date_to, "class_id": self.school_class.id, "output": output}
+        )
+
+    def expected_rows(self):
+        matrix = register_matrix(self.school_class.id, self.date_from, self.date_to)
+        return [
+            ["5 A", row["roll_no"], row["name"], *row["marks"], row["present"], row["absent"]]
+            for row in matrix["students"]
+        ]
+
+    def header(self):
+        return ["Class", "Roll No", "Student", *[str(self.date_from + timedelta(days=offset)) for offset in range(5)], "Present", "Absent"]
+
+    def test_csv_matches_register(self):
+        response = self.export("csv")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/csv")
+
+        rows = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], self.header())
+        self.assertEqual(rows[1:], [[str(value) for value in row] for row in self.expected_rows()])
+        self.assertEqual([row[2] for row in rows[1:]], ["First", "Second", "Left"])
+
+    def test_xlsx_matches_register(self):
+        from openpyxl import load_workbook
+
+        response = self.export("xlsx")
+        self.assertEqual(response.status_code, 200)
+
+        workbook = load_workbook(io.BytesIO(b"".join(response.streaming_content)), read_only=True)
+        rows = [list(row) for row in workbook["Register"].iter_rows(values_only=True)]
+        self.assertEqual(rows[0], self.header())
+        self.assertEqual(rows[1:], self.expected_rows())
+
+    def test_xlsx_temp_file_closed_on_disconnect(self):
+        opened = []
+        temporary_file = tempfile.TemporaryFile
+
+        def track(*args, **kwargs):
+            opened.append(temporary_file(*args, **kwargs))
+            return opened[-1]
+
+        with mock.patch("core.export_utils.tempfile.TemporaryFile", side_effect=track):
+            response = self.export("xlsx")
+            next(iter(response.streaming_content))
+            self.assertFalse(opened[0].closed)
+            # the handler closes the response when the client disconnects
+            response.close()
+
+        self.assertTrue(opened[0].closed)
+
+
+class AbsenceStateTests(TestCase):
+    """
+    The incrementally maintained absence state (streak and 30-day window)
+    matches a full rebuild after appends, long gaps, edits of earlier days
+    and deletions.
+    """
+
+    def setUp(self):
+        self.teacher = User.objects.create(username="teacher", role="TEACHER")
+        self.school_class = SchoolClass.objects.create(class_name="5", section="A", class_teacher=self.teacher)
+        self.student = Student.objects.create(full_name="Student", roll_no=1, student_class=self.school_class)
+        self.start = date(2026, 1, 5)
+
+    def mark(self, offset, status):
+        return AttendanceRecord.objects.create(
+            student=self.student, student_class=self.school_class,
+            date=self.start + timedelta(days=offset), status=status, marked_by=self.teacher
+        )
+
+    def assertState(self, last_offset, streak, window):
+        state = StudentAbsenceState.objects.get(student=self.student)
+        self.assertEqual(state.last_date, self.start + timedelta(days=last_offset))
+        self.assertEqual(state.absent_streak, streak)
+        self.assertEqual(state.window.lstrip("-"), window)
+        self.assertEqual(len(state.window), WINDOW_DAYS)
+        self.assertEqual((state.window_present, state.window_absent), (window.count("P"), window.count("A")))
+
+        rebuild_absence_states()
+        rebuilt = StudentAbsenceState.objects.get(student=self.student)
+        self.assertEqual(
+            (rebuilt.last_date, rebuilt.absent_streak, rebuilt.window, rebuilt.window_present, rebuilt.window_absent),
+            (state.last_date, state.absent_streak, state.window, state.window_present, state.window_absent)
+        )
+
+    def test_append(self):
+        self.mark(0, "P")
+        self.mark(1, "A")
+        self.mark(3, "A")
+        self.assertState(3, 2, "PA-A")
+
+    def test_gap_longer_than_window(self):
+        self.mark(0, "A")
+        self.mark(1, "P")
+        self.mark(WINDOW_DAYS + 10, "A")
+        # the old days slide out of the window, but the gap does not break the streak
+        self.assertState(WINDOW_DAYS + 10, 1, "A")
+        self.mark(WINDOW_DAYS + 11, "A")
+        self.assertState(WINDOW_DAYS + 11, 2, "AA")
+
+    def test_edit_earlier_day(self):
+        self.mark(0, "A")
+        middle = self.mark(1, "A")
+        self.mark(2, "A")
+        self.assertState(2, 3, "AAA")
+
+        middle.status = "P"
+        middle.save()
+        self.assertState(2, 1, "APA")
+
+    def test_delete_last_record(self):
+        first = self.mark(0, "P")
+        last = self.mark(1, "A")
+
+        last.delete()
+        self.assertState(0, 0, "P")
+
+        first.delete()
+        self.assertFalse(StudentAbsenceState.objects.filter(student=self.student).exists())
+        rebuild_absence_states()
+        self.assertFalse(StudentAbsenceState.objects.filter(student=self.student).exists())
+
+    def test_upgrade_backfill_matches_rebuild(self):
+        other = Student.objects.create(full_name="Other", roll_no=2, student_class=self.school_class)
+        for offset, status in ((0, "P"), (1, "A"), (4, "A"), (WINDOW_DAYS + 6, "A")):
+            self.mark(offset, status)
+        AttendanceRecord.objects.create(
+            student=other, student_class=self.school_class, date=self.start, status="A", marked_by=self.teacher
+        )
+        rebuild_absence_states()
+        fields = ("student_id", "last_date", "absent_streak", "window", "window_present", "window_absent")
+        rebuilt = list(StudentAbsenceState.objects.order_by("student_id").values_list(*fields))
+
+        # as after upgrading past 0012: one stale state, the other missing
+        StudentAbsenceState.objects.filter(student=other).delete()
+        StudentAbsenceState.objects.filter(student=self.student).update(absent_streak=0, window="A")
+        migration = import_module("core.migrations.0013_backfill_student_absence_state")
+        migration.backfill_absence_states(django_apps, None)
+
+        self.assertEqual(list(StudentAbsenceState.objects.order_by("student_id").values_list(*fields)), rebuilt)
+        self.assertEqual(rebuilt[0][2], 3)
+
+
+class StudentImportTests(TestCase):
+    """
+    The CSV import inserts the valid rows and reports the invalid ones by
+    their row number in the file.
+    """
+
+    def setUp(self):
+        self.admin = User.objects.create(username="admin", role="ADMIN")
+        self.teacher = User.objects.create(username="teacher", role="TEACHER")
+        self.school_class = SchoolClass.objects.create(class_name="5", section="A", class_teacher=self.teacher)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def upload(self, name, content):
+        return self.client.post(
+            "/api/students/import/", {"file": SimpleUploadedFile(name, content)}, format="multipart"
+        )
+
+    def test_csv_import_with_error_report(self):
+        content = (
+            "\ufeffFull_Name,Roll_No,Student_Class,Guardian_Mobile,Notes\r\n"
+            f"Asha,1,{self.school_class.id},9800000001,ignored\r\n"
+            f",2,{self.school_class.id},,\r\n"
+            f"Bina,abc,{self.school_class.id},,\r\n"
+            f"Chandra,3,{self.school_class.id + 100},,\r\n"
+            f"  Dev  ,4,{self.school_class.id},,\r\n"
+        ).encode("utf-8")
+
+        response = self.upload("students.csv", content)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["created"], response.data["failed"]), (2, 3))
+        self.assertFalse(response.data["errors_truncated"])
+        self.assertEqual(
+            [(error["row"], sorted(error["errors"])) for error in response.data["errors"]],
+            [(3, ["full_name"]), (4, ["roll_no"]), (5, ["student_class"])]
+        )
+
+        students = Student.objects.filter(student_class=self.school_class).order_by("roll_no")
+        self.assertEqual(
+            [(student.full_name, student.roll_no, student.guardian_mobile) for student in students],
+            [("Asha", 1, "9800000001"), ("Dev", 4, None)]
+        )
+        self.assertTrue(all(student.verification_key for student in students))
+
+    def test_unsupported_file_type(self):
+        response = self.upload("students.txt", b"full_name,roll_no\n")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Student.objects.exists())
+
+    @override_settings(IMPORT_CHUNK_SIZE=1)
+    def test_non_utf8_csv_is_refused_before_any_insert(self):
+        content = (
+            "full_name,roll_no,student_class\r\n"
+            f"Asha,1,{self.school_class.id}\r\n"
+            f"Bina,2,{self.school_class.id}\r\n"
+            f"Jos\u00e9,3,{self.school_class.id}\r\n"
+        ).encode("latin-1")
+
+        response = self.upload("students.csv", content)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("UTF-8", response.data["error"])
+        self.assertFalse(Student.objects.exists())
+
+    @override_settings(IMPORT_CHUNK_SIZE=1)
+    def test_truncated_xlsx_is_refused(self):
+        from openpyxl import Workbook
+
+        workbook = Workbook()
+        workbook.active.append(["full_name", "roll_no", "student_class"])
+        for roll_no in range(1, 50):
+            workbook.active.append([f"Student {roll_no}", roll_no, self.school_class.id])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        content = buffer.getvalue()
+
+        response = self.upload("students.xlsx", content[:len(content) // 2])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Student.objects.exists())
+
+        response = self.upload("students.xlsx", content)
+        self.assertEqual((response.status_code, response.data["created"]), (200, 49))
+
+
+@override_settings(METRICS_SCRAPE_TOKEN="scrape-secret", METRICS_ALLOWED_IPS=["10.1.0.0/16"])
+class MetricsAccessTests(TestCase):
+    """
+    /api/metrics/ is readable by admins and by Prometheus scrapes using the
+    static token or an allowlisted address, and by nobody else.
+    """
+
+    url = "/api/metrics/"
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_admin_jwt(self):
+        admin = User.objects.create(username="admin", role="ADMIN")
+        teacher = User.objects.create(username="teacher", role="TEACHER")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(admin)}")
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(teacher)}")
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_scrape_token(self):
+        response = self.client.get(self.url, HTTP_AUTHORIZATION="Bearer scrape-secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("text/plain", response["Content-Type"])
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION="Bearer wrong").status_code, 401)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_allowed_ips(self):
+        self.assertEqual(self.client.get(self.url, REMOTE_ADDR="10.1.2.3").status_code, 200)
+        self.assertEqual(self.client.get(self.url, REMOTE_ADDR="10.2.0.1").status_code, 401)
+
+    @override_settings(METRICS_SCRAPE_TOKEN="")
+    def test_empty_token_is_disabled(self):
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION="Bearer ").status_code, 401)
+
+    def test_quantile_overflow_is_infinite(self):
+        histogram = Histogram((1, 2))
+        for value in (1, 2, 5):
+            histogram.observe(value)
+        self.assertEqual(histogram.quantile(0.5), 2)
+        self.assertEqual(histogram.quantile(0.99), float("inf"))
+
+
+class PaginationTests(TestCase):
+    """
+    Cursor pages cover a list exactly once, streamed responses are valid
+    JSON, and the student history only carries records when asked.
+    """
+
+    def setUp(self):
+        self.teacher = User.objects.create(username="teacher", role="TEACHER")
+        self.school_class = SchoolClass.objects.create(class_name="5", section="A", class_teacher=self.teacher)
+        self.students = [
+            Student.objects.create(full_name=f"Student {n}", roll_no=n, student_class=self.school_class) for n in range(1, 8)
+        ]
+        self.student = self.students[0]
+        self.start = date(2026, 1, 1)
+        for offset in range(9):
+            AttendanceRecord.objects.create(
+                student=self.student, student_class=self.school_class,
+                date=self.start + timedelta(days=offset), status="PA"[offset % 2], marked_by=self.teacher
+            )
+        self.history_url = f"/api/reports/student/{self.student.id}/"
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def follow(self, url, key):
+        """Items of every page, following `next` links from `url`."""
+        items, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            items += response.data[key]
+            url = response.data["next"]
+            pages += 1
+        return items, pages
+
+    def stream(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return json.loads(b"".join(response.streaming_content))
+
+    def test_cursor_pages_cover_the_list_once(self):
+        students, pages = self.follow("/api/students/?page_size=3", "results")
+        self.assertEqual(pages, 3)
+        self.assertEqual([student["id"] for student in students], sorted((s.id for s in self.students), reverse=True))
+
+        records, pages = self.follow(f"{self.history_url}?page_size=4", "records")
+        self.assertEqual(pages, 3)
+        self.assertEqual(
+            [record["date"] for record in records],
+            [str(self.start + timedelta(days=offset)) for offset in reversed(range(9))]
+        )
+
+    def test_streamed_json(self):
+        students = self.stream("/api/students/?stream=1")
+        self.assertEqual(len(students), len(self.students))
+
+        history = self.stream(f"{self.history_url}?stream=1")
+        self.assertEqual((history["student_id"], history["present_count"], history["absent_count"]), (self.student.id, 5, 4))
+        self.assertEqual(len(history["records"]), 9)
+
+        empty = self.stream(f"/api/reports/student/{self.students[1].id}/?stream=1")
+        self.assertEqual(empty["records"], [])
+
+    def test_history_shape(self):
+        response = self.client.get(self.history_url)
+        self.assertEqual(set(response.data), {
+            "student_id", "student_name", "class", "present_count", "absent_count", "total_days", "attendance_percent"
+        })
+        self.assertEqual(response.data["total_days"], 9)
+
+        response = self.client.get(f"{self.history_url}?include_records=true")
+        self.assertEqual(len(response.data["records"]), 9)
+
+
+class QRJobTests(TestCase):
+    """
+    QR image jobs: claimed, rendered and written back in one bulk_update,
+    failed jobs retried, and jobs of a dead worker requeued.
+    """
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.school_class = SchoolClass.objects.create(class_name="5", section="A")
+        self.students = [
+            Student.objects.create(full_name=f"Student {n}", roll_no=n, student_class=self.school_class) for n in (1, 2)
+        ]
+        self.student_ids = [student.id for student in self.students]
+
+    def statuses(self):
+        return list(QRGenerationJob.objects.order_by("id").values_list("status", "attempts"))
+
+    def assertRendered(self, student):
+        student.refresh_from_db()
+        self.assertEqual(student.qr_code_image.name, f"qr_codes/student_{student.student_uid}.png")
+        self.assertTrue(student.qr_code_image.storage.exists(student.qr_code_image.name))
+
+    @override_settings(QR_JOBS_RUN_INLINE=True)
+    def test_inline_jobs_render_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            # the second job for the same student renders once
+            self.assertEqual(enqueue_qr_generation(self.student_ids + self.student_ids[:1]), 3)
+        self.assertEqual(self.statuses(), [("DONE", 1)] * 3)
+        for student in self.students:
+            self.assertRendered(student)
+
+    @override_settings(QR_JOBS_RUN_INLINE=False)
+    def test_pool_jobs_are_handed_to_the_worker(self):
+        executor = mock.Mock()
+        with mock.patch("core.qr_jobs.get_executor", return_value=executor):
+            with self.captureOnCommitCallbacks(execute=True):
+                enqueue_qr_generation(self.student_ids)
+        executor.submit.assert_called_once_with(run_in_worker, self.student_ids)
+        self.assertEqual(self.statuses(), [("PENDING", 0)] * 2)
+
+        # what run_in_worker does on the pool thread
+        self.assertEqual(process_pending_jobs(student_ids=self.student_ids), (2, 0))
+        self.assertEqual(self.statuses(), [("DONE", 1)] * 2)
+
+    def test_failed_job_is_retried(self):
+        enqueue_qr_generation(self.student_ids[:1])
+        with mock.patch("core.qr_jobs.render_qr_png", side_effect=RuntimeError("boom")):
+            with self.assertLogs("core.qr_jobs", "ERROR"):
+                self.assertEqual(process_pending_jobs(), (0, 1))
+        self.assertEqual(self.statuses(), [("FAILED", 1)])
+        self.assertEqual(QRGenerationJob.objects.get().error, "boom")
+
+        self.assertEqual(requeue_stale_jobs(max_attempts=3), 1)
+        self.assertEqual(process_pending_jobs(), (1, 0))
+        self.assertEqual(self.statuses(), [("DONE", 2)])
+        self.assertRendered(self.students[0])
+
+        QRGenerationJob.objects.update(status="FAILED", attempts=3)
+        self.assertEqual(requeue_stale_jobs(max_attempts=3), 0)
+
+    def test_stale_claimed_job_is_requeued(self):
+        enqueue_qr_generation(self.student_ids[:1])
+        self.assertEqual(len(claim_jobs()), 1)
+        self.assertEqual(claim_jobs(), [])
+        self.assertEqual(requeue_stale_jobs(older_than_minutes=10), 0)
+
+        # the claiming worker died eleven minutes ago
+        QRGenerationJob.objects.update(updated_at=timezone.now() - timedelta(minutes=11))
+        self.assertEqual(requeue_stale_jobs(older_than_minutes=10), 1)
+
+        out = io.StringIO()
+        call_command("process_qr_jobs", stdout=out)
+        self.assertIn("Rendered 1 QR codes, 0 failed", out.getvalue())
+        self.assertEqual(self.statuses(), [("DONE", 2)])
+        self.assertRendered(self.students[0])
+
+
+class QRSheetTests(TestCase):
+    """
+    The class QR card sheet renders one card per active student, as a
+    multi-page PDF or one PNG page, and is served from the cache until
+    something printed on it changes.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create(username="teacher", role="TEACHER")
+        self.school_class = SchoolClass.objects.create(class_name="5", section="A", class_teacher=self.teacher)
+        self.students = [
+            Student.objects.create(full_name=f"Student {n}", roll_no=n, student_class=self.school_class)
+            for n in range(1, CARDS_PER_PAGE + 2)
+        ]
+        Student.objects.create(full_name="Left", roll_no=99, student_class=self.school_class, is_active=False)
+        self.url = f"/api/classes/{self.school_class.id}/qr-sheet/"
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+        render_card = qr_sheet.render_card
+        self.rendered = []
+        patcher = mock.patch("core.qr_sheet.render_card", side_effect=lambda student, *args: (
+            self.rendered.append(student.id) or render_card(student, *args)
+        ))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pdf_has_every_active_student(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertTrue(response.content.startswith(b"%PDF"))
+        self.assertEqual(len(re.findall(rb"/Type\s*/Page\b", response.content)), 2)
+        self.assertEqual(self.rendered, [student.id for student in self.students])
+
+    def test_png_page(self):
+        response = self.client.get(f"{self.url}?output=png&page=2")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertEqual(Image.open(io.BytesIO(response.content)).size, PAGE_SIZE)
+        self.assertEqual(self.rendered, [self.students[-1].id])
+
+        self.assertEqual(self.client.get(f"{self.url}?output=png&page=3").status_code, 400)
+
+    def test_second_request_is_cached_until_a_key_rotates(self):
+        first = self.client.get(self.url).content
+        rendered = len(self.rendered)
+        self.assertEqual(self.client.get(self.url).content, first)
+        self.assertEqual(len(self.rendered), rendered)
+
+        Student.objects.filter(pk=self.students[0].pk).update(verification_key="rotated")
+        self.assertNotEqual(self.client.get(self.url).content, first)
+        self.assertEqual(len(self.rendered), rendered * 2)
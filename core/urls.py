@@ -1,4 +1,10 @@
 from django.urls import path
+from .async_views import (
+    AsyncMarkAttendanceByQRView,
+    AsyncTodayAttendanceByClassView,
+    AsyncAdminDashboardOverviewView,
+    AttendanceEventStreamView,
+)
 from .views import (RegisterTeacherView, 
     ProfileView,
     TeacherListView,
@@ -9,17 +15,30 @@ from .views import (RegisterTeacherView,
     SchoolClassDetailView,
     SchoolClassUpdateView,
     SchoolClassDeleteView,
+    SchoolClassRegenerateQRView,
+    SchoolClassQRSheetView,
     StudentCreateView,
+    StudentImportView,
     StudentListView,
     StudentDetailView,
     StudentUpdateView,
     StudentDeleteView,
+    StudentRotateKeyView,
+    QRKeyCacheStatsView,
+    MetricsView,
     MarkAttendanceByQRView,
+    BulkMarkAttendanceByQRView,
+    OfflineAttendanceSyncView,
     FinalizeAttendanceView,
+    FinalizeAllAttendanceView,
+    AttendanceEventTicketView,
     TodayAttendanceByClassView,
     DailyAttendanceReportView,
     WeeklyAttendanceSummaryView,
     MonthlyAttendanceSummaryView,
+    MonthlyAttendanceRegisterView,
+    AttendanceRegisterExportView,
+    AtRiskStudentsView,
     StudentAttendanceHistoryView,
     AdminDashboardOverviewView,
     AdminTodayClassWiseAttendanceView,
@@ -39,29 +58,48 @@ urlpatterns = [
     path('classes/<int:pk>/', SchoolClassDetailView.as_view(), name='class_detail'),
     path('classes/<int:pk>/update/', SchoolClassUpdateView.as_view(), name='class_update'),
     path('classes/<int:pk>/delete/', SchoolClassDeleteView.as_view(), name='class_delete'),
+    path('classes/<int:pk>/regenerate-qr/', SchoolClassRegenerateQRView.as_view(), name='class_regenerate_qr'),
+    path('classes/<int:pk>/qr-sheet/', SchoolClassQRSheetView.as_view(), name='class_qr_sheet'),
     
     # Phase 3 - Student Module
     path('students/create/', StudentCreateView.as_view(), name='student_create'),
+    path('students/import/', StudentImportView.as_view(), name='student_import'),
     path('students/', StudentListView.as_view(), name='student_list'),
     path('students/<int:pk>/', StudentDetailView.as_view(), name='student_detail'),
     path('students/<int:pk>/update/', StudentUpdateView.as_view(), name='student_update'),
     path('students/<int:pk>/delete/', StudentDeleteView.as_view(), name='student_delete'),
+    path('students/<int:pk>/rotate-key/', StudentRotateKeyView.as_view(), name='student_rotate_key'),
     
     # Phase 4 - Attendance
     path('attendance/mark/', MarkAttendanceByQRView.as_view(), name='mark_attendance_qr'),
+    path('attendance/mark/bulk/', BulkMarkAttendanceByQRView.as_view(), name='bulk_mark_attendance_qr'),
+    path('attendance/sync/', OfflineAttendanceSyncView.as_view(), name='offline_attendance_sync'),
+    path('attendance/qr-cache/stats/', QRKeyCacheStatsView.as_view(), name='qr_cache_stats'),
     path("attendance/finalize/<int:class_id>/", FinalizeAttendanceView.as_view()),
+    path("attendance/finalize/all/", FinalizeAllAttendanceView.as_view(), name="finalize_all_attendance"),
     path('attendance/today/<int:class_id>/', TodayAttendanceByClassView.as_view(), name='today_attendance'),
+    path('attendance/events/', AttendanceEventStreamView.as_view(), name='attendance_events'),
+    path('attendance/events/ticket/', AttendanceEventTicketView.as_view(), name='attendance_events_ticket'),
     
     # Phase 5 - Reports
     path("reports/daily/<int:class_id>/", DailyAttendanceReportView.as_view(), name="daily_report"),
     path("reports/weekly/<int:class_id>/", WeeklyAttendanceSummaryView.as_view(), name="weekly_report"),
     path("reports/monthly/<int:class_id>/", MonthlyAttendanceSummaryView.as_view(), name="monthly_report"),
+    path("reports/register/<int:class_id>/", MonthlyAttendanceRegisterView.as_view(), name="monthly_register"),
     path("reports/student/<int:student_id>/", StudentAttendanceHistoryView.as_view(), name="student_history"),
+    path("reports/export/", AttendanceRegisterExportView.as_view(), name="attendance_register_export"),
+    path("reports/at-risk/", AtRiskStudentsView.as_view(), name="at_risk_students"),
     
      # Phase 6 - Dashboard APIs
     path("dashboard/admin/overview/", AdminDashboardOverviewView.as_view(), name="admin_dashboard_overview"),
     path("dashboard/admin/classwise-today/", AdminTodayClassWiseAttendanceView.as_view(), name="admin_classwise_today"),
     path("dashboard/teacher/overview/", TeacherDashboardOverviewView.as_view(), name="teacher_dashboard_overview"),
     path("dashboard/teacher/absent-today/", TeacherTodayAbsentListView.as_view(), name="teacher_absent_today"),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
+
+    # Async (ASGI) versions of the high fan-in endpoints
+    path('async/attendance/mark/', AsyncMarkAttendanceByQRView.as_view(), name='async_mark_attendance_qr'),
+    path('async/attendance/today/<int:class_id>/', AsyncTodayAttendanceByClassView.as_view(), name='async_today_attendance'),
+    path("async/dashboard/admin/overview/", AsyncAdminDashboardOverviewView.as_view(), name="async_admin_dashboard_overview"),
 ]
 
@@ -1,20 +1,122 @@
+import base64
+import hmac
 import qrcode
 import json
+import struct
+import uuid
+from collections import namedtuple
 from io import BytesIO
+from django.conf import settings
 from django.core.files import File
+from django.utils.crypto import salted_hmac
 
-def generate_student_qr(student):
+# Compact payload: "Q1" + unpadded base32 of
+#   student id (4 bytes) | class id (4 bytes) | key tag (4 bytes) | HMAC (8 bytes)
+# 34 characters, all in the QR alphanumeric set, so it fits a version 2 code.
+QR_PAYLOAD_VERSION = "Q1"
+_COMPACT_BODY = struct.Struct(">II4s")
+_COMPACT_LENGTH = len(QR_PAYLOAD_VERSION) + 32
+
+# Normalised scan: legacy formats carry student_uid and verification_key,
+# the compact one student_id and key_tag. class_id is always a string.
+QRPayload = namedtuple("QRPayload", ["version", "student_uid", "student_id", "class_id", "verification_key", "key_tag"])
+
+
+class QRSignatureError(ValueError):
+    pass
+
+
+def _signing_secret():
+    return getattr(settings, "QR_SIGNING_KEY", None) or settings.SECRET_KEY
+
+
+def qr_key_tag(verification_key):
+    """
+    Short digest of the verification key, so rotating the key still
+    invalidates printed cards without putting the key itself in the QR.
+    """
+    return salted_hmac("core.qr.key-tag", verification_key, secret=_signing_secret(), algorithm="sha256").digest()[:4]
+
+
+def _compact_mac(body):
+    return salted_hmac("core.qr." + QR_PAYLOAD_VERSION, body, secret=_signing_secret(), algorithm="sha256").digest()[:8]
+
+
+def build_qr_payload(student):
+    body = _COMPACT_BODY.pack(student.id, student.student_class_id, qr_key_tag(student.verification_key))
+    encoded = base64.b32encode(body + _compact_mac(body)).decode()
+    return QR_PAYLOAD_VERSION + encoded
+
+
+def build_legacy_qr_payload(student):
     qr_payload = {
         "student_uid": str(student.student_uid),
-        "class_id": student.student_class.id,
+        "class_id": student.student_class_id,
         "verification_key": student.verification_key
     }
 
-    qr_data = json.dumps(qr_payload)
+    return json.dumps(qr_payload)
+
 
+def render_qr_png(qr_data):
     qr = qrcode.make(qr_data)
     buffer = BytesIO()
     qr.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def qr_filename(student):
+    return f"student_{student.student_uid}.png"
+
+
+def generate_student_qr(student):
+    png = render_qr_png(build_qr_payload(student))
+    student.qr_code_image.save(qr_filename(student), File(BytesIO(png)), save=False)
+
+
+def _parse_compact(qr_data):
+    try:
+        raw = base64.b32decode(qr_data[len(QR_PAYLOAD_VERSION):])
+    except (ValueError, TypeError):
+        raise ValueError("Invalid compact QR payload")
+
+    body, mac = raw[:_COMPACT_BODY.size], raw[_COMPACT_BODY.size:]
+    if not hmac.compare_digest(mac, _compact_mac(body)):
+        raise QRSignatureError("QR signature mismatch")
+
+    student_id, class_id, key_tag = _COMPACT_BODY.unpack(body)
+    return QRPayload(QR_PAYLOAD_VERSION, None, student_id, str(class_id), None, key_tag)
+
+
+def parse_qr_data(qr_data):
+    """
+    Decodes scanned QR data into a QRPayload. Accepts the compact signed
+    format, the JSON written by earlier cards and "uid|class_id|key".
+    The compact signature is checked here, without touching the database.
+    Raises QRSignatureError for a bad signature and ValueError when the
+    data is not in any known format.
+    """
+    qr_data = qr_data.strip()
+
+    if len(qr_data) == _COMPACT_LENGTH and qr_data.startswith(QR_PAYLOAD_VERSION):
+        return _parse_compact(qr_data)
+
+    if qr_data.startswith("{"):
+        data = json.loads(qr_data)
+        try:
+            student_uid, class_id, verification_key = data["student_uid"], data["class_id"], data["verification_key"]
+        except (KeyError, TypeError):
+            raise ValueError("Invalid QR payload")
+    else:
+        student_uid, class_id, verification_key = qr_data.split("|")
+
+    return QRPayload("legacy", str(uuid.UUID(str(student_uid))), None, str(class_id), str(verification_key), None)
+
 
-    filename = f"student_{student.student_uid}.png"
-    student.qr_code_image.save(filename, File(buffer), save=False)
+def qr_key_matches(payload, verification_key):
+    """
+    True when the scanned payload was issued for the student's current key.
+    """
+    if payload.key_tag is not None:
+        return hmac.compare_digest(payload.key_tag, qr_key_tag(verification_key))
+    return hmac.compare_digest(payload.verification_key.encode(), verification_key.encode())
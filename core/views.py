@@ -1,20 +1,48 @@
 from django.shortcuts import render
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 
 from django.contrib.auth import get_user_model
-from .serializers import RegisterTeacherSerializer, ProfileSerializer, SchoolClassSerializer, StudentSerializer, AttendanceRecordSerializer
-
-from .permissions import IsAdmin
-from .models import SchoolClass, Student, AttendanceRecord
-from .utils import generate_student_qr
+from .serializers import RegisterTeacherSerializer, ProfileSerializer, SchoolClassSerializer, StudentSerializer, AttendanceRecordSerializer, StudentAbsenceStateSerializer
+
+from .permissions import IsAdmin, IsMetricsScraper
+from .authentication import CachedJWTAuthentication, MetricsScrapeAuthentication, issue_stream_ticket
+from .models import SchoolClass, Student, AttendanceRecord, DailyClassAttendanceSummary, SyncedScan
+from .utils import parse_qr_data, qr_key_matches, QRSignatureError
+from .qr_jobs import enqueue_qr_generation
+from .qr_sheet import get_class_sheet
+from .import_utils import ImportFormatError, import_students, iter_import_rows
+from .attendance_utils import mark_qr_scans, finalize_attendance, SCAN_INVALID_TIMESTAMP
+from .qr_cache import get_key_cache, payload_cache_key
+from .export_utils import EXPORT_FORMATS, ExportError, iter_register_csv, iter_register_xlsx, register_matrix
+from .metrics import registry as metrics_registry
+from .teacher_scope import get_teacher_scope_cache
+from .absenteeism import at_risk_states
+from .sync_utils import (
+    SyncPayloadError, decode_sync_body, decode_cursor, parse_class_ids, scan_date_from_client_timestamp, records_changed_since
+)
 from django.utils import timezone
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils.decorators import method_decorator
+from django.views.decorators.gzip import gzip_page
 
 from django.db.models import Count, Q
 from datetime import datetime
-from .report_utils import get_week_range, get_month_range
+from .pagination import DateCursorPagination, list_response, stream_json_response, wants_pagination, wants_stream
+from .report_cache import cached_report_response
+from .report_utils import (
+    get_week_range,
+    get_month_range,
+    attendance_percent,
+    summarize_attendance,
+    summarize_daily_summaries,
+    summarize_daily_summaries_by_class,
+    empty_summary,
+)
 
 User = get_user_model()
 
@@ -37,8 +65,7 @@ class UserListView(APIView):
 
     def get(self, request):
         users = User.objects.all().order_by("-id")
-        serializer = ProfileSerializer(users, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return list_response(request, users, ProfileSerializer, view=self)
 
 
 class DeleteTeacherView(APIView):
@@ -106,9 +133,8 @@ class SchoolClassListView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        classes = SchoolClass.objects.all().order_by('-id')
-        serializer = SchoolClassSerializer(classes, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        classes = SchoolClassSerializer.setup_eager_loading(SchoolClass.objects.all().order_by('-id'))
+        return list_response(request, classes, SchoolClassSerializer, view=self)
     
 class SchoolClassDetailView(APIView):
     permission_classes = [IsAuthenticated]
@@ -151,6 +177,56 @@ class SchoolClassDeleteView(APIView):
         cls.delete()
         return Response({'message':"Class Detele successfully"}, status=status.HTTP_200_OK)
     
+class SchoolClassRegenerateQRView(APIView):
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def post(self, request, pk):
+        if not SchoolClass.objects.filter(pk=pk).exists():
+            return Response({"error":"class not found"},status=status.HTTP_404_NOT_FOUND)
+
+        student_ids = list(Student.objects.filter(student_class_id=pk).values_list("id", flat=True))
+
+        # rendered in parallel by the worker pool, paths written with one bulk_update
+        with transaction.atomic():
+            queued = enqueue_qr_generation(student_ids)
+
+        return Response({"message":"QR regeneration queued","class_id":pk,"jobs":queued}, status=status.HTTP_202_ACCEPTED)
+    
+class SchoolClassQRSheetView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        if request.user.role not in ['TEACHER', 'ADMIN']:
+            return Response({"error": "Not allowed"}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            cls = SchoolClass.objects.get(pk=pk)
+        except SchoolClass.DoesNotExist:
+            return Response({"error":"class not found"},status=status.HTTP_404_NOT_FOUND)
+
+        # ?output=pdf (all pages, default) or ?output=png&page=N
+        output = request.query_params.get("output", "pdf")
+        if output not in ("pdf", "png"):
+            return Response({"error": "output must be pdf or png"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            page = int(request.query_params.get("page", 1))
+        except ValueError:
+            return Response({"error": "page must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+
+        students = Student.objects.filter(student_class=cls, is_active=True).only(
+            "id", "student_uid", "student_class_id", "verification_key", "full_name", "roll_no"
+        ).order_by("roll_no", "id")
+
+        try:
+            content, content_type = get_class_sheet(cls, students, output=output, page=page)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = HttpResponse(content, content_type=content_type)
+        response["Content-Disposition"] = f'inline; filename="qr_cards_class_{cls.id}.{output}"'
+        return response
+    
 class StudentCreateView(APIView):
     permission_classes = [IsAuthenticated, IsAdmin]
     
@@ -160,22 +236,36 @@ class StudentCreateView(APIView):
         if serializer.is_valid():
             student = serializer.save()
             
-            generate_student_qr(student)
-            student.save()
+            # QR image is rendered by the background worker pool
+            enqueue_qr_generation([student.id])
             
             return Response(
                 {"message":"Student created successfully","data":StudentSerializer(student, context={"request":request}).data},status=status.HTTP_201_CREATED
             )
         
-        return Response(serializer.error, status=status.HTTP_400_BAD_REQUEST)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+class StudentImportView(APIView):
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def post(self, request):
+        upload = request.FILES.get("file")
+        if not upload:
+            return Response({"error": "file is required (.csv or .xlsx)"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            report = import_students(iter_import_rows(upload, upload.name))
+        except ImportFormatError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({"message": "Import finished", **report}, status=status.HTTP_200_OK)
 
 class StudentListView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        students = Student.objects.all().order_by('-id')
-        serializer = StudentSerializer(students, many=True, context={"request": request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        students = StudentSerializer.setup_eager_loading(Student.objects.all().order_by('-id'))
+        return list_response(request, students, StudentSerializer, context={"request": request}, view=self)
 
 class StudentDetailView(APIView):
     permission_classes = [IsAuthenticated]
@@ -218,6 +308,41 @@ class StudentDeleteView(APIView):
         student.delete()
         return Response({"message": "Student deleted successfully"}, status=status.HTTP_200_OK)
 
+class StudentRotateKeyView(APIView):
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def post(self, request, pk):
+        try:
+            student = Student.objects.select_related("student_class").get(pk=pk)
+        except Student.DoesNotExist:
+            return Response({"error": "Student not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        # new key invalidates the cached one through the Student post_save signal
+        student.rotate_verification_key()
+        enqueue_qr_generation([student.id])
+
+        return Response(
+            {"message": "Verification key rotated", "data": StudentSerializer(student, context={"request": request}).data},
+            status=status.HTTP_200_OK
+        )
+
+class QRKeyCacheStatsView(APIView):
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        return Response(get_key_cache().stats(), status=status.HTTP_200_OK)
+
+class MetricsView(APIView):
+    """
+    Prometheus exposition of the request metrics, for admins or scrapers
+    (see METRICS_SCRAPE_TOKEN and METRICS_ALLOWED_IPS).
+    """
+    authentication_classes = [MetricsScrapeAuthentication, CachedJWTAuthentication]
+    permission_classes = [IsMetricsScraper | IsAdmin]
+
+    def get(self, request):
+        return HttpResponse(metrics_registry.render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
 class MarkAttendanceByQRView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -231,38 +356,47 @@ class MarkAttendanceByQRView(APIView):
         if not qr_data:
             return Response({"error": "qr_data is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Step 3: Split QR data
+        # Step 3: Decode QR data (compact signature is checked here, no DB hit)
         try:
-            student_uid, class_id, verification_key = qr_data.split("|")
-        except ValueError:
+            payload = parse_qr_data(qr_data)
+        except QRSignatureError:
+            return Response({"error": "Verification failed"}, status=status.HTTP_401_UNAUTHORIZED)
+        except (AttributeError, ValueError):
             return Response({"error": "Invalid QR format"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Step 4: Find student by UUID
-        try:
-            student = Student.objects.get(student_uid=student_uid)
-        except Student.DoesNotExist:
+        # Step 4: Find student (verification-key cache, DB on miss)
+        student = get_key_cache().get(payload_cache_key(payload))
+        if student is None:
             return Response({"error": "Student not found"}, status=status.HTTP_404_NOT_FOUND)
 
         # Step 5: Validate class
-        if str(student.student_class.id) != str(class_id):
+        if str(student.class_id) != payload.class_id:
             return Response({"error": "Class mismatch"}, status=status.HTTP_400_BAD_REQUEST)
 
         # Step 6: Validate verification key
-        if student.verification_key != verification_key:
+        if not qr_key_matches(payload, student.verification_key):
             return Response({"error": "Verification failed"}, status=status.HTTP_401_UNAUTHORIZED)
 
+        if not student.is_active:
+            return Response({"error": "Student is inactive"}, status=status.HTTP_400_BAD_REQUEST)
+
         # Step 7: Prevent duplicate attendance for same day
         today = timezone.now().date()
-        attendance, created = AttendanceRecord.objects.get_or_create(
-            student=student,
-            student_class=student.student_class,
-            date=today,
-            defaults={
-                "status": "P",
-                "marked_by": request.user,
-                "method": "QR"
-            }
-        )
+        try:
+            attendance, created = AttendanceRecord.objects.get_or_create(
+                student_id=student.student_id,
+                date=today,
+                defaults={
+                    "student_class_id": student.class_id,
+                    "status": "P",
+                    "marked_by": request.user,
+                    "method": "QR"
+                }
+            )
+        except IntegrityError:
+            # the cached key outlived the student, deleted meanwhile
+            get_key_cache().invalidate(payload_cache_key(payload))
+            return Response({"error": "Student not found"}, status=status.HTTP_404_NOT_FOUND)
 
         if not created:
             return Response(
@@ -270,13 +404,144 @@ class MarkAttendanceByQRView(APIView):
                 status=status.HTTP_409_CONFLICT
             )
 
-        # Step 8: Return response
+        # Step 8: Return response, relations loaded with the record in one query
+        attendance = AttendanceRecordSerializer.setup_eager_loading(AttendanceRecord.objects).get(pk=attendance.pk)
         serializer = AttendanceRecordSerializer(attendance)
         return Response(
             {"message": "Attendance marked successfully", "data": serializer.data},
             status=status.HTTP_201_CREATED
         )
         
+class BulkMarkAttendanceByQRView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        # Step 1: Role check (only teachers/admin allowed)
+        if request.user.role not in ['TEACHER', 'ADMIN']:
+            return Response({"error": "You are not allowed to mark attendance"}, status=status.HTTP_403_FORBIDDEN)
+
+        # Step 2: Get list of scans (qr_data strings or {"qr_data": ...} objects)
+        scans = request.data.get("scans")
+        if not isinstance(scans, list) or not scans:
+            return Response({"error": "scans must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+
+        max_scans = getattr(settings, "ATTENDANCE_BULK_SCAN_LIMIT", 500)
+        if len(scans) > max_scans:
+            return Response({"error": f"At most {max_scans} scans allowed per request"}, status=status.HTTP_400_BAD_REQUEST)
+
+        scans = [scan.get("qr_data") if isinstance(scan, dict) else scan for scan in scans]
+
+        # Step 3: Resolve, validate and insert the whole batch
+        today = timezone.now().date()
+        results = mark_qr_scans(scans, request.user, today)
+
+        summary = {}
+        for result in results:
+            summary[result["status"]] = summary.get(result["status"], 0) + 1
+
+        return Response({
+            "message": "Scans processed",
+            "date": str(today),
+            "summary": summary,
+            "results": results
+        }, status=status.HTTP_200_OK)
+
+@method_decorator(gzip_page, name="dispatch")
+class OfflineAttendanceSyncView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        # Step 1: Role check (only teachers/admin allowed)
+        if request.user.role not in ['TEACHER', 'ADMIN']:
+            return Response({"error": "You are not allowed to mark attendance"}, status=status.HTTP_403_FORBIDDEN)
+
+        # Step 2: Decode the (optionally gzip-compressed) JSON batch
+        try:
+            payload = decode_sync_body(request.body, request.META.get("HTTP_CONTENT_ENCODING", "").lower())
+        except SyncPayloadError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        device_id = payload.get("device_id")
+        scans = payload.get("scans", [])
+        if not device_id or not isinstance(scans, list):
+            return Response({"error": "device_id and scans are required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        max_scans = getattr(settings, "ATTENDANCE_BULK_SCAN_LIMIT", 500)
+        if len(scans) > max_scans:
+            return Response({"error": f"At most {max_scans} scans allowed per request"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # the delta parameters are checked before any scan is applied
+        try:
+            class_filter = parse_class_ids(payload.get("class_ids"))
+            position = decode_cursor(payload.get("cursor"))
+        except SyncPayloadError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Step 3: Validate scans, answer already synced keys from the log
+        results = {}
+        pending = []
+        for scan in scans:
+            key = scan.get("idempotency_key") if isinstance(scan, dict) else None
+            if not isinstance(key, str) or not key or len(key) > 64:
+                return Response({"error": "Every scan needs an idempotency_key (max 64 chars)"}, status=status.HTTP_400_BAD_REQUEST)
+            if key in results:
+                continue
+
+            client_ts, scan_date = scan_date_from_client_timestamp(scan.get("client_ts"))
+            results[key] = SCAN_INVALID_TIMESTAMP if scan_date is None else None
+            if scan_date is not None:
+                pending.append((key, scan.get("qr_data"), client_ts, scan_date))
+
+        synced = dict(
+            SyncedScan.objects.filter(idempotency_key__in=list(results)).values_list("idempotency_key", "result")
+        )
+        results.update(synced)
+        pending = [scan for scan in pending if scan[0] not in synced]
+
+        # Step 4: Apply new scans and log them in one transaction
+        if pending:
+            with transaction.atomic():
+                marked = mark_qr_scans(
+                    [qr_data for _, qr_data, _, _ in pending],
+                    request.user,
+                    None,
+                    scan_dates=[scan_date for _, _, _, scan_date in pending],
+                    method="QR_OFFLINE"
+                )
+
+                log = []
+                for (key, _, client_ts, _), result in zip(pending, marked):
+                    results[key] = result["status"]
+                    log.append(SyncedScan(
+                        idempotency_key=key,
+                        device_id=device_id,
+                        client_timestamp=client_ts,
+                        result=result["status"],
+                        student_id=result.get("student_id"),
+                        synced_by=request.user
+                    ))
+                SyncedScan.objects.bulk_create(log, ignore_conflicts=True)
+
+        # Step 5: Delta of server-side records changed since the device cursor
+        class_ids = SchoolClass.objects.all()
+        if request.user.role == "TEACHER":
+            class_ids = class_ids.filter(class_teacher_id=request.user.id)
+        if class_filter:
+            class_ids = class_ids.filter(id__in=class_filter)
+
+        changes, cursor, has_more = records_changed_since(
+            list(class_ids.values_list("id", flat=True)),
+            position,
+            getattr(settings, "SYNC_DELTA_LIMIT", 500)
+        )
+
+        return Response({
+            "results": [[key, result] for key, result in results.items()],
+            "changes": changes,
+            "cursor": cursor,
+            "has_more": has_more
+        }, status=status.HTTP_200_OK)
+
 class FinalizeAttendanceView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -298,42 +563,62 @@ class FinalizeAttendanceView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Get all active students of class
-        students = Student.objects.filter(
-            student_class=school_class,
-            is_active=True
-        )
+        # Insert absentees and count in one transaction
+        summary = finalize_attendance([school_class.id], request.user, today)[school_class.id]
 
-        present_count = 0
-        absent_count = 0
+        return Response({
+            "message": "Attendance finalized successfully",
+            "class": str(school_class),
+            "date": str(today),
+            "total_students": summary["total_students"],
+            "present": summary["present"],
+            "absent": summary["absent"]
+        }, status=status.HTTP_200_OK)
 
-        for student in students:
-            attendance, created = AttendanceRecord.objects.get_or_create(
-                student=student,
-                student_class=school_class,
-                date=today,
-                defaults={
-                    "status": "A",
-                    "marked_by": request.user,
-                    "method": "AUTO"
-                }
-            )
 
-            if created:
-                absent_count += 1
-            else:
-                present_count += 1
+class FinalizeAllAttendanceView(APIView):
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def post(self, request):
+        today = timezone.now().date()
+
+        classes = list(SchoolClass.objects.all().order_by("class_name", "section"))
+
+        # Finalize every class with the same set-based path
+        summary = finalize_attendance([cls.id for cls in classes], request.user, today)
+
+        result = []
+        for cls in classes:
+            result.append({
+                "class_id": cls.id,
+                "class_name": str(cls),
+                "total_students": summary[cls.id]["total_students"],
+                "present": summary[cls.id]["present"],
+                "absent": summary[cls.id]["absent"]
+            })
 
         return Response({
-            "message": "Attendance finalized successfully",
-            "class": str(school_class),
+            "message": "Attendance finalized for all classes",
             "date": str(today),
-            "total_students": students.count(),
-            "present": present_count,
-            "absent": absent_count
+            "classes": result
         }, status=status.HTTP_200_OK)
 
 
+class AttendanceEventTicketView(APIView):
+    """
+    Short-lived ticket for opening /api/attendance/events/?ticket=, so
+    browsers never put the access token in a URL.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if request.user.role not in ["TEACHER", "ADMIN"]:
+            return Response({"error": "Not allowed"}, status=status.HTTP_403_FORBIDDEN)
+        return Response({
+            "ticket": issue_stream_ticket(request.user),
+            "expires_in": getattr(settings, "STREAM_TICKET_MAX_AGE", 60)
+        }, status=status.HTTP_200_OK)
+
 class TodayAttendanceByClassView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -345,10 +630,10 @@ class TodayAttendanceByClassView(APIView):
             )
         today = timezone.now().date()
 
-        records = AttendanceRecord.objects.filter(
+        records = AttendanceRecordSerializer.setup_eager_loading(AttendanceRecord.objects.filter(
             student_class_id=class_id,
             date=today
-        ).order_by('-marked_at')
+        ).order_by('-marked_at'))
 
         serializer = AttendanceRecordSerializer(records, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -371,24 +656,25 @@ class DailyAttendanceReportView(APIView):
         else:
             report_date = timezone.now().date()
 
-        # Step 3: fetch attendance records
-        records = AttendanceRecord.objects.filter(
-            student_class_id=class_id,
-            date=report_date
-        )
-
-        # Step 4: summary counts
-        total_present = records.filter(status="P").count()
-        total_absent = records.filter(status="A").count()
+        # Step 3: fetch attendance records and summary counts (single aggregate
+        # query), served from the report cache while the day is unchanged
+        def build():
+            records = AttendanceRecordSerializer.setup_eager_loading(AttendanceRecord.objects.filter(
+                student_class_id=class_id,
+                date=report_date
+            ))
+            summary = summarize_attendance(records)
+
+            return {
+                "class_id": class_id,
+                "date": str(report_date),
+                "total_present": summary["present"],
+                "total_absent": summary["absent"],
+                "total_marked": summary["total"],
+                "records": AttendanceRecordSerializer(records, many=True).data
+            }
 
-        return Response({
-            "class_id": class_id,
-            "date": str(report_date),
-            "total_present": total_present,
-            "total_absent": total_absent,
-            "total_marked": records.count(),
-            "records": AttendanceRecordSerializer(records, many=True).data
-        }, status=status.HTTP_200_OK)
+        return cached_report_response(request, "daily", class_id, report_date, report_date, build)
 
 class WeeklyAttendanceSummaryView(APIView):
     permission_classes = [IsAuthenticated]
@@ -409,24 +695,23 @@ class WeeklyAttendanceSummaryView(APIView):
 
         week_start, week_end = get_week_range(base_date)
 
-        # fetch records for week
-        records = AttendanceRecord.objects.filter(
-            student_class_id=class_id,
-            date__range=[week_start, week_end]
-        )
-
-        # count status
-        present_count = records.filter(status="P").count()
-        absent_count = records.filter(status="A").count()
+        # sum the precomputed daily rollups for the week
+        def build():
+            summary = summarize_daily_summaries(DailyClassAttendanceSummary.objects.filter(
+                student_class_id=class_id,
+                date__range=[week_start, week_end]
+            ))
+
+            return {
+                "class_id": class_id,
+                "week_start": str(week_start),
+                "week_end": str(week_end),
+                "present_count": summary["present"],
+                "absent_count": summary["absent"],
+                "total_marked": summary["total"],
+            }
 
-        return Response({
-            "class_id": class_id,
-            "week_start": str(week_start),
-            "week_end": str(week_end),
-            "present_count": present_count,
-            "absent_count": absent_count,
-            "total_marked": records.count(),
-        }, status=status.HTTP_200_OK)
+        return cached_report_response(request, "weekly", class_id, week_start, week_end, build)
 
 class MonthlyAttendanceSummaryView(APIView):
     permission_classes = [IsAuthenticated]
@@ -446,29 +731,51 @@ class MonthlyAttendanceSummaryView(APIView):
 
         month_start, month_end = get_month_range(base_date)
 
-        records = AttendanceRecord.objects.filter(
-            student_class_id=class_id,
-            date__range=[month_start, month_end]
-        )
+        def build():
+            summary = summarize_daily_summaries(DailyClassAttendanceSummary.objects.filter(
+                student_class_id=class_id,
+                date__range=[month_start, month_end]
+            ))
+
+            return {
+                "class_id": class_id,
+                "month_start": str(month_start),
+                "month_end": str(month_end),
+                "present_count": summary["present"],
+                "absent_count": summary["absent"],
+                "total_marked": summary["total"],
+                "attendance_percent": summary["percent"]
+            }
 
-        present_count = records.filter(status="P").count()
-        absent_count = records.filter(status="A").count()
-        total_marked = records.count()
+        return cached_report_response(request, "monthly", class_id, month_start, month_end, build)
 
-        # percentage calculation
-        attendance_percent = 0
-        if total_marked > 0:
-            attendance_percent = round((present_count / total_marked) * 100, 2)
+class MonthlyAttendanceRegisterView(APIView):
+    """
+    Student x day register of a class for the month of ?date= (default
+    today): per student one P/A/- character per day, with per-student and
+    per-day totals.
+    """
+    permission_classes = [IsAuthenticated]
 
-        return Response({
-            "class_id": class_id,
-            "month_start": str(month_start),
-            "month_end": str(month_end),
-            "present_count": present_count,
-            "absent_count": absent_count,
-            "total_marked": total_marked,
-            "attendance_percent": attendance_percent
-        }, status=status.HTTP_200_OK)
+    def get(self, request, class_id):
+        if request.user.role not in ['TEACHER', 'ADMIN']:
+            return Response({"error": "Not allowed"}, status=status.HTTP_403_FORBIDDEN)
+
+        date_str = request.query_params.get("date")
+        if date_str:
+            try:
+                base_date = datetime.strptime(date_str, "%Y-%m-%d").date()
+            except ValueError:
+                return Response({"error": "Invalid date format. Use YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            base_date = timezone.now().date()
+
+        month_start, month_end = get_month_range(base_date)
+
+        return cached_report_response(
+            request, "register", class_id, month_start, month_end,
+            lambda: register_matrix(class_id, month_start, month_end)
+        )
 
 class StudentAttendanceHistoryView(APIView):
     permission_classes = [IsAuthenticated]
@@ -482,13 +789,15 @@ class StudentAttendanceHistoryView(APIView):
         to_date = request.query_params.get("to")
 
         try:
-            student = Student.objects.get(pk=student_id)
+            student = Student.objects.select_related("student_class", "attendance_stats").get(pk=student_id)
         except Student.DoesNotExist:
             return Response({"error": "Student not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        records = AttendanceRecord.objects.filter(student=student).order_by("-date")
+        records = AttendanceRecordSerializer.setup_eager_loading(
+            AttendanceRecord.objects.filter(student=student).order_by("-date")
+        )
 
-        # apply date filtering if provided
+        # apply date filtering if provided, otherwise use the running counters
         if from_date and to_date:
             try:
                 from_d = datetime.strptime(from_date, "%Y-%m-%d").date()
@@ -497,23 +806,120 @@ class StudentAttendanceHistoryView(APIView):
             except ValueError:
                 return Response({"error": "Invalid from/to date format. Use YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
 
-        present_count = records.filter(status="P").count()
-        absent_count = records.filter(status="A").count()
-        total = records.count()
-
-        percent = 0
-        if total > 0:
-            percent = round((present_count / total) * 100, 2)
+            summary = summarize_attendance(records)
+        elif hasattr(student, "attendance_stats"):
+            stats = student.attendance_stats
+            summary = {
+                "present": stats.present,
+                "absent": stats.absent,
+                "total": stats.total,
+                "percent": attendance_percent(stats.present, stats.total)
+            }
+        else:
+            summary = empty_summary()
 
-        return Response({
+        data = {
             "student_id": student_id,
             "student_name": student.full_name,
             "class": str(student.student_class),
-            "present_count": present_count,
-            "absent_count": absent_count,
-            "total_days": total,
-            "attendance_percent": percent,
-            "records": AttendanceRecordSerializer(records, many=True).data
+            "present_count": summary["present"],
+            "absent_count": summary["absent"],
+            "total_days": summary["total"],
+            "attendance_percent": summary["percent"],
+        }
+
+        # records only when asked for: ?include_records=true for all of them,
+        # ?stream=1 to stream them, ?cursor= / ?page_size= to page through them
+        if wants_stream(request):
+            return stream_json_response(records, AttendanceRecordSerializer, envelope=data)
+
+        if wants_pagination(request):
+            paginator = DateCursorPagination()
+            page = paginator.paginate_queryset(records, request, view=self)
+            data["next"] = paginator.get_next_link()
+            data["previous"] = paginator.get_previous_link()
+            data["records"] = AttendanceRecordSerializer(page, many=True).data
+            return Response(data, status=status.HTTP_200_OK)
+
+        if request.query_params.get("include_records") in ("1", "true"):
+            data["records"] = AttendanceRecordSerializer(records, many=True).data
+
+        return Response(data, status=status.HTTP_200_OK)
+
+class AttendanceRegisterExportView(APIView):
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        # ?from=YYYY-MM-DD&to=YYYY-MM-DD[&class_id=1,2][&output=csv|xlsx]
+        try:
+            date_from = datetime.strptime(request.query_params.get("from", ""), "%Y-%m-%d").date()
+            date_to = datetime.strptime(request.query_params.get("to", ""), "%Y-%m-%d").date()
+        except ValueError:
+            return Response({"error": "from and to are required. Use YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+
+        class_ids = None
+        if request.query_params.get("class_id"):
+            try:
+                class_ids = [int(value) for value in request.query_params["class_id"].split(",")]
+            except ValueError:
+                return Response({"error": "class_id must be a comma separated list of ids"}, status=status.HTTP_400_BAD_REQUEST)
+
+        output = request.query_params.get("output", "csv")
+        if output not in EXPORT_FORMATS:
+            return Response({"error": "output must be csv or xlsx"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            if output == "xlsx":
+                content = iter_register_xlsx(date_from, date_to, class_ids)
+                content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            else:
+                content = iter_register_csv(date_from, date_to, class_ids)
+                content_type = "text/csv"
+        except ExportError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="attendance_{date_from}_{date_to}.{output}"'
+        return response
+
+class AtRiskStudentsView(APIView):
+    """
+    Students at risk of chronic absenteeism, from the incrementally kept
+    StudentAbsenceState rows: absent ?streak= days in a row or present on
+    less than ?percent= of their last 30 days. Optional ?class_id=1,2;
+    teachers only see their own classes.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if request.user.role not in ['TEACHER', 'ADMIN']:
+            return Response({"error": "Not allowed"}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            min_streak = int(request.query_params.get("streak", settings.ABSENTEEISM_STREAK_THRESHOLD))
+            max_percent = float(request.query_params.get("percent", settings.ABSENTEEISM_PERCENT_THRESHOLD))
+        except ValueError:
+            return Response({"error": "streak must be an integer and percent a number"}, status=status.HTTP_400_BAD_REQUEST)
+        if min_streak < 1:
+            return Response({"error": "streak must be at least 1"}, status=status.HTTP_400_BAD_REQUEST)
+
+        class_ids = None
+        if request.query_params.get("class_id"):
+            try:
+                class_ids = [int(value) for value in request.query_params["class_id"].split(",")]
+            except ValueError:
+                return Response({"error": "class_id must be a comma separated list of ids"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.user.role == "TEACHER":
+            own = get_teacher_scope_cache().get(request.user.id).class_ids
+            class_ids = [class_id for class_id in class_ids if class_id in own] if class_ids else list(own)
+
+        states = at_risk_states(min_streak, max_percent, class_ids)
+
+        return Response({
+            "streak_threshold": min_streak,
+            "percent_threshold": max_percent,
+            "students": StudentAbsenceStateSerializer(states, many=True).data
         }, status=status.HTTP_200_OK)
 
 class AdminDashboardOverviewView(APIView):
@@ -528,15 +934,7 @@ class AdminDashboardOverviewView(APIView):
         total_teachers = User.objects.filter(role="TEACHER").count()
 
         # Today's attendance
-        today_records = AttendanceRecord.objects.filter(date=today)
-        present_today = today_records.filter(status="P").count()
-        absent_today = today_records.filter(status="A").count()
-
-        total_marked_today = today_records.count()
-
-        attendance_percent = 0
-        if total_marked_today > 0:
-            attendance_percent = round((present_today / total_marked_today) * 100, 2)
+        today_summary = summarize_daily_summaries(DailyClassAttendanceSummary.objects.filter(date=today))
 
         return Response({
             "date": str(today),
@@ -546,10 +944,10 @@ class AdminDashboardOverviewView(APIView):
                 "teachers": total_teachers,
             },
             "today_attendance": {
-                "marked": total_marked_today,
-                "present": present_today,
-                "absent": absent_today,
-                "attendance_percent": attendance_percent
+                "marked": today_summary["total"],
+                "present": today_summary["present"],
+                "absent": today_summary["absent"],
+                "attendance_percent": today_summary["percent"]
             }
         }, status=status.HTTP_200_OK)
 
@@ -557,33 +955,39 @@ class AdminTodayClassWiseAttendanceView(APIView):
     permission_classes = [IsAuthenticated, IsAdmin]
 
     def get(self, request):
-        today = timezone.now().date()
+        # optional ?date=YYYY-MM-DD for historical days
+        date_str = request.query_params.get("date")
+        if date_str:
+            try:
+                report_date = datetime.strptime(date_str, "%Y-%m-%d").date()
+            except ValueError:
+                return Response({"error": "Invalid date format. Use YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            report_date = timezone.now().date()
 
         classes = SchoolClass.objects.all().order_by("class_name", "section")
 
+        # one rollup row per class for the day, merged with the class list
+        summaries = summarize_daily_summaries_by_class(
+            DailyClassAttendanceSummary.objects.filter(date=report_date)
+        )
+
         result = []
 
         for cls in classes:
-            records = AttendanceRecord.objects.filter(student_class=cls, date=today)
-            present_count = records.filter(status="P").count()
-            absent_count = records.filter(status="A").count()
-            total = records.count()
-
-            percent = 0
-            if total > 0:
-                percent = round((present_count / total) * 100, 2)
+            summary = summaries.get(cls.id, empty_summary())
 
             result.append({
                 "class_id": cls.id,
                 "class_name": str(cls),
-                "present": present_count,
-                "absent": absent_count,
-                "total_marked": total,
-                "attendance_percent": percent
+                "present": summary["present"],
+                "absent": summary["absent"],
+                "total_marked": summary["total"],
+                "attendance_percent": summary["percent"]
             })
 
         return Response({
-            "date": str(today),
+            "date": str(report_date),
             "classes": result
         }, status=status.HTTP_200_OK)
 
@@ -597,30 +1001,26 @@ class TeacherDashboardOverviewView(APIView):
 
         today = timezone.now().date()
 
-        assigned_classes = SchoolClass.objects.filter(class_teacher=request.user)
-
-        class_ids = assigned_classes.values_list("id", flat=True)
+        # classes and student counts from the per-teacher cache
+        scope = get_teacher_scope_cache().get(request.user.id)
 
-        total_students = Student.objects.filter(student_class_id__in=class_ids).count()
-
-        today_records = AttendanceRecord.objects.filter(
-            student_class_id__in=class_ids,
+        today_summary = summarize_daily_summaries(DailyClassAttendanceSummary.objects.filter(
+            student_class_id__in=scope.class_ids,
             date=today
-        )
-        present_today = today_records.filter(status="P").count()
-        absent_today = today_records.filter(status="A").count()
+        ))
 
         return Response({
             "teacher": request.user.username,
             "date": str(today),
             "assigned_classes": [
-                {"id": cls.id, "name": str(cls)} for cls in assigned_classes
+                {"id": cls["id"], "name": cls["name"]} for cls in scope.classes
             ],
             "summary": {
-                "total_students": total_students,
-                "marked_today": today_records.count(),
-                "present_today": present_today,
-                "absent_today": absent_today,
+                "total_students": scope.total_students,
+                "active_students": scope.active_students,
+                "marked_today": today_summary["total"],
+                "present_today": today_summary["present"],
+                "absent_today": today_summary["absent"],
             }
         }, status=status.HTTP_200_OK)
 
@@ -632,14 +1032,13 @@ class TeacherTodayAbsentListView(APIView):
             return Response({"error": "Only teacher can access this"}, status=status.HTTP_403_FORBIDDEN)
 
         today = timezone.now().date()
-        assigned_classes = SchoolClass.objects.filter(class_teacher=request.user)
-        class_ids = assigned_classes.values_list("id", flat=True)
+        class_ids = get_teacher_scope_cache().get(request.user.id).class_ids
 
-        absent_records = AttendanceRecord.objects.filter(
+        absent_records = AttendanceRecordSerializer.setup_eager_loading(AttendanceRecord.objects.filter(
             student_class_id__in=class_ids,
             date=today,
             status="A"
-        ).order_by("student__full_name")
+        ).order_by("student__full_name"))
 
         data = AttendanceRecordSerializer(absent_records, many=True).data
 